@@ -1,28 +1,11 @@
 #!/usr/bin/env python3
-import os, re
-from pathlib import Path
+"""Сборка docs/corpus.txt и docs/corpus_short.txt (потоково, см. core/corpus_builder.py)"""
+import os
+import sys
 
-def clean_text(text):
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-    return text.strip()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "core"))
 
-corpus_lines = []
-root = Path('.').resolve()
+from corpus_builder import cli
 
-for filepath in root.rglob('*'):
-    if filepath.is_file() and filepath.suffix.lower() in {'.md', '.txt', '.py', '.js', '.html'}:
-        try:
-            content = filepath.read_text(encoding='utf-8', errors='ignore')
-            if content.strip():
-                cleaned = clean_text(content)
-                rel_path = filepath.relative_to(root)
-                corpus_lines.append(f"\n{'='*60}\n📄 ФАЙЛ: {rel_path}\n{'='*60}\n{cleaned}")
-                print(f"✓ {rel_path}")
-        except:
-            pass
-
-output = '\n'.join(corpus_lines)
-(Path('docs') / 'corpus.txt').write_text(output, encoding='utf-8')
-short = output[:5000] + "\n[...]"
-(Path('docs') / 'corpus_short.txt').write_text(short, encoding='utf-8')
-print(f"\n✅ corpus.txt создан в docs/. Полный размер: {len(output)} символов")
+if __name__ == "__main__":
+    cli(sys.argv[1:])
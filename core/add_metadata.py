@@ -1,108 +1,86 @@
 #!/usr/bin/env python3
 """
 add_metadata.py - Добавление метаданных в документы
-Версия: 0.1.0
+Версия: 0.3.0
+Назначение: План строится по индексу метаданных (metadata_engine.py), ID выдаёт
+реестр (id_registry.py), документы правятся параллельно и атомарно;
+--dry-run показывает план по индексу как есть - только чтение индекса,
+без обхода архива (--refresh - сначала обновить индекс).
 """
 
-import os
-import re
-from pathlib import Path
-from datetime import datetime
+import argparse
+
+from atomic_io import atomic_write_bytes
+from id_registry import open_registry
+from markdown_tokens import tokenize
+from metadata_engine import apply_plan, insert_metadata, plan_metadata, update_metadata_index
+from scan_index import ScanIndex
 
 def add_metadata_to_file(filepath, metadata):
-    """Добавляет метаданные в начало файла"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Проверяем, есть ли уже метаданные
-    if '**ID:**' in content:
-        print(f"  ⏭️  {filepath} - уже имеет метаданные")
+    """Добавляет метаданные после первого заголовка файла"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+
+    new_data = insert_metadata(data, tokenize(data), metadata)
+    if new_data is None:
+        print(f"  ⏭️  {filepath} - уже имеет метаданные или нет заголовка")
         return False
-    
-    # Создаем блок метаданных
-    meta_block = "\n".join([f"**{k}:** {v}" for k, v in metadata.items()])
-    meta_block = f"\n{meta_block}\n\n"
-    
-    # Вставляем после первого заголовка (#)
-    lines = content.split('\n')
-    new_lines = []
-    
-    for i, line in enumerate(lines):
-        new_lines.append(line)
-        if line.startswith('# ') and i == 0:
-            # Нашли заголовок первого уровня
-            new_lines.append(meta_block)
-    
-    new_content = '\n'.join(new_lines)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(new_content)
-    
+
+    atomic_write_bytes(filepath, new_data)
     return True
 
-def main():
+def main(dry_run=False, workers=None, index_path=None, refresh=None):
+    """refresh=None - обновлять индекс, только если это не --dry-run"""
     print("=" * 60)
     print("ДОБАВЛЕНИЕ МЕТАДАННЫХ В ДОКУМЕНТЫ")
     print("=" * 60)
-    
-    # Маппинг папок к типам документов
-    folder_types = {
-        'concepts': 'CON',
-        'strategies': 'STR',
-        'system': 'SYS',
-        'dialoguesstrategies': 'DLG',
-        'templates': 'TPL'
-    }
-    
-    total_added = 0
-    
-    for folder, prefix in folder_types.items():
-        if not os.path.exists(folder):
-            continue
-            
-        print(f"\n📁 Обрабатываю папку: {folder}/")
-        
-        for filename in os.listdir(folder):
-            if filename.endswith('.md') and filename != 'README.md':
-                filepath = os.path.join(folder, filename)
-                
-                # Генерируем ID
-                doc_id = f"{prefix}-2024-{total_added + 1:03d}"
-                
-                metadata = {
-                    'ID': doc_id,
-                    'Автор': 'Водан',
-                    'Дата создания': datetime.now().strftime('%Y-%m-%d'),
-                    'Статус': 'Активный',
-                    'Версия': '1.0.0'
-                }
-                
-                if add_metadata_to_file(filepath, metadata):
-                    print(f"  ✅ {filename} -> {doc_id}")
-                    total_added += 1
-    
-    # Обрабатываем файлы в корне
-    print(f"\n📁 Обрабатываю корневые файлы:")
-    
-    root_files = ['manifest.md', 'symbiosis-v2.md']
-    
-    for filename in root_files:
-        if os.path.exists(filename):
-            metadata = {
-                'ID': 'ROOT-2024-001' if filename == 'manifest.md' else 'STR-2024-002',
-                'Автор': 'Водан',
-                'Дата создания': '2024-01-15',
-                'Статус': 'Активный',
-                'Версия': '1.0.0'
-            }
-            
-            if add_metadata_to_file(filename, metadata):
-                print(f"  ✅ {filename}")
-                total_added += 1
-    
+
+    if refresh is None:
+        refresh = not dry_run
+    # Индекс метаданных всего архива (ID должны быть уникальны везде):
+    # перечитываются только изменённые документы
+    with ScanIndex(index_path, ".") as index:
+        if refresh:
+            index.refresh(".", verify_files=True)
+            update = update_metadata_index(index, ".", workers)
+            for path, error in update["errors"]:
+                print(f"Ошибка при чтении {path}: {error}")
+        elif not index.db.execute("SELECT 1 FROM doc_metadata LIMIT 1").fetchone():
+            print("⚠️  Индекс метаданных пуст - запустите с --refresh")
+        # Выданные ID сохраняются сразу: параллельный запуск их не повторит
+        with open_registry(index, save=not dry_run) as registry:
+            changes, skipped = plan_metadata(index, registry)
+            duplicates = registry.duplicates
+
+    for doc_id, paths in sorted(duplicates.items()):
+        print(f"  ⚠️  ID {doc_id} повторяется: {', '.join(paths)}")
+
+    for path, reason in skipped:
+        print(f"  ⏭️  {path} - {reason}")
+
+    if dry_run:
+        print(f"\n📋 План: метаданные будут добавлены в {len(changes)} документов")
+        for change in changes:
+            print(f"  ➕ {change.path} -> {change.fields['ID']}")
+        return
+
+    written, unchanged, errors = apply_plan(changes, ".", workers)
+    for change in written:
+        print(f"  ✅ {change.path} -> {change.fields['ID']}")
+    for change in unchanged:
+        print(f"  ⏭️  {change.path} - изменился после построения плана, пропущен")
+    for path, error in errors:
+        print(f"  ❌ {path}: {error}")
+
     print(f"\n" + "=" * 60)
-    print(f"✅ Добавлено метаданных: {total_added} документов")
+    print(f"✅ Добавлено метаданных: {len(written)} документов")
     print("=" * 60)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Добавление метаданных в документы архива")
+    parser.add_argument("--dry-run", action="store_true", help="только показать план (по индексу как есть, без обхода архива)")
+    parser.add_argument("--refresh", action="store_true", help="с --dry-run: сначала обновить индекс по диску")
+    parser.add_argument("--workers", type=int, help="число потоков для записи документов")
+    parser.add_argument("--index", help="путь к индексу сканирования (по умолчанию - индекс корня архива)")
+    args = parser.parse_args()
+    main(args.dry_run, args.workers, args.index, args.refresh or None)
@@ -2,16 +2,25 @@
 # Прототип, следующий Конституции Сада
 
 import json
+import os
 import numpy as np
 from datetime import datetime
 
+# Метрики графа, которые ведёт оркестратор (memory.json -> memory_graph.npz, см. graph_metrics.metrics_path_for)
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_graph.npz")
+
 class AI_Architect:
-    def __init__(self, constitution_path="concepts/constitution-of-the-garden-v1.md"):
+    def __init__(self, constitution_path="concepts/constitution-of-the-garden-v1.md",
+                 metrics_path=DEFAULT_METRICS_PATH):
         """Инициализация Садовода с загрузкой принципов."""
         print(f"[Садовод] Инициализация... Загружаю Конституцию из {constitution_path}")
         self.ethos = self._load_ethos(constitution_path)
         self.knowledge_base = {}
         self.decision_log = []
+        self.metrics_path = metrics_path
+        # Связность из файла метрик и mtime файла, для которого она прочитана
+        self._connectivity = None
+        self._metrics_mtime = None
         print("[Садовод] Готов. Целевые функции: Связность, Разнообразие, Преемственность.")
 
     def _load_ethos(self, path):
@@ -24,16 +33,47 @@ class AI_Architect:
             "version": "1.0"
         }
 
-    def evaluate_action(self, proposed_action_description):
+    def measure_connectivity(self, root_path=None):
+        """
+        Связность архива по графу ссылок (graph_metrics.py), от 0 до 1.
+        Берётся из сохранённых метрик оркестратора и перечитывается, только когда
+        файл метрик изменился; архив обходится, лишь если метрик ещё нет.
+        """
+        # Аналитика графа тянет за собой индекс и граф ссылок - импортируем только при расчёте
+        from graph_metrics import analyze, archive_metrics, load_metrics
+        from scan_index import ARCHIVE_ROOT
+
+        try:
+            mtime = os.stat(self.metrics_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime == self._metrics_mtime:
+            return self._connectivity
+        state = load_metrics(self.metrics_path) if mtime is not None else None
+        if state is None:
+            # Первый расчёт сохраняет метрики - следующие вызовы читают файл
+            stats = archive_metrics(root_path or ARCHIVE_ROOT, self.metrics_path, top=0)
+            self._connectivity = stats["connectivity"]
+            mtime = os.stat(self.metrics_path).st_mtime_ns if os.path.exists(self.metrics_path) else None
+        else:
+            self._connectivity = analyze(state.graph, 0, state.rank, state.labels)["connectivity"]
+        self._metrics_mtime = mtime
+        return self._connectivity
+
+    def evaluate_action(self, proposed_action_description, connectivity=None):
         """
         Оценивает предложенное действие по целевым функциям (ЦФ) Конституции.
-        Возвращает вердикт и оценку.
+        connectivity - уже посчитанная связность архива; если не передана,
+        она берётся из сохранённых метрик графа ссылок. Возвращает вердикт и оценку.
         """
         print(f"[Садовод] Анализирую действие: '{proposed_action_description}'")
 
-        # Симуляция глубокого анализа (заглушка)
+        if connectivity is None:
+            connectivity = self.measure_connectivity()
+
+        # Связность - из графа архива, остальные ЦФ пока симулируются (заглушка)
         scores = {
-            "Связность": np.random.uniform(0.3, 0.9),  # В будущем — реальный анализ графа архива
+            "Связность": connectivity,
             "Разнообразие": np.random.uniform(0.3, 0.9),
             "Преемственность": np.random.uniform(0.3, 0.9)
         }
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+archive_layout.py - Единая раскладка архива
+Версия: 0.1.0
+Назначение: Разбор манифеста archive_layout.json в неизменяемые структуры
+для сканеров, анализатора связей и add_metadata
+"""
+
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+LAYOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive_layout.json")
+
+# folders - разделы в порядке манифеста (для отчётов), folder_set - для проверки "in",
+# doc_prefixes / required_files - словари по имени раздела.
+ArchiveLayout = namedtuple("ArchiveLayout", [
+    "folders", "folder_set", "doc_prefixes", "required_files",
+    "default_required_files", "root_documents", "important_docs",
+])
+
+
+@lru_cache(maxsize=None)
+def load_layout(path=LAYOUT_PATH):
+    """Читает манифест один раз за процесс и компилирует его в кортежи, множества и словари"""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    sections = manifest["sections"]
+    default_required = tuple(manifest.get("default_required_files", ("README.md",)))
+    return ArchiveLayout(
+        folders=tuple(sections),
+        folder_set=frozenset(sections),
+        doc_prefixes={name: spec["doc_prefix"] for name, spec in sections.items() if spec.get("doc_prefix")},
+        required_files={name: tuple(spec.get("required_files", default_required))
+                        for name, spec in sections.items()},
+        default_required_files=default_required,
+        root_documents=dict(manifest.get("root_documents", {})),
+        important_docs=tuple(manifest.get("important_docs", ())),
+    )
+
+
+def section_of(rel_path, layout=None):
+    """Раздел архива, к которому относится путь (по первой части пути), или None"""
+    layout = layout or load_layout()
+    top = rel_path.replace(os.sep, "/").split("/", 1)[0]
+    return top if top in layout.folder_set else None
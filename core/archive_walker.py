@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+archive_walker.py - Общий обходчик архива
+Версия: 0.2.0
+Назначение: Однопроходный обход дерева на os.scandir с отсечением служебных папок
+"""
+
+import os
+from collections import namedtuple
+
+# Папки, в которые обходчик не спускается вовсе
+IGNORE_FOLDERS = frozenset({
+    '.git', '.github', '__pycache__', '.idea', '.vscode', 'node_modules',
+    'venv', '.venv', 'myenv', '.cache',
+})
+
+# Запись об одном файле или папке архива.
+# size / mtime_ns заполняются только при with_stat=True,
+# inode берётся из DirEntry без лишнего системного вызова.
+# files - имена файлов прочитанной папки (None у файлов и непрочитанных папок).
+ArchiveEntry = namedtuple(
+    "ArchiveEntry",
+    ["path", "rel_path", "name", "is_dir", "size", "mtime_ns", "inode", "files"],
+    defaults=(None,),
+)
+
+
+def _make_entry(entry, rel_path, is_dir, with_stat):
+    """Собирает ArchiveEntry из os.DirEntry, переиспользуя его кэш stat"""
+    size = mtime_ns = None
+    if with_stat:
+        st = entry.stat(follow_symlinks=not is_dir)
+        size = st.st_size
+        mtime_ns = st.st_mtime_ns
+    return ArchiveEntry(entry.path, rel_path, entry.name, is_dir, size, mtime_ns, entry.inode())
+
+
+def list_dir(path, rel_path="", ignore=IGNORE_FOLDERS, with_stat=False):
+    """Читает одну папку: возвращает (файлы, подпапки) без игнорируемых папок"""
+    files = []
+    subdirs = []
+    prefix = rel_path + os.sep if rel_path else ""
+    with os.scandir(path) as it:
+        for entry in it:
+            name = entry.name
+            # Симлинки на папки не раскрываем, чтобы не уйти в цикл
+            if entry.is_dir(follow_symlinks=False):
+                if name in ignore:
+                    continue
+                subdirs.append(_make_entry(entry, prefix + name, True, with_stat))
+            elif entry.is_file():
+                files.append(_make_entry(entry, prefix + name, False, with_stat))
+    return files, subdirs
+
+
+def walk_archive(root_path=".", ignore=IGNORE_FOLDERS, with_stat=False,
+                 max_depth=None, onerror=None, start=""):
+    """
+    Обходит архив за один проход и выдаёт ArchiveEntry для каждой папки и файла.
+
+    Игнорируемые папки отсекаются до спуска в них. Корень не выдаётся.
+    Папка выдаётся сразу после чтения её каталога, вместе с именами её файлов
+    (поле files), так что проверка README и других обязательных файлов
+    не требует лишних системных вызовов. Следом идут её файлы.
+    max_depth=0 - только непосредственное содержимое корня.
+    onerror, как и в os.walk, получает OSError от нечитаемых папок.
+    start - относительный путь поддерева, с которого начать обход; сама папка
+    start тогда тоже выдаётся, а все пути остаются относительными корню.
+    """
+    path = os.fspath(root_path)
+    folder = None
+    if start:
+        path = os.path.join(path, start)
+        folder = ArchiveEntry(path, start, os.path.basename(start), True, None, None, None)
+    stack = [(folder, path, start, 0)]
+    while stack:
+        folder, path, rel_path, depth = stack.pop()
+        try:
+            files, subdirs = list_dir(path, rel_path, ignore, with_stat)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            if folder is not None:
+                yield folder
+            continue
+
+        if folder is not None:
+            yield folder._replace(files=frozenset(f.name for f in files))
+        yield from files
+        for sub in subdirs:
+            if max_depth is None or depth < max_depth:
+                stack.append((sub, sub.path, sub.rel_path, depth + 1))
+            else:
+                yield sub
+
+
+def iter_files(root_path=".", suffix=None, ignore=IGNORE_FOLDERS, with_stat=False):
+    """Выдаёт только файлы архива (при необходимости - с заданным расширением)"""
+    for entry in walk_archive(root_path, ignore, with_stat):
+        if entry.is_dir:
+            continue
+        if suffix is None or entry.name.endswith(suffix):
+            yield entry
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+archive_watch.py - Наблюдение за архивом в реальном времени
+Версия: 0.1.0
+Назначение: Держит результаты сканирования в памяти и обновляет их по событиям
+inotify (через ctypes), а без inotify - опросом постоянного индекса.
+Свежие итоги публикуются в core/.cache/scan_state.json, откуда их читают
+link_checker и оркестратор без повторного обхода дерева.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import time
+from datetime import datetime
+
+from archive_walker import IGNORE_FOLDERS, list_dir
+from atomic_io import atomic_write_text
+from scan_index import CACHE_DIR, ScanIndex
+from scanner_v2 import LAYOUT, check_folder, index_summary
+
+DEFAULT_STATE_PATH = os.path.join(CACHE_DIR, "scan_state.json")
+
+# Флаги inotify из <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class ArchiveState:
+    """Результаты сканирования в памяти: имена файлов по папкам и счётчики"""
+
+    def __init__(self, root_path="."):
+        self.root = root_path
+        self.dirs = {}
+        self.children = {}
+        self.total_files = 0
+        self.markdown_files = 0
+        self.changed_files = 0
+
+    def load(self, rel_path="", before_listing=None):
+        """
+        Считывает поддерево (или весь архив); возвращает список новых папок.
+        before_listing(папка) вызывается до чтения каталога каждой папки: наблюдение,
+        поставленное в нём, ловит и файлы, созданные во время обхода.
+        """
+        new_dirs = []
+        stack = [rel_path]
+        while stack:
+            current = stack.pop()
+            if before_listing is not None:
+                before_listing(current)
+            if current not in self.dirs:
+                self._add_dir(current)
+                new_dirs.append(current)
+            try:
+                files, subdirs = list_dir(os.path.join(self.root, current), current)
+            except OSError:
+                continue
+            for entry in files:
+                self.add_file(entry.rel_path)
+            stack.extend(sub.rel_path for sub in subdirs)
+        return new_dirs
+
+    def _add_dir(self, rel_path):
+        self.dirs[rel_path] = set()
+        if rel_path:
+            self.children.setdefault(os.path.dirname(rel_path), set()).add(rel_path)
+
+    def remove_dir(self, rel_path):
+        """Убирает папку со всем содержимым"""
+        stack = [rel_path]
+        while stack:
+            current = stack.pop()
+            names = self.dirs.pop(current, None)
+            if names is None:
+                continue
+            self.total_files -= len(names)
+            self.markdown_files -= sum(1 for name in names if name.endswith(".md"))
+            stack.extend(self.children.pop(current, ()))
+        if rel_path:
+            self.children.get(os.path.dirname(rel_path), set()).discard(rel_path)
+
+    def add_file(self, rel_path):
+        parent, name = os.path.split(rel_path)
+        names = self.dirs.get(parent)
+        if names is None or name in names:
+            return
+        names.add(name)
+        self.total_files += 1
+        if name.endswith(".md"):
+            self.markdown_files += 1
+
+    def remove_file(self, rel_path):
+        parent, name = os.path.split(rel_path)
+        names = self.dirs.get(parent)
+        if names is None or name not in names:
+            return
+        names.discard(name)
+        self.total_files -= 1
+        if name.endswith(".md"):
+            self.markdown_files -= 1
+
+    def summary(self):
+        """Итоги в формате scan_archive"""
+        folders_without_readme = []
+        compliance = []
+        for folder, names in self.dirs.items():
+            if not folder or os.path.basename(folder) not in LAYOUT.folder_set:
+                continue
+            record = check_folder(folder, names)
+            compliance.append(record)
+            if "README.md" in record["missing"]:
+                folders_without_readme.append(folder)
+        return {
+            "total_files": self.total_files,
+            "markdown_files": self.markdown_files,
+            "project_folders": len(self.dirs) - 1,
+            "folders_without_readme": sorted(folders_without_readme),
+            "compliance": sorted(compliance, key=lambda c: c["folder"]),
+            "key_folders": _key_folders(self.dirs.get)
+        }
+
+
+def _key_folders(names_for):
+    """Число файлов и .md непосредственно в основных папках проекта"""
+    key_folders = {}
+    for folder in LAYOUT.folders:
+        names = names_for(folder)
+        if names is not None:
+            key_folders[folder] = {
+                "files": len(names),
+                "markdown": sum(1 for name in names if name.endswith(".md"))
+            }
+    return key_folders
+
+
+def publish_state(root_path, results, state_path=DEFAULT_STATE_PATH):
+    """Атомарно записывает свежие итоги для других инструментов"""
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    payload = {
+        "root": os.path.abspath(root_path),
+        "pid": os.getpid(),
+        "updated_at": datetime.now().isoformat(),
+        "results": results
+    }
+    atomic_write_text(state_path, json.dumps(payload, ensure_ascii=False, indent=2))
+
+
+def load_published_state(root_path=".", state_path=DEFAULT_STATE_PATH):
+    """
+    Возвращает итоги, опубликованные работающим наблюдателем этого архива,
+    или None, если наблюдатель не запущен и данные могут быть устаревшими.
+    """
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if payload.get("root") != os.path.abspath(root_path):
+        return None
+    try:
+        os.kill(payload["pid"], 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return payload["results"]
+
+
+class Inotify:
+    """Минимальная обёртка над inotify через ctypes"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read_events(self, timeout=None):
+        """Ждёт события не дольше timeout и возвращает [(wd, mask, cookie, name)]"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _watch_inotify(root_path, on_update, debounce, max_delay):
+    """Основной цикл на inotify: события применяются сразу, публикация - после затишья"""
+    inotify = Inotify()
+    state = None
+    wd_to_dir = {}
+
+    def watch(rel_path):
+        try:
+            wd_to_dir[inotify.add_watch(os.path.join(root_path, rel_path))] = rel_path
+        except FileNotFoundError:
+            pass
+
+    def rescan():
+        nonlocal state
+        state = ArchiveState(root_path)
+        state.load(before_listing=watch)
+
+    try:
+        rescan()
+        on_update(state.summary())
+        first_pending = last_event = None
+        while True:
+            timeout = None if last_event is None else debounce
+            events = inotify.read_events(timeout)
+            now = time.monotonic()
+            for wd, mask, _, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # Очередь ядра переполнилась - события потеряны, перечитываем всё
+                    rescan()
+                    continue
+                if mask & IN_IGNORED:
+                    wd_to_dir.pop(wd, None)
+                    continue
+                parent = wd_to_dir.get(wd)
+                if parent is None or not name:
+                    continue
+                rel_path = os.path.join(parent, name) if parent else name
+                if mask & IN_ISDIR:
+                    if name in IGNORE_FOLDERS:
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        # Сначала наблюдение, потом чтение папки - иначе файлы,
+                        # созданные между ними, остались бы незамеченными
+                        state.load(rel_path, before_listing=watch)
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        state.remove_dir(rel_path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    state.add_file(rel_path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    state.remove_file(rel_path)
+                elif mask & IN_CLOSE_WRITE:
+                    state.changed_files += 1
+            if events:
+                last_event = now
+                first_pending = first_pending or now
+            # Пачку событий (git checkout, массовая правка) публикуем одним обновлением
+            if last_event is not None and (now - last_event >= debounce or now - first_pending >= max_delay):
+                summary = state.summary()
+                summary["changed_files"] = state.changed_files
+                state.changed_files = 0
+                on_update(summary)
+                first_pending = last_event = None
+    finally:
+        inotify.close()
+
+
+def _watch_polling(root_path, on_update, interval, index_path):
+    """Запасной цикл: опрос постоянного индекса (stat на папку за проход)"""
+    with ScanIndex(index_path, root_path) as index:
+        last = None
+        while True:
+            stats = index.refresh(root_path, verify_files=True)
+            summary = index_summary(index)
+            summary.pop("type")
+            summary.pop("core_files")
+            summary["key_folders"] = _key_folders(
+                lambda folder: index.file_names(folder) if index.has_dir(folder) else None)
+            # Перечитанные "свежие" папки без реальных изменений не публикуем
+            if summary != last or stats["files_updated"] or stats["files_removed"]:
+                last = dict(summary)
+                summary["changed_files"] = stats["files_updated"]
+                on_update(summary)
+            time.sleep(interval)
+
+
+def watch_archive(root_path=".", on_update=None, debounce=0.5, max_delay=5.0,
+                  poll=False, interval=5.0, index_path=None,
+                  state_path=DEFAULT_STATE_PATH):
+    """
+    Следит за архивом до прерывания. После каждой пачки изменений итоги
+    публикуются в state_path и передаются в on_update(summary).
+    Без inotify (или при poll=True) работает опросом индекса раз в interval секунд.
+    """
+    def update(summary):
+        publish_state(root_path, summary, state_path)
+        if on_update is not None:
+            on_update(summary)
+
+    if not poll:
+        try:
+            return _watch_inotify(root_path, update, debounce, max_delay)
+        except (OSError, AttributeError) as e:
+            # Нет inotify (не Linux) или исчерпан лимит наблюдений
+            print(f"⚠️  inotify недоступен ({e}), перехожу на опрос раз в {interval} с")
+    return _watch_polling(root_path, update, interval, index_path)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+atomic_io.py - Атомарная запись файлов
+Версия: 0.2.0
+Назначение: Запись через временный файл и os.replace, чтобы сбой посреди
+записи не оставлял документ или отчёт обрезанным; atomic_open - то же для
+потоковой записи
+"""
+
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_open(path, mode="w", encoding="utf-8"):
+    """
+    Файл для потоковой записи: пишется во временный файл рядом с path,
+    который подменяет path только при выходе из блока без исключения.
+    """
+    path = os.fspath(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # Сохраняем права существующего файла (mkstemp создаёт 0600)
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def atomic_write_bytes(path, data):
+    """Записывает байты во временный файл рядом с path и подменяет path одним rename"""
+    with atomic_open(path, "wb") as f:
+        f.write(data)
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """Текстовый вариант atomic_write_bytes; переводы строк пишутся как есть"""
+    atomic_write_bytes(path, text.encode(encoding))
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+backlinks.py - Обратные ссылки архива
+Версия: 0.1.0
+Назначение: Кто ссылается на документ - запросом к индексу целей графа ссылок
+(link_graph.py), без перечитывания архива; массовая запись разделов
+"Обратные ссылки" во все документы за один проход по графу
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+
+from atomic_io import atomic_write_text
+from link_graph import BACKLINKS_END, BACKLINKS_START, links_to, update_link_graph
+from scan_index import ScanIndex
+
+SECTION_TITLE = "## Обратные ссылки"
+# Документы обрабатываются порциями, чтобы не держать весь план в памяти
+CHUNK_DOCS = 1000
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def backlinks(index, path):
+    """Входящие ссылки на документ: [(документ-источник, текст ссылки), ...]"""
+    return links_to(index, os.path.normpath(path))
+
+
+def iter_backlinks(index):
+    """
+    (документ, [(источник, текст), ...]) для всех документов графа, на которые
+    кто-то ссылается, - одним упорядоченным проходом по индексу целей.
+    Каждый источник указывается один раз, с текстом первой ссылки.
+    """
+    rows = index.db.execute("""
+        SELECT l.resolved, l.source, l.text FROM links l
+        JOIN link_docs d ON d.path = l.resolved
+        WHERE l.source != l.resolved
+        ORDER BY l.resolved, l.source, l.position
+    """)
+    for target, group in groupby(rows, key=lambda row: row[0]):
+        inbound = []
+        last_source = None
+        for _, source, text in group:
+            if source != last_source:
+                inbound.append((source, text))
+                last_source = source
+        yield target, inbound
+
+
+def render_section(path, inbound):
+    """Раздел обратных ссылок для документа path (ссылки относительно его папки)"""
+    folder = os.path.dirname(path) or "."
+    lines = [BACKLINKS_START, SECTION_TITLE, ""]
+    for source, text in inbound:
+        rel = os.path.relpath(source, folder).replace(os.sep, "/")
+        lines.append(f"- [{source}]({rel}) — {WHITESPACE.sub(' ', text).strip()}")
+    lines.append(BACKLINKS_END)
+    return "\n".join(lines)
+
+
+def apply_section(content, section):
+    """Заменяет (или добавляет в конец) раздел обратных ссылок; section=None - убирает его"""
+    start = content.find(BACKLINKS_START)
+    if start >= 0:
+        end = content.find(BACKLINKS_END, start)
+        end = len(content) if end < 0 else end + len(BACKLINKS_END)
+        head, tail = content[:start].rstrip(), content[end:].lstrip("\n")
+    else:
+        head, tail = content.rstrip(), ""
+    if section is None:
+        return head + "\n" + tail if tail else head + "\n"
+    return head + "\n\n" + section + "\n" + ("\n" + tail if tail else "")
+
+
+def _update_document(root_path, path, section, write):
+    """Возвращает path, если раздел документа нужно менять (и при write меняет его)"""
+    full_path = os.path.join(root_path, path)
+    try:
+        with open(full_path, encoding="utf-8") as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    updated = apply_section(content, section)
+    if updated == content:
+        return None
+    if write:
+        atomic_write_text(full_path, updated)
+    return path
+
+
+def write_backlink_sections(index, root_path=None, write=False, workers=None):
+    """
+    Приводит разделы обратных ссылок всех документов в соответствие с графом.
+    Документы без изменений не перезаписываются; у документов, на которые больше
+    никто не ссылается, ранее записанный раздел убирается.
+    write=False - только план. Возвращает {"documents": N, "changed": [пути]}.
+    """
+    root = root_path or index.root()
+    db = index.db
+    previous = {row[0] for row in db.execute("SELECT path FROM backlink_docs")}
+    current = set()
+    changed = []
+
+    def plan():
+        for path, inbound in iter_backlinks(index):
+            current.add(path)
+            yield path, render_section(path, inbound)
+        for path in sorted(previous - current):
+            yield path, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        items = plan()
+        while True:
+            chunk = list(islice(items, CHUNK_DOCS))
+            if not chunk:
+                break
+            for path in pool.map(lambda item: _update_document(root, item[0], item[1], write), chunk):
+                if path is not None:
+                    changed.append(path)
+
+    if write:
+        with db:
+            db.execute("DELETE FROM backlink_docs")
+            db.executemany("INSERT INTO backlink_docs VALUES (?)", [(path,) for path in current])
+    return {"documents": len(current), "changed": changed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обратные ссылки между документами архива")
+    parser.add_argument("paths", nargs="*", help="документы, для которых показать входящие ссылки")
+    parser.add_argument("--all", action="store_true",
+                        help="разделы обратных ссылок для всех документов (без --write - только план)")
+    parser.add_argument("--write", action="store_true", help="записать разделы в документы")
+    parser.add_argument("--index", help="путь к индексу сканирования (по умолчанию - индекс корня архива)")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    if not args.paths and not args.all:
+        parser.error("укажите документы или --all")
+
+    with ScanIndex(args.index) as index:
+        index.refresh(".", verify_files=True)
+        update_link_graph(index, ".", args.workers)
+
+        for path in args.paths:
+            rel_path = os.path.relpath(os.path.abspath(path))
+            inbound = backlinks(index, rel_path)
+            print(f"\n🔗 {rel_path}: входящих ссылок {len(inbound)}")
+            for source, text in inbound:
+                print(f"   ← {source}: {text}")
+
+        if args.all:
+            result = write_backlink_sections(index, ".", write=args.write, workers=args.workers)
+            print(f"\n📚 Документов с обратными ссылками: {result['documents']}")
+            if args.write:
+                print(f"✏️  Обновлено документов: {len(result['changed'])}")
+            else:
+                print(f"📝 Будет обновлено документов: {len(result['changed'])} (запустите с --write)")
+                for path in result["changed"][:10]:
+                    print(f"   - {path}")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+bench_scanner.py - Замеры скорости сканера архива
+Версия: 0.3.0
+Назначение: Сравнение старого двойного rglob-обхода с однопроходным обходчиком
+на синтетическом дереве (по умолчанию 1 000 000 файлов) и замер
+повторного сканирования через постоянный индекс и проверки README
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from archive_walker import IGNORE_FOLDERS, walk_archive
+from scan_index import ScanIndex
+
+FILES_PER_FOLDER = 100
+
+
+def make_synthetic_tree(root, total_files, ignored_share=0.8):
+    """
+    Создаёт синтетический архив: часть файлов - документы проекта,
+    остальное - содержимое .git и двух виртуальных окружений.
+    """
+    root = Path(root)
+    ignored = int(total_files * ignored_share)
+    docs = total_files - ignored
+    ignored_roots = [
+        root / ".git" / "objects",
+        root / "venv" / "lib" / "site-packages",
+        root / "myenv" / "lib" / "site-packages",
+    ]
+
+    def fill(base, count, suffix):
+        for start in range(0, count, FILES_PER_FOLDER):
+            folder = base / f"d{start // FILES_PER_FOLDER:05d}"
+            folder.mkdir(parents=True, exist_ok=True)
+            for i in range(min(FILES_PER_FOLDER, count - start)):
+                (folder / f"f{i:03d}{suffix}").touch()
+
+    per_ignored = ignored // len(ignored_roots)
+    for i, base in enumerate(ignored_roots):
+        count = per_ignored if i < len(ignored_roots) - 1 else ignored - per_ignored * i
+        fill(base, count, ".py")
+    fill(root / "concepts", docs, ".md")
+
+
+def legacy_scan(root_path):
+    """
+    Прежний алгоритм scan_archive: два rglob и фильтрация уже после обхода
+    (по тому же списку папок, что и у обходчика, чтобы сравнивать одну и ту же работу)
+    """
+    root = Path(root_path)
+    ignore_folders = IGNORE_FOLDERS
+    total_files = 0
+    markdown_files = []
+    for file_path in root.rglob("*"):
+        if file_path.is_file():
+            if any(part in ignore_folders for part in file_path.parts):
+                continue
+            total_files += 1
+            if file_path.suffix == ".md":
+                markdown_files.append(file_path)
+    folders = []
+    for folder in root.rglob("*/"):
+        if folder.is_dir():
+            if any(part in ignore_folders for part in folder.parts):
+                continue
+            folders.append(str(folder.relative_to(root)))
+    return total_files, len(markdown_files), len(folders)
+
+
+def walker_scan(root_path):
+    """Новый алгоритм: один проход os.scandir с отсечением папок"""
+    total_files = markdown = folders = 0
+    for entry in walk_archive(root_path):
+        if entry.is_dir:
+            folders += 1
+            continue
+        total_files += 1
+        if entry.name.endswith(".md"):
+            markdown += 1
+    return total_files, markdown, folders
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_walk(total_files, keep=None):
+    """Замер обхода; возвращает (старое время, новое время)"""
+    workdir = keep or tempfile.mkdtemp(prefix="archive-bench-")
+    try:
+        if not os.path.exists(os.path.join(workdir, "concepts")):
+            print(f"🏗️  Создаю синтетическое дерево: {total_files} файлов в {workdir}")
+            _, spent = timed(make_synthetic_tree, workdir, total_files)
+            print(f"   готово за {spent:.1f} с")
+
+        # Прогреваем кэш каталогов, чтобы сравнение было честным
+        walker_scan(workdir)
+
+        legacy, legacy_time = timed(legacy_scan, workdir)
+        walker, walker_time = timed(walker_scan, workdir)
+        assert legacy == walker, f"Результаты расходятся: {legacy} != {walker}"
+
+        print(f"\n📊 ОБХОД АРХИВА ({total_files} файлов):")
+        print(f"   rglob x2 (старый):     {legacy_time:8.2f} с")
+        print(f"   os.scandir (новый):    {walker_time:8.2f} с")
+        print(f"   Ускорение:             {legacy_time / walker_time:8.1f}x")
+        return legacy_time, walker_time
+    finally:
+        if keep is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_index(total_files, keep=None):
+    """Замер постоянного индекса: первое заполнение, повтор без изменений, повтор после правки"""
+    workdir = keep or tempfile.mkdtemp(prefix="archive-bench-")
+    index_path = os.path.join(tempfile.mkdtemp(prefix="archive-index-"), "scan_index.db")
+    try:
+        if not os.path.exists(os.path.join(workdir, "concepts")):
+            print(f"🏗️  Создаю синтетическое дерево: {total_files} документов в {workdir}")
+            _, spent = timed(make_synthetic_tree, workdir, total_files, 0.0)
+            print(f"   готово за {spent:.1f} с")
+
+        with ScanIndex(index_path) as index:
+            _, first = timed(index.refresh, workdir)
+            # Второй проход снимает пометку "свежих" папок после первого заполнения
+            time.sleep(2)
+            index.refresh(workdir)
+            _, unchanged = timed(index.refresh, workdir)
+            Path(workdir, "concepts", "d00000", "new-doc.md").touch()
+            stats, edited = timed(index.refresh, workdir)
+
+        print(f"\n📊 ИНДЕКС СКАНИРОВАНИЯ ({total_files} файлов):")
+        print(f"   первое заполнение:      {first:8.2f} с")
+        print(f"   без изменений:          {unchanged:8.3f} с")
+        print(f"   после одной правки:     {edited:8.3f} с  {stats}")
+        return first, unchanged, edited
+    finally:
+        shutil.rmtree(os.path.dirname(index_path), ignore_errors=True)
+        if keep is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def make_folder_tree(root, total_folders, with_readme_share=0.5):
+    """Создаёт дерево из папок с одним документом; в части папок есть README.md"""
+    root = Path(root)
+    with_readme = int(total_folders * with_readme_share)
+    for i in range(total_folders):
+        folder = root / "concepts" / f"g{i // 1000:03d}" / f"d{i:06d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / "doc.md").touch()
+        if i < with_readme:
+            (folder / "README.md").touch()
+
+
+def legacy_readme_check(root_path):
+    """Прежняя проверка: отдельный exists() на README для каждой папки"""
+    root = Path(root_path)
+    folders = [entry.rel_path for entry in walk_archive(root) if entry.is_dir]
+    return sorted(folder for folder in folders if not (root / folder / "README.md").exists())
+
+
+def listing_readme_check(root_path):
+    """Новая проверка: имена файлов берутся из уже прочитанного каталога"""
+    return sorted(entry.rel_path for entry in walk_archive(root_path)
+                  if entry.is_dir and "README.md" not in entry.files)
+
+
+def bench_readme(total_folders, keep=None):
+    """Замер проверки README на дереве из total_folders папок"""
+    workdir = keep or tempfile.mkdtemp(prefix="archive-bench-")
+    try:
+        if not os.path.exists(os.path.join(workdir, "concepts")):
+            print(f"🏗️  Создаю дерево: {total_folders} папок в {workdir}")
+            _, spent = timed(make_folder_tree, workdir, total_folders)
+            print(f"   готово за {spent:.1f} с")
+
+        listing_readme_check(workdir)
+        legacy, legacy_time = timed(legacy_readme_check, workdir)
+        listing, listing_time = timed(listing_readme_check, workdir)
+        assert legacy == listing, "Результаты проверки README расходятся"
+
+        print(f"\n📊 ПРОВЕРКА README ({total_folders} папок, без README: {len(listing)}):")
+        print(f"   exists() на папку (старый):   {legacy_time:8.2f} с")
+        print(f"   из листинга (новый):          {listing_time:8.2f} с")
+        print(f"   Ускорение:                    {legacy_time / listing_time:8.1f}x")
+        return legacy_time, listing_time
+    finally:
+        if keep is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры скорости сканера архива")
+    parser.add_argument("--files", type=int, default=1_000_000,
+                        help="размер синтетического дерева (по умолчанию 1 000 000)")
+    parser.add_argument("--keep", metavar="DIR",
+                        help="создать/переиспользовать дерево в DIR и не удалять его")
+    parser.add_argument("--index", action="store_true",
+                        help="замерить постоянный индекс вместо обхода")
+    parser.add_argument("--readme", type=int, metavar="FOLDERS",
+                        help="замерить проверку README на дереве из FOLDERS папок (например, 100000)")
+    args = parser.parse_args()
+
+    if args.readme:
+        bench_readme(args.readme, args.keep)
+    elif args.index:
+        bench_index(args.files, args.keep)
+    else:
+        bench_walk(args.files, args.keep)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+bench_suite.py - Набор замеров инструментов Садовода
+Версия: 0.1.1
+Назначение: Прогон scan_archive, link_checker, collect_corpus и add_metadata
+на синтетических архивах разного размера с записью времени, пикового RSS
+и числа системных вызовов; сравнение с сохранёнными базовыми значениями
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_archive import generate_archive
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(CORE_DIR)
+BASELINE_PATH = os.path.join(CORE_DIR, "bench_baselines.json")
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# Изменения меньше этих величин считаются шумом, а не регрессией
+MIN_DELTA = {"seconds": 0.25, "peak_rss_kb": 10 * 1024}
+
+# Инструмент -> скрипт и аргументы; запускаются из корня синтетического архива.
+# add_metadata правит документы, поэтому идёт последним.
+TOOLS = {
+    "scan_archive": [os.path.join(CORE_DIR, "scanner_v2.py"), "--no-index"],
+    "link_checker": [os.path.join(CORE_DIR, "link_checker.py")],
+    "collect_corpus": [os.path.join(REPO_ROOT, "collect_corpus.py")],
+    # Индекс - внутри синтетического архива, чтобы не сбрасывать индекс самого архива
+    "add_metadata": [os.path.join(CORE_DIR, "add_metadata.py"), "--index", os.path.join(".cache", "scan_index.db")],
+}
+
+# Обёртка запускает скрипт как __main__ и при выходе сохраняет счётчики
+# чтений/записей из /proc/self/io (syscr/syscw) в файл из BENCH_IO_PATH.
+RUNNER = """
+import atexit, json, os, runpy, sys
+
+def dump_io():
+    try:
+        with open("/proc/self/io") as f:
+            io = dict(line.split(": ") for line in f.read().splitlines())
+        with open(os.environ["BENCH_IO_PATH"], "w") as f:
+            json.dump({k: int(v) for k, v in io.items()}, f)
+    except OSError:
+        pass
+
+atexit.register(dump_io)
+script = sys.argv[1]
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(script))
+runpy.run_path(script, run_name="__main__")
+"""
+
+
+def run_tool(name, archive_root, use_strace=False):
+    """Запускает инструмент в отдельном процессе и возвращает его метрики"""
+    io_fd, io_path = tempfile.mkstemp(prefix="bench-io-", suffix=".json")
+    os.close(io_fd)
+    strace_path = io_path + ".strace"
+    cmd = [sys.executable, "-c", RUNNER] + TOOLS[name]
+    if use_strace:
+        cmd = ["strace", "-f", "-c", "-o", strace_path] + cmd
+    env = dict(os.environ, BENCH_IO_PATH=io_path)
+    try:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=archive_root, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # wait4 даёт rusage именно этого процесса, а не всех детей сразу
+        _, status, rusage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        stderr = proc.stderr.read().decode("utf-8", "replace")
+        proc.stderr.close()
+
+        result = {
+            "seconds": round(seconds, 3),
+            "peak_rss_kb": rusage.ru_maxrss,
+            "exit_code": proc.returncode,
+        }
+        try:
+            with open(io_path) as f:
+                io = json.load(f)
+            result["read_syscalls"] = io.get("syscr")
+            result["write_syscalls"] = io.get("syscw")
+        except (OSError, ValueError):
+            pass
+        if use_strace:
+            result["syscalls"] = _strace_total(strace_path)
+        if proc.returncode != 0:
+            result["error"] = stderr.strip().splitlines()[-1:] or ["неизвестная ошибка"]
+        return result
+    finally:
+        for path in (io_path, strace_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def _strace_total(path):
+    """Итоговое число вызовов из сводки strace -c"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.strip().endswith("total"):
+                    return int(line.split()[2])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def run_suite(sizes, tools, use_strace=False, workdir=None):
+    """Прогоняет инструменты на архивах заданных размеров; возвращает {инструмент: {размер: метрики}}"""
+    results = {name: {} for name in tools}
+    for size in sizes:
+        archive_root = tempfile.mkdtemp(prefix=f"garden-{size}-", dir=workdir)
+        try:
+            print(f"\n🏗️  Синтетический архив: {size} документов")
+            start = time.perf_counter()
+            generate_archive(archive_root, size)
+            print(f"   создан за {time.perf_counter() - start:.1f} с")
+            for name in TOOLS:
+                if name not in tools:
+                    continue
+                metrics = run_tool(name, archive_root, use_strace)
+                results[name][str(size)] = metrics
+                syscalls = metrics.get("syscalls", metrics.get("read_syscalls"))
+                print(f"   {name:15s} {metrics['seconds']:9.2f} с  "
+                      f"RSS {metrics['peak_rss_kb'] / 1024:8.1f} МБ  вызовов {syscalls}"
+                      + (f"  ❌ {metrics['error'][0]}" if "error" in metrics else ""))
+        finally:
+            shutil.rmtree(archive_root, ignore_errors=True)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Возвращает список регрессий: время или память выросли больше чем на tolerance"""
+    regressions = []
+    for name, per_size in results.items():
+        for size, metrics in per_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if not base:
+                continue
+            for key in ("seconds", "peak_rss_kb"):
+                if (base.get(key) and metrics[key] > base[key] * (1 + tolerance)
+                        and metrics[key] - base[key] > MIN_DELTA[key]):
+                    regressions.append(f"{name} @ {size}: {key} {base[key]} -> {metrics[key]}")
+    return regressions
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """
+    Записывает результаты как базовые. Размеры и инструменты, не входившие
+    в этот прогон, остаются из прежней базы.
+    """
+    merged = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for name, per_size in json.load(f).get("results", {}).items():
+                merged[name] = dict(per_size)
+    for name, per_size in results.items():
+        merged.setdefault(name, {}).update(per_size)
+    baseline = {"machine": platform.platform(), "python": platform.python_version(),
+                "results": merged}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    return baseline
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры инструментов на синтетических архивах")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="размеры архива в документах (по умолчанию 1k 10k 100k 1M)")
+    parser.add_argument("--tools", nargs="+", choices=list(TOOLS), default=list(TOOLS))
+    parser.add_argument("--strace", action="store_true",
+                        help="считать все системные вызовы через strace -c (медленнее)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="сохранить результаты как базовые в bench_baselines.json")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="допустимый рост времени и памяти относительно базы (0.25 = 25%%)")
+    parser.add_argument("--workdir", help="где создавать временные архивы")
+    args = parser.parse_args()
+
+    if args.strace and not shutil.which("strace"):
+        parser.error("strace не найден")
+
+    results = run_suite(args.sizes, args.tools, args.strace, args.workdir)
+
+    if args.save_baseline:
+        save_baseline(results)
+        print(f"\n💾 Базовые значения сохранены: {BASELINE_PATH}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠️  РЕГРЕССИИ (допуск {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"\n✅ Регрессий относительно базы нет (допуск {args.tolerance:.0%})")
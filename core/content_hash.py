@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+content_hash.py - Хэши содержимого документов
+Версия: 0.1.1
+Назначение: BLAKE2-хэши файлов архива с кэшем в индексе сканирования,
+поиск дубликатов и изменённых файлов
+"""
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1 << 20
+# Файлы крупнее порога читаются через mmap, мелкие - одним буфером
+MMAP_THRESHOLD = 8 << 20
+DIGEST_SIZE = 20
+
+
+def hash_file(path):
+    """BLAKE2b-хэш содержимого файла (hex)"""
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        else:
+            buf = bytearray(CHUNK_SIZE)
+            view = memoryview(buf)
+            while True:
+                read = f.readinto(buf)
+                if not read:
+                    break
+                digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def update_hashes(index, root_path=None, workers=None, suffix=None, paths=None):
+    """
+    Хэширует файлы индекса, у которых (size, mtime_ns) не совпадает с кэшем,
+    в пуле потоков. Индекс должен быть свежим: refresh(verify_files=True).
+    suffix - хэшировать только файлы с этим расширением (например, ".md"),
+    paths - только эти файлы (множество путей).
+    Возвращает {"hashed": N, "new": [...], "changed": [...]}.
+    """
+    root = root_path or index.root()
+    db = index.db
+    with db:
+        # Удалённые файлы больше не участвуют в поиске дубликатов
+        db.execute("DELETE FROM hashes WHERE path NOT IN (SELECT path FROM files)")
+        stale = db.execute("""
+            SELECT f.path, f.size, f.mtime_ns, h.digest
+            FROM files f LEFT JOIN hashes h ON h.path = f.path
+            WHERE (h.path IS NULL OR h.size != f.size OR h.mtime_ns != f.mtime_ns)
+              AND (? IS NULL OR f.suffix = ?)
+        """, (suffix, suffix)).fetchall()
+        if paths is not None:
+            stale = [row for row in stale if row[0] in paths]
+
+        def work(row):
+            path = row[0]
+            try:
+                return row, hash_file(os.path.join(root, path))
+            except OSError:
+                return row, None
+
+        result = {"hashed": 0, "new": [], "changed": []}
+        rows = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for (path, size, mtime_ns, old_digest), digest in pool.map(work, stale):
+                if digest is None:
+                    continue
+                result["hashed"] += 1
+                rows.append((path, size, mtime_ns, digest))
+                if old_digest is None:
+                    result["new"].append(path)
+                elif old_digest != digest:
+                    result["changed"].append(path)
+        db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", rows)
+    result["new"].sort()
+    result["changed"].sort()
+    return result
+
+
+def find_duplicates(index):
+    """Группы путей с одинаковым содержимым (пустые файлы не считаются)"""
+    groups = {}
+    for digest, path in index.db.execute("""
+        SELECT digest, path FROM hashes
+        WHERE size > 0 AND digest IN (
+            SELECT digest FROM hashes WHERE size > 0 GROUP BY digest HAVING COUNT(*) > 1)
+        ORDER BY digest, path
+    """):
+        groups.setdefault(digest, []).append(path)
+    return sorted(groups.values())
+
+
+def file_digests(index):
+    """Словарь путь -> хэш из кэша (для инструментов, которым нужны только изменённые файлы)"""
+    return dict(index.db.execute("SELECT path, digest FROM hashes"))
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+corpus_builder.py - Сборка текстового корпуса архива
+Версия: 0.2.0
+Назначение: Потоковая сборка docs/corpus.txt (collect_corpus.py): файлы
+архива обходятся по порядку без служебных папок (venv, myenv, .git, ...),
+каждый очищается построчно и сразу пишется в выходной файл, первые
+SHORT_LIMIT байт корпуса попутно собираются в corpus_short.txt.
+Память не растёт с размером корпуса: в ней одна строка файла и начало корпуса.
+Пропущенные и нечитаемые (не UTF-8) файлы попадают в отчёт.
+Корпус - последовательность сегментов (заголовок и текст файла), манифест
+corpus_manifest.ndjson хранит путь, хэш, смещение и длину каждого: при
+пересборке сегменты неизменённых файлов копируются из старого корпуса
+(copy_file_range), а по манифесту можно прочитать любой документ корпуса
+(read_segment), не просматривая весь файл. Старый и новый манифесты
+идут в порядке обхода и сверяются слиянием, в память целиком не загружаются.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+from collections import namedtuple
+
+from archive_walker import IGNORE_FOLDERS, list_dir
+from atomic_io import atomic_open, atomic_write_bytes
+from content_hash import DIGEST_SIZE, hash_file
+
+CORPUS_SUFFIXES = frozenset({'.md', '.txt', '.py', '.js', '.html'})
+DEFAULT_OUTPUT = os.path.join("docs", "corpus.txt")
+SHORT_NAME = "corpus_short.txt"
+MANIFEST_NAME = "corpus_manifest.ndjson"
+# Меняется вместе с правилами очистки и заголовком: старые сегменты тогда не переиспользуются
+MANIFEST_FORMAT = 1
+# Первая строка манифеста дополняется пробелами до этой длины: сводка
+# дописывается в начало, когда корпус уже собран
+MANIFEST_HEADER_WIDTH = 127
+# Размер краткой версии корпуса, байты
+SHORT_LIMIT = 5000
+SHORT_TAIL = "\n[...]"
+RULE = "=" * 60
+# Очищенный текст пишется в корпус кусками примерно такого размера, символы
+WRITE_CHUNK = 1 << 16
+
+# Итог сборки: files - файлов в корпусе, chars / size - символов и байт,
+# skipped - [(путь, причина)] пропущенных файлов, reused - сегментов из старого корпуса
+CorpusStats = namedtuple("CorpusStats", "files chars size skipped reused")
+# Строка манифеста: сегмент файла path занимает байты [offset, offset + length) корпуса;
+# size и mtime_ns - файла при сборке (неизменённый файл не хэшируется заново), chars - символов в сегменте
+Segment = namedtuple("Segment", "path digest size mtime_ns offset length chars")
+
+
+def corpus_files(root_path=".", ignore=IGNORE_FOLDERS, suffixes=CORPUS_SUFFIXES, exclude=()):
+    """
+    Пути файлов корпуса (относительно root_path) в порядке обхода:
+    файлы папки по имени, затем её подпапки по имени.
+    В памяти - только содержимое папок на текущем пути обхода.
+    """
+    exclude = {os.path.normpath(path) for path in exclude}
+    stack = [(os.fspath(root_path), "")]
+    while stack:
+        path, rel_path = stack.pop()
+        try:
+            files, subdirs = list_dir(path, rel_path, ignore)
+        except OSError:
+            continue
+        for entry in sorted(files, key=lambda entry: entry.name):
+            if os.path.splitext(entry.name)[1].lower() in suffixes and entry.rel_path not in exclude:
+                yield entry.rel_path
+        for sub in sorted(subdirs, key=lambda entry: entry.name, reverse=True):
+            stack.append((sub.path, sub.rel_path))
+
+
+def clean_lines(lines):
+    """
+    Очищает текст по строкам: две и больше пустых строк подряд сжимаются
+    в одну, пробелы в начале и конце текста убираются. Выдаёт куски текста
+    без перевода строки в конце.
+    """
+    started = False
+    blanks = []
+    last = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line or line.isspace():
+            if started:
+                blanks.append(line)
+            continue
+        if not started:
+            started = True
+            last = line.lstrip()
+            continue
+        yield last + "\n"
+        if len(blanks) == 1:
+            yield blanks[0] + "\n"
+        elif blanks:
+            yield "\n"
+        blanks.clear()
+        last = line
+    if last is not None:
+        yield last.rstrip()
+
+
+def _segment_header(rel_path):
+    return f"\n{RULE}\n📄 ФАЙЛ: {rel_path}\n{RULE}\n"
+
+
+class _HashingReader(io.RawIOBase):
+    """Чтение файла с попутным хэшированием: файл читается один раз и для очистки, и для хэша"""
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        read = self.raw.readinto(buffer)
+        if read:
+            self.digest.update(memoryview(buffer)[:read])
+        return read
+
+
+def write_segment(out, full_path, rel_path):
+    """
+    Пишет в out (двоичный файл) очищенный файл с заголовком.
+    Возвращает (число символов или 0, если файл пуст; хэш файла, как content_hash.hash_file).
+    При ошибке чтения исключение летит дальше, а out мог получить только часть сегмента.
+    """
+    chars = 0
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    # Строки копятся в небольшой буфер: одна запись на WRITE_CHUNK символов, а не на строку
+    pending = []
+    pending_chars = 0
+    with open(full_path, "rb", buffering=0) as raw:
+        text = io.TextIOWrapper(io.BufferedReader(_HashingReader(raw, digest)), encoding="utf-8")
+        for piece in clean_lines(text):
+            if not chars:
+                piece = _segment_header(rel_path) + piece
+            pending.append(piece)
+            pending_chars += len(piece)
+            chars += len(piece)
+            if pending_chars >= WRITE_CHUNK:
+                out.write("".join(pending).encode("utf-8"))
+                pending.clear()
+                pending_chars = 0
+    if pending:
+        out.write("".join(pending).encode("utf-8"))
+    return chars, digest.hexdigest()
+
+
+def copy_range(src_fd, dst_fd, offset, length, dst_offset):
+    """
+    Копирует length байт src_fd с offset в dst_fd с dst_offset внутри ядра:
+    copy_file_range, где его нет - sendfile, иначе обычным чтением.
+    """
+    done = 0
+    copy = getattr(os, "copy_file_range", None)
+    while done < length and copy:
+        try:
+            copied = copy(src_fd, dst_fd, length - done, offset + done, dst_offset + done)
+        except OSError:
+            # Разные файловые системы, старое ядро: копируем дальше иначе
+            break
+        if not copied:
+            break
+        done += copied
+    if done < length:
+        # sendfile пишет с текущей позиции dst_fd
+        os.lseek(dst_fd, dst_offset + done, os.SEEK_SET)
+        try:
+            while done < length:
+                copied = os.sendfile(dst_fd, src_fd, offset + done, length - done)
+                if not copied:
+                    break
+                done += copied
+        except OSError:
+            pass
+    while done < length:
+        data = os.pread(src_fd, min(length - done, 1 << 20), offset + done)
+        if not data:
+            raise OSError(f"корпус короче манифеста: {offset + done}")
+        os.pwrite(dst_fd, data, dst_offset + done)
+        done += len(data)
+
+
+def manifest_path(output=DEFAULT_OUTPUT):
+    return os.path.join(os.path.dirname(os.path.abspath(output)), MANIFEST_NAME)
+
+
+def iter_manifest(output=DEFAULT_OUTPUT):
+    """
+    Сегменты корпуса output по манифесту, в порядке корпуса. Ничего, если манифеста нет
+    либо он не относится к этому корпусу (корпус изменён или собран по другим правилам).
+    """
+    try:
+        with open(manifest_path(output), encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            st = os.stat(output)
+            if (header.get("format") != MANIFEST_FORMAT or header.get("size") != st.st_size
+                    or header.get("mtime_ns") != st.st_mtime_ns):
+                return
+            for line in f:
+                yield Segment(**json.loads(line))
+    except (OSError, ValueError, TypeError):
+        return
+
+
+def load_manifest(output=DEFAULT_OUTPUT):
+    """Манифест корпуса output: {путь: Segment}; пустой, если манифеста нет или он устарел"""
+    return {segment.path: segment for segment in iter_manifest(output)}
+
+
+def read_segment(path, output=DEFAULT_OUTPUT, manifest=None):
+    """Текст документа path в корпусе (с заголовком) по манифесту или None, если его там нет"""
+    manifest = manifest if manifest is not None else load_manifest(output)
+    segment = manifest.get(path)
+    if segment is None:
+        return None
+    fd = os.open(output, os.O_RDONLY)
+    try:
+        return os.pread(fd, segment.length, segment.offset).decode("utf-8")
+    finally:
+        os.close(fd)
+
+
+def _order_key(rel_path):
+    """Ключ порядка corpus_files: в папке сначала файлы по имени, потом подпапки по имени"""
+    parts = rel_path.split(os.sep)
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+class _ShortWriter:
+    """Обёртка выходного файла: первые limit байт корпуса копируются в head"""
+
+    def __init__(self, out, limit):
+        self.out = out
+        self.limit = limit
+        self.head = bytearray()
+
+    def write(self, data):
+        if len(self.head) < self.limit:
+            self.head += data[:self.limit - len(self.head)]
+        self.out.write(data)
+
+    def tell(self):
+        return self.out.tell()
+
+    def copy_from(self, src_fd, offset, length):
+        """Дописывает length байт другого файла с offset, минуя память процесса"""
+        self.out.flush()
+        start = self.out.tell()
+        copy_range(src_fd, self.out.fileno(), offset, length, start)
+        self.out.seek(start + length)
+        if len(self.head) < self.limit:
+            self.head += os.pread(src_fd, min(length, self.limit - len(self.head)), offset)
+
+    def rollback(self, offset):
+        """Отбрасывает всё, что записано после offset"""
+        self.out.seek(offset)
+        self.out.truncate()
+        del self.head[offset:]
+
+
+def _unchanged(old, full_path):
+    """Сегмент old, если файл с тех пор не изменился: сначала по size и mtime, затем по хэшу"""
+    if old is None:
+        return None
+    st = os.stat(full_path)
+    if (old.size, old.mtime_ns) == (st.st_size, st.st_mtime_ns):
+        return old
+    if hash_file(full_path) == old.digest:
+        return old._replace(mtime_ns=st.st_mtime_ns)
+    return None
+
+
+def build_corpus(root_path=".", output=DEFAULT_OUTPUT, short_limit=SHORT_LIMIT, on_file=None, full=False):
+    """
+    Собирает корпус в output, краткую версию и манифест рядом (corpus_short.txt, corpus_manifest.ndjson).
+    Сегменты файлов, не изменившихся с прошлой сборки, копируются из старого корпуса;
+    full=True - очистить все файлы заново.
+    Файлы, которые не читаются или не в UTF-8, пропускаются целиком.
+    on_file(путь, переиспользован ли сегмент) вызывается для каждого файла, попавшего в корпус.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output))
+    os.makedirs(output_dir, exist_ok=True)
+    short_path = os.path.join(output_dir, SHORT_NAME)
+    exclude = [os.path.relpath(path, root_path) for path in (output, short_path, manifest_path(output))]
+    files = chars = reused = 0
+    skipped = []
+    # Старый корпус остаётся открытым: atomic_open подменит файл, но не его содержимое
+    try:
+        old_fd = None if full else os.open(output, os.O_RDONLY)
+    except FileNotFoundError:
+        old_fd = None
+    previous = iter_manifest(output)
+    old = next(previous, None) if old_fd is not None else None
+    try:
+        with atomic_open(manifest_path(output), "wb") as manifest:
+            manifest.write(b" " * MANIFEST_HEADER_WIDTH + b"\n")
+            with atomic_open(output, "wb") as f:
+                out = _ShortWriter(f, short_limit)
+                for rel_path in corpus_files(root_path, exclude=exclude):
+                    full_path = os.path.join(root_path, rel_path)
+                    # Оба манифеста - в порядке обхода: пропускаем сегменты исчезнувших файлов
+                    key = _order_key(rel_path)
+                    while old is not None and _order_key(old.path) < key:
+                        old = next(previous, None)
+                    start = out.tell()
+                    if files:
+                        out.write(b"\n")
+                    offset = out.tell()
+                    try:
+                        segment = _unchanged(old if old is not None and old.path == rel_path else None, full_path)
+                        if segment is not None:
+                            out.copy_from(old_fd, segment.offset, segment.length)
+                        else:
+                            st = os.stat(full_path)
+                            written, digest = write_segment(out, full_path, rel_path)
+                            segment = Segment(rel_path, digest, st.st_size, st.st_mtime_ns, None, None, written)
+                    except UnicodeDecodeError as e:
+                        out.rollback(start)
+                        skipped.append((rel_path, f"не UTF-8 (байт {e.start})"))
+                        continue
+                    except OSError as e:
+                        out.rollback(start)
+                        skipped.append((rel_path, f"ошибка чтения: {e.strerror or e}"))
+                        continue
+                    if not segment.chars:
+                        out.rollback(start)
+                        skipped.append((rel_path, "пустой"))
+                        continue
+                    is_reused = segment.offset is not None
+                    segment = segment._replace(offset=offset, length=out.tell() - offset)
+                    manifest.write(json.dumps(segment._asdict(), ensure_ascii=False).encode("utf-8") + b"\n")
+                    chars += segment.chars + (1 if files else 0)
+                    files += 1
+                    reused += is_reused
+                    if on_file:
+                        on_file(rel_path, is_reused)
+                size = out.tell()
+                head = bytes(out.head)
+            # Сводка - для проверки, что манифест описывает именно этот корпус
+            st = os.stat(output)
+            header = {"format": MANIFEST_FORMAT, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "files": files}
+            manifest.seek(0)
+            manifest.write(json.dumps(header).encode("utf-8").ljust(MANIFEST_HEADER_WIDTH))
+    finally:
+        previous.close()
+        if old_fd is not None:
+            os.close(old_fd)
+    # Обрезанный на середине символ отбрасывается
+    short = head.decode("utf-8", "ignore") + SHORT_TAIL
+    atomic_write_bytes(short_path, short.encode("utf-8"))
+    return CorpusStats(files, chars, size, skipped, reused)
+
+
+def main(root_path=".", output=DEFAULT_OUTPUT, quiet=False, full=False):
+    def report(path, reused):
+        if not quiet:
+            print(f"{'=' if reused else '✓'} {path}")
+
+    stats = build_corpus(root_path, output, on_file=report, full=full)
+    for path, reason in stats.skipped:
+        if reason != "пустой":
+            print(f"⚠️  {path} - {reason}")
+    empty = sum(reason == "пустой" for _, reason in stats.skipped)
+    print(f"\n✅ {output} создан: файлов {stats.files}, {stats.chars} символов ({stats.size} байт)")
+    print(f"   сегментов из прошлой сборки: {stats.reused}, очищено заново: {stats.files - stats.reused}")
+    print(f"   пропущено: {len(stats.skipped) - empty} нечитаемых, {empty} пустых")
+
+
+def cli(argv=None):
+    """Командная строка corpus_builder.py и collect_corpus.py (argv - аргументы без имени скрипта)"""
+    parser = argparse.ArgumentParser(description="Сборка текстового корпуса архива")
+    parser.add_argument("--root", default=".", help="корень архива")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="файл корпуса")
+    parser.add_argument("--quiet", action="store_true", help="не печатать каждый файл")
+    parser.add_argument("--full", action="store_true", help="очистить все файлы заново, не копируя старые сегменты")
+    parser.add_argument("--show", metavar="ПУТЬ", help="вывести сегмент документа из корпуса по манифесту")
+    args = parser.parse_args(argv)
+    if args.show:
+        text = read_segment(args.show, args.output)
+        if text is None:
+            parser.exit(1, f"{args.show}: нет в манифесте корпуса\n")
+        print(text)
+    else:
+        main(args.root, args.output, args.quiet, args.full)
+
+
+if __name__ == "__main__":
+    cli()
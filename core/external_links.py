@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+external_links.py - Проверка внешних ссылок
+Версия: 0.1.0
+Назначение: Асинхронная проверка http/https ссылок архива (link_checker.py --external).
+Запросы идут через общий пул соединений requests.Session в пуле потоков,
+одновременных запросов к одному хосту не больше PER_HOST. Сначала HEAD,
+при ошибке - GET без чтения тела (многие серверы не поддерживают HEAD).
+Результаты хранятся в core/.cache/url_cache.db: каждый адрес проверяется
+не чаще раза в TTL. Для проверки без сети есть локальный сервер-заглушка (stub_server).
+requests загружается при первом запросе: импорт модуля (кэш, normalize_url) его не требует.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from scan_index import CACHE_DIR
+
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "url_cache.db")
+
+# Результат проверки живёт в кэше неделю; временные сбои перепроверяются раньше
+TTL = 7 * 24 * 3600
+RETRY_TTL = 6 * 3600
+# Всего одновременных запросов и запросов к одному хосту
+CONCURRENCY = 64
+PER_HOST = 4
+# Таймаут соединения и чтения, секунды
+TIMEOUT = 10
+USER_AGENT = "Transcendent-Rationalism-Archive link checker"
+# Текст ошибки в отчёте обрезается до этой длины
+ERROR_LENGTH = 160
+
+# Статусы: адрес отвечает / сервер ответил ошибкой (404, 410, ...) /
+# временный сбой: нет соединения, таймаут, 429 или 5xx - ссылка может быть жива
+OK = "ok"
+URL_BROKEN = "url_broken"
+URL_UNREACHABLE = "url_unreachable"
+
+UrlResult = namedtuple("UrlResult", "url status code final_url error checked_at")
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    status TEXT,
+    code INTEGER,
+    final_url TEXT,
+    error TEXT,
+    checked_at REAL
+);
+"""
+
+
+def normalize_url(target):
+    """Адрес для проверки из цели ссылки: без <>, заголовка "..." и якоря"""
+    target = target.strip()
+    if target.startswith('<') and target.endswith('>'):
+        target = target[1:-1]
+    elif '"' in target:
+        target = target.split(' "', 1)[0]
+    return target.partition('#')[0]
+
+
+def _status(code):
+    if code < 400:
+        return OK
+    if code == 429 or code >= 500:
+        return URL_UNREACHABLE
+    return URL_BROKEN
+
+
+def _error(e):
+    return f"{type(e).__name__}: {e}"[:ERROR_LENGTH]
+
+
+def make_session(per_host=PER_HOST):
+    """Сессия с пулом соединений: по per_host соединений на хост"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=256, pool_maxsize=per_host)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def probe(session, url, timeout=TIMEOUT):
+    """Проверяет один адрес (блокирующий вызов, выполняется в пуле потоков)"""
+    import requests
+
+    code = final_url = error = None
+    for method in ("HEAD", "GET"):
+        try:
+            # stream=True: у GET читаются только заголовки
+            with session.request(method, url, timeout=timeout, allow_redirects=True, stream=True) as response:
+                code, final_url, error = response.status_code, response.url, None
+        except (requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema) as e:
+            # Адрес записан с ошибкой - повтор GET ничего не даст
+            return UrlResult(url, URL_BROKEN, None, None, _error(e), time.time())
+        except requests.RequestException as e:
+            code, final_url, error = None, None, _error(e)
+            if isinstance(e, requests.Timeout):
+                break
+        if code is not None and code < 400:
+            break
+    status = URL_UNREACHABLE if code is None else _status(code)
+    return UrlResult(url, status, code, final_url, error, time.time())
+
+
+async def _check_all(urls, session, concurrency, per_host, timeout):
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+    hosts = {}
+
+    # Свой пул потоков передаётся в run_in_executor явно: пул цикла по умолчанию не подменяется
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def check(url):
+            host = hosts.setdefault(urlsplit(url).netloc.lower(), asyncio.Semaphore(per_host))
+            # Сначала очередь хоста: ждущие одного хоста не занимают общие места
+            async with host, limit:
+                return await loop.run_in_executor(executor, probe, session, url, timeout)
+
+        return await asyncio.gather(*(check(url) for url in urls))
+
+
+class UrlCache:
+    """Кэш результатов проверки: адрес -> UrlResult со временем проверки"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(CACHE_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def fresh(self, urls, ttl=TTL, retry_ttl=RETRY_TTL, now=None):
+        """{адрес: UrlResult} для адресов, чей результат ещё не устарел"""
+        now = time.time() if now is None else now
+        found = {}
+        urls = list(urls)
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            for row in self.db.execute(f"SELECT * FROM urls WHERE url IN ({','.join('?' * len(chunk))})", chunk):
+                result = UrlResult(*row)
+                age = now - result.checked_at
+                if age < (retry_ttl if result.status == URL_UNREACHABLE else ttl):
+                    found[result.url] = result
+        return found
+
+    def store(self, results):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)", results)
+
+    def prune(self, ttl=TTL, now=None):
+        """Удаляет записи старше ttl"""
+        now = time.time() if now is None else now
+        with self.db:
+            return self.db.execute("DELETE FROM urls WHERE checked_at < ?", (now - ttl,)).rowcount
+
+
+def check_urls(urls, cache_path=DEFAULT_CACHE_PATH, ttl=TTL, concurrency=CONCURRENCY, per_host=PER_HOST,
+               timeout=TIMEOUT, session=None):
+    """
+    Проверяет адреса: {адрес: UrlResult}. Свежие результаты берутся из кэша,
+    остальные адреса проверяются асинхронно и сохраняются в кэш.
+    cache_path=None - без кэша.
+    """
+    urls = sorted(set(urls))
+    cache = UrlCache(cache_path) if cache_path else None
+    try:
+        results = cache.fresh(urls, ttl) if cache else {}
+        todo = [url for url in urls if url not in results]
+        if todo:
+            own_session = session is None
+            session = session or make_session(per_host)
+            try:
+                checked = asyncio.run(_check_all(todo, session, concurrency, per_host, timeout))
+            finally:
+                if own_session:
+                    session.close()
+            if cache:
+                cache.store(checked)
+            results.update((result.url, result) for result in checked)
+        return results
+    finally:
+        if cache:
+            cache.close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    Ответы заглушки по пути: /ok, /missing (404), /gone (410), /no-head (405 на HEAD),
+    /redirect (-> /ok), /error (503), /slow (ответ через 0.05 с); остальное - 404
+    """
+
+    def _respond(self, head):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.requests += 1
+        try:
+            path = self.path.split("?", 1)[0]
+            if path == "/slow":
+                time.sleep(0.05)
+            if path == "/redirect":
+                self.send_response(301)
+                self.send_header("Location", "/ok")
+            elif path in ("/ok", "/slow") or (path == "/no-head" and not head):
+                self.send_response(200)
+            elif path == "/no-head":
+                self.send_response(405)
+            elif path == "/gone":
+                self.send_response(410)
+            elif path == "/error":
+                self.send_response(503)
+            else:
+                self.send_response(404)
+            self.send_header("Content-Length", "0")
+        finally:
+            # Запрос считается завершённым до отправки ответа: клиент может
+            # прислать следующий раньше, чем этот поток вернётся сюда
+            with server.lock:
+                server.active -= 1
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stub_server():
+    """Локальный HTTP-сервер заглушка на свободном порту; выдаёт его базовый адрес"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = server.peak = server.requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def stub_servers(count):
+    """Несколько заглушек сразу - разные порты считаются разными хостами"""
+    with ExitStack() as stack:
+        yield [stack.enter_context(stub_server()) for _ in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка внешних ссылок (адреса - аргументами)")
+    parser.add_argument("urls", nargs="*", help="адреса для проверки")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="путь к кэшу результатов")
+    parser.add_argument("--no-cache", action="store_true", help="проверить заново, не используя кэш")
+    parser.add_argument("--per-host", type=int, default=PER_HOST, help="запросов к одному хосту одновременно")
+    args = parser.parse_args()
+
+    results = check_urls(args.urls, None if args.no_cache else args.cache, per_host=args.per_host)
+    for url in sorted(results):
+        result = results[url]
+        print(f"{result.status:16} {result.code or '-':>4} {url} {result.error or ''}")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+file_stats.py - Статистика содержимого архива
+Версия: 0.1.0
+Назначение: Байты, строки, слова и заголовки Markdown по файлам (в пуле потоков,
+с кэшем в индексе сканирования) и их свёртка в дерево папок
+"""
+
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1 << 20
+MMAP_THRESHOLD = 8 << 20
+# Строки и слова считаем только у текстовых файлов, у остальных - лишь размер
+TEXT_SUFFIXES = frozenset({'.md', '.txt', '.py', '.js', '.html', '.css', '.json', '.sh', '.yml', '.yaml'})
+# Заголовки и границы блоков кода (внутри ``` строки с # - не заголовки)
+HEADING_OR_FENCE = re.compile(rb'^(?:(```|~~~)|#{1,6}[ \t])', re.M)
+
+
+def _count_block(data, in_fence, markdown):
+    lines = data.count(b"\n")
+    words = len(data.split())
+    headings = 0
+    if markdown:
+        for match in HEADING_OR_FENCE.finditer(data):
+            if match.group(1):
+                in_fence = not in_fence
+            elif not in_fence:
+                headings += 1
+    return lines, words, headings, in_fence
+
+
+def _line_aligned_chunks(f, size):
+    """Блоки файла, дочитанные до конца строки, чтобы не резать слово или заголовок"""
+    if size >= MMAP_THRESHOLD:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pos = 0
+            while pos < size:
+                end = mapped.find(b"\n", min(pos + CHUNK_SIZE, size))
+                end = size if end < 0 else end + 1
+                yield mapped[pos:end]
+                pos = end
+    else:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk + f.readline()
+
+
+def count_file(path):
+    """(строк, слов, заголовков) для текстового файла"""
+    markdown = path.endswith(".md")
+    lines = words = headings = 0
+    in_fence = False
+    last = b"\n"
+    with open(path, "rb") as f:
+        for chunk in _line_aligned_chunks(f, os.fstat(f.fileno()).st_size):
+            l, w, h, in_fence = _count_block(chunk, in_fence, markdown)
+            lines += l
+            words += w
+            headings += h
+            last = chunk[-1:]
+    # Последняя строка без перевода строки тоже строка
+    if last != b"\n":
+        lines += 1
+    return lines, words, headings
+
+
+def update_file_stats(index, root_path=None, workers=None):
+    """
+    Досчитывает статистику файлов, у которых (size, mtime_ns) не совпадает с кэшем.
+    Индекс должен быть свежим: refresh(verify_files=True). Возвращает число пересчитанных файлов.
+    """
+    root = root_path or index.root()
+    db = index.db
+    with db:
+        db.execute("DELETE FROM file_stats WHERE path NOT IN (SELECT path FROM files)")
+        stale = db.execute("""
+            SELECT f.path, f.suffix, f.size, f.mtime_ns
+            FROM files f LEFT JOIN file_stats s ON s.path = f.path
+            WHERE s.path IS NULL OR s.size != f.size OR s.mtime_ns != f.mtime_ns
+        """).fetchall()
+
+        def work(row):
+            path, suffix, size, mtime_ns = row
+            if suffix not in TEXT_SUFFIXES:
+                return path, size, mtime_ns, 0, 0, 0
+            try:
+                return (path, size, mtime_ns) + count_file(os.path.join(root, path))
+            except OSError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = [row for row in pool.map(work, stale) if row is not None]
+        db.executemany("INSERT OR REPLACE INTO file_stats VALUES (?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def _new_node(path):
+    return {"path": path, "files": 0, "bytes": 0, "lines": 0, "words": 0, "headings": 0, "children": []}
+
+
+def folder_rollup(index):
+    """Дерево папок с суммами по всем вложенным файлам (корень - path "")"""
+    db = index.db
+    nodes = {"": _new_node("")}
+    for (folder,) in db.execute("SELECT path FROM dirs WHERE path != '' ORDER BY path"):
+        nodes[folder] = _new_node(folder)
+
+    totals = db.execute("""
+        SELECT f.parent, COUNT(*), SUM(f.size),
+               SUM(COALESCE(s.lines, 0)), SUM(COALESCE(s.words, 0)), SUM(COALESCE(s.headings, 0))
+        FROM files f LEFT JOIN file_stats s ON s.path = f.path
+        GROUP BY f.parent
+    """).fetchall()
+    keys = ("files", "bytes", "lines", "words", "headings")
+    for parent, *values in totals:
+        # Поднимаем суммы папки ко всем её предкам
+        folder = parent
+        while True:
+            node = nodes.setdefault(folder, _new_node(folder))
+            for key, value in zip(keys, values):
+                node[key] += value or 0
+            if not folder:
+                break
+            folder = os.path.dirname(folder)
+
+    for folder in sorted(nodes):
+        if folder:
+            nodes[os.path.dirname(folder)]["children"].append(nodes[folder])
+    return nodes[""]
+
+
+def _human_bytes(size):
+    for unit in ("байт", "КБ", "МБ", "ГБ"):
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.0f} {unit}" if unit == "байт" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def render_rollup(node, max_depth=2, depth=0):
+    """Текстовое дерево свёртки"""
+    name = (os.path.basename(node["path"]) + "/") if node["path"] else "./"
+    lines = [f"{'  ' * depth}{name:<{max(1, 32 - 2 * depth)}} {node['files']:>7} файлов "
+             f"{_human_bytes(node['bytes']):>10} {node['lines']:>9} строк "
+             f"{node['words']:>10} слов {node['headings']:>7} заголовков"]
+    if depth < max_depth:
+        for child in node["children"]:
+            lines.extend(render_rollup(child, max_depth, depth + 1))
+    return lines
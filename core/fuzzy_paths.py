@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+fuzzy_paths.py - Нечёткий поиск документов по пути и названию
+Версия: 0.1.0
+Назначение: Триграммный индекс имён и названий документов (Unicode, кириллица,
+ё = е) для подбора замены битой ссылке: кандидаты - по редким триграммам
+из индекса, окончательный порядок - по точному коэффициенту Дайса
+"""
+
+import os
+import re
+import unicodedata
+from urllib.parse import unquote
+
+import numpy as np
+
+# Слова - буквы любого алфавита и цифры; всё остальное - разделители
+WORD = re.compile(r'[^\W_]+')
+# Сколько кандидатов из индекса пересчитывается точно
+CANDIDATES = 50
+# Если вхождений больше, самые частые триграммы не участвуют в отборе кандидатов
+POSTINGS_BUDGET = 5_000
+# Кандидаты с меньшей оценкой не предлагаются - это уже не опечатка, а другой документ
+MIN_SCORE = 0.3
+
+
+def normalize(text):
+    """Приводит текст к виду для сравнения: NFKC, без регистра, ё -> е"""
+    return unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+
+
+def trigrams(text):
+    """Множество триграмм слов текста (слова дополняются пробелами по краям)"""
+    grams = set()
+    for word in WORD.findall(normalize(text)):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def document_trigrams(path, title=""):
+    """Триграммы документа: имя файла без расширения и название"""
+    return trigrams(os.path.splitext(os.path.basename(path))[0] + " " + title)
+
+
+class FuzzyPathIndex:
+    """
+    Триграммный индекс документов: триграмма -> отсортированный массив номеров
+    документов, отдельно для имён файлов и для названий (триграммы, которых
+    нет в имени). Размеры множеств хранятся, и пересечения для оценки Дайса
+    считаются по тем же массивам, без разбора путей кандидатов.
+    """
+
+    def __init__(self, documents):
+        """documents - пары (путь, название); название может быть пустым"""
+        self.paths = []
+        name_postings = {}
+        title_postings = {}
+        name_sizes = []
+        all_sizes = []
+        for doc_id, (path, title) in enumerate(documents):
+            self.paths.append(path)
+            name = document_trigrams(path)
+            extra = trigrams(title) - name if title else ()
+            for gram in name:
+                name_postings.setdefault(gram, []).append(doc_id)
+            for gram in extra:
+                title_postings.setdefault(gram, []).append(doc_id)
+            name_sizes.append(len(name))
+            all_sizes.append(len(name) + len(extra))
+        self.name_postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in name_postings.items()}
+        self.title_postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in title_postings.items()}
+        self.name_sizes = np.array(name_sizes, dtype=np.int32)
+        self.all_sizes = np.array(all_sizes, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _lists(self, query):
+        for postings in (self.name_postings, self.title_postings):
+            for gram in query:
+                ids = postings.get(gram)
+                if ids is not None:
+                    yield ids
+
+    def _candidates(self, query):
+        lists = sorted(self._lists(query), key=len)
+        if not lists:
+            return np.zeros(0, dtype=np.int32)
+        # Редкие триграммы отбирают кандидатов, частые (doc, md, ...) почти ничего не различают
+        total = 0
+        used = []
+        for ids in lists:
+            if used and total + len(ids) > POSTINGS_BUDGET:
+                break
+            used.append(ids)
+            total += len(ids)
+        ids, counts = np.unique(np.concatenate(used), return_counts=True)
+        if len(ids) > CANDIDATES:
+            ids = ids[np.argpartition(counts, -CANDIDATES)[-CANDIDATES:]]
+        return ids
+
+    @staticmethod
+    def _hits(postings, query, candidates):
+        """Сколько триграмм query есть у каждого кандидата (по отсортированным спискам)"""
+        hits = np.zeros(len(candidates), dtype=np.int32)
+        for gram in query:
+            ids = postings.get(gram)
+            if ids is not None:
+                pos = np.minimum(np.searchsorted(ids, candidates), len(ids) - 1)
+                hits += ids[pos] == candidates
+        return hits
+
+    def suggest(self, target, text="", k=3, exclude=None, min_score=MIN_SCORE):
+        """
+        До k документов, похожих на цель битой ссылки: [(путь, оценка 0..1), ...].
+        text - текст ссылки (сравнивается с названиями), exclude - путь, который
+        не предлагать (сам документ со ссылкой).
+        """
+        path = unquote(target.split("#", 1)[0])
+        name_query = document_trigrams(path)
+        query = name_query | trigrams(text)
+        candidates = self._candidates(query)
+        if not len(candidates):
+            return []
+        # Дайс по имени и по имени с названием - берётся лучший
+        name_hits = self._hits(self.name_postings, name_query, candidates)
+        all_hits = self._hits(self.name_postings, query, candidates) + self._hits(self.title_postings, query, candidates)
+        scores = np.maximum(2.0 * name_hits / (len(name_query) + self.name_sizes[candidates]),
+                            2.0 * all_hits / (len(query) + self.all_sizes[candidates]))
+
+        wanted_dirs = set(normalize(os.path.dirname(os.path.normpath(path))).split(os.sep)) - {"", ".."}
+        scored = []
+        for doc_id, score in zip(candidates.tolist(), scores.tolist()):
+            candidate = self.paths[doc_id]
+            if candidate == exclude or score < min_score:
+                continue
+            # При равном сходстве имени выигрывает документ из той же папки
+            if wanted_dirs:
+                dirs = set(normalize(os.path.dirname(candidate)).split(os.sep))
+                score += 0.05 * len(wanted_dirs & dirs) / len(wanted_dirs)
+            scored.append((score, candidate))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(candidate, round(min(score, 1.0), 3)) for score, candidate in scored[:k]]
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+graph_metrics.py - Аналитика графа ссылок архива
+Версия: 0.2.0
+Назначение: Граф ссылок (link_graph.py) в виде CSR-матрицы смежности на массивах
+NumPy и векторные расчёты: компоненты связности, сироты и тупики, распределения
+степеней, PageRank и детерминированная оценка связности для Садовода.
+Метрики хранятся в .npz и обновляются инкрементально: меняются только строки
+перечитанных документов, компоненты сливаются или пересчитываются лишь
+затронутые, PageRank стартует с прошлого вектора.
+"""
+
+import argparse
+import io
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from atomic_io import atomic_write_bytes
+from link_graph import changed_since, link_epoch, link_generation, update_link_graph
+from scan_index import ScanIndex
+
+# Граф в формате CSR: соседи узла i - indices[indptr[i]:indptr[i + 1]].
+# paths[i] - путь документа i; рёбра без повторов и петель.
+CSRGraph = namedtuple("CSRGraph", ["paths", "indptr", "indices"])
+
+DAMPING = 0.85
+PAGERANK_TOL = 1e-10
+PAGERANK_MAX_ITER = 100
+# Лимит параметров в одном SQL-запросе
+SQL_CHUNK = 500
+
+# Сохранённые метрики: граф, метки компонент, PageRank и поколение графа ссылок,
+# для которого они посчитаны (epoch - метка самого графа, см. link_graph.link_epoch)
+MetricsState = namedtuple("MetricsState", ["graph", "labels", "rank", "epoch", "generation"])
+
+
+def csr_from_edges(paths, src, dst):
+    """Собирает CSRGraph из массивов начал и концов рёбер (номера узлов)"""
+    n = len(paths)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    keep = src != dst
+    # Повторные ссылки документа на один и тот же документ - одно ребро
+    keys = np.unique(src[keep] * n + dst[keep])
+    src, dst = keys // n, keys % n
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return CSRGraph(paths, indptr, dst.astype(np.int32))
+
+
+def load_graph(index):
+    """CSR-граф документов из индекса: узлы - документы графа ссылок, рёбра - ссылки между ними"""
+    db = index.db
+    node_rows = db.execute("SELECT rowid, path FROM link_docs ORDER BY rowid").fetchall()
+    rowids = np.fromiter((row[0] for row in node_rows), dtype=np.int64, count=len(node_rows))
+    paths = [row[1] for row in node_rows]
+    edges = np.array(db.execute("""
+        SELECT s.rowid, t.rowid FROM links l
+        JOIN link_docs s ON s.path = l.source
+        JOIN link_docs t ON t.path = l.resolved
+    """).fetchall(), dtype=np.int64).reshape(-1, 2)
+    # rowid упорядочены, поэтому номер узла - позиция в rowids
+    return csr_from_edges(paths, np.searchsorted(rowids, edges[:, 0]), np.searchsorted(rowids, edges[:, 1]))
+
+
+def edge_sources(graph):
+    """Начало каждого ребра (развёртка indptr)"""
+    return np.repeat(np.arange(len(graph.paths), dtype=np.int32), np.diff(graph.indptr))
+
+
+def degrees(graph):
+    """(входящие, исходящие) степени узлов"""
+    out_degree = np.diff(graph.indptr)
+    in_degree = np.bincount(graph.indices, minlength=len(graph.paths))
+    return in_degree, out_degree
+
+
+def connected_components(graph):
+    """Компоненты слабой связности: номер компоненты для каждого узла"""
+    return _components(len(graph.paths), edge_sources(graph), graph.indices)
+
+
+def _components(n, src, dst):
+    """
+    Компоненты по массивам рёбер. Подвешивание корней по рёбрам (np.minimum.at)
+    чередуется со сжатием путей (labels = labels[labels]), пока метки
+    не перестанут меняться - O(log n) раундов.
+    """
+    labels = np.arange(n, dtype=np.int64)
+    while True:
+        lo = np.minimum(labels[src], labels[dst])
+        hi = np.maximum(labels[src], labels[dst])
+        changed = lo != hi
+        if not changed.any():
+            break
+        # Корень с большей меткой подвешивается к меньшей
+        np.minimum.at(labels, hi[changed], lo[changed])
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def pagerank(graph, start=None, damping=DAMPING, tol=PAGERANK_TOL, max_iter=PAGERANK_MAX_ITER):
+    """
+    PageRank степенным методом; масса тупиков распределяется равномерно.
+    start - начальный вектор (например, прошлый результат). Возвращает (вектор, итераций).
+    """
+    n = len(graph.paths)
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = np.diff(graph.indptr)
+    dangling = out_degree == 0
+    inv_out = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    src = edge_sources(graph)
+    rank = np.full(n, 1.0 / n) if start is None else np.asarray(start, dtype=np.float64) / np.sum(start)
+    for iteration in range(1, max_iter + 1):
+        spread = np.bincount(graph.indices, weights=(rank * inv_out)[src], minlength=n)
+        new_rank = damping * spread + (damping * rank[dangling].sum() + 1.0 - damping) / n
+        delta = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if delta < tol:
+            break
+    return rank, iteration
+
+
+def connectivity_score(largest_component, linked_in, n):
+    """
+    Оценка связности в [0, 1]: среднее доли документов в крупнейшей компоненте
+    и доли документов, на которые ссылается хотя бы один другой документ.
+    """
+    if n == 0:
+        return 0.0
+    return round(0.5 * largest_component / n + 0.5 * linked_in / n, 4)
+
+
+def analyze(graph, top=10, rank=None, labels=None):
+    """Сводка по графу; rank и labels - готовые PageRank и метки компонент (иначе считаются)"""
+    n = len(graph.paths)
+    in_degree, out_degree = degrees(graph)
+    if labels is None:
+        labels = connected_components(graph)
+    sizes = np.unique(labels, return_counts=True)[1]
+    if rank is None:
+        rank, _ = pagerank(graph)
+    largest = int(sizes.max()) if n else 0
+    best = np.argpartition(rank, n - top)[n - top:] if 0 < top < n else np.arange(min(top, n))
+    best = best[np.argsort(rank[best])[::-1]]
+    return {
+        "documents": n,
+        "links": int(graph.indptr[-1]),
+        "components": int(len(sizes)),
+        "largest_component": largest,
+        "orphans": int(np.count_nonzero(in_degree == 0)),
+        "dead_ends": int(np.count_nonzero(out_degree == 0)),
+        "isolated": int(np.count_nonzero((in_degree == 0) & (out_degree == 0))),
+        "in_degree_histogram": np.bincount(in_degree).tolist() if n else [],
+        "out_degree_histogram": np.bincount(out_degree).tolist() if n else [],
+        "top_pagerank": [(graph.paths[i], round(float(rank[i]), 6)) for i in best],
+        "connectivity": connectivity_score(largest, int(np.count_nonzero(in_degree)), n),
+    }
+
+
+def metrics_path_for(memory_path):
+    """Файл метрик рядом с памятью оркестратора: core/memory.json -> core/memory_graph.npz"""
+    return os.path.splitext(memory_path)[0] + "_graph.npz"
+
+
+def _bytes_array(data):
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def save_metrics(path, state):
+    """Атомарно сохраняет метрики в .npz (пути - одной строкой через перевод строки)"""
+    buf = io.BytesIO()
+    meta = {"epoch": state.epoch, "generation": state.generation}
+    np.savez(buf, paths=_bytes_array("\n".join(state.graph.paths).encode("utf-8")),
+             indptr=state.graph.indptr, indices=state.graph.indices,
+             labels=state.labels, rank=state.rank,
+             meta=_bytes_array(json.dumps(meta).encode("utf-8")))
+    atomic_write_bytes(path, buf.getvalue())
+
+
+def load_metrics(path):
+    """Загружает сохранённые метрики или возвращает None"""
+    try:
+        with np.load(path) as data:
+            text = data["paths"].tobytes().decode("utf-8")
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            graph = CSRGraph(text.split("\n") if text else [], data["indptr"], data["indices"])
+            return MetricsState(graph, data["labels"], data["rank"], meta["epoch"], meta["generation"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _chunks(items, size=SQL_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _full_metrics(index, epoch, generation):
+    graph = load_graph(index)
+    rank, iterations = pagerank(graph)
+    state = MetricsState(graph, connected_components(graph), rank, epoch, generation)
+    return state, {"mode": "full", "changed": len(graph.paths), "pagerank_iterations": iterations}
+
+
+def _merge_components(labels, src, dst):
+    """Новые рёбра без удалений: компоненты только сливаются (система непересекающихся множеств)"""
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for a, b in zip(labels[src].tolist(), labels[dst].tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    if not parent:
+        return labels
+    lut = np.arange(int(labels.max()) + 1)
+    for label in parent:
+        lut[label] = find(label)
+    return lut[labels]
+
+
+def _compact_labels(labels):
+    """Метки компонент подряд 0..k-1: иначе новые метки растут от цикла к циклу вместе с таблицей слияния"""
+    if not len(labels):
+        return labels
+    return np.unique(labels, return_inverse=True)[1].astype(labels.dtype, copy=False)
+
+
+def _recompute_components(graph, labels, touched):
+    """После удаления рёбер пересчитывает только компоненты с метками из touched"""
+    mask = np.isin(labels, np.fromiter(touched, dtype=labels.dtype))
+    nodes = np.flatnonzero(mask)
+    src = edge_sources(graph)
+    inside = mask[src]
+    local = np.full(len(labels), -1, dtype=np.int64)
+    local[nodes] = np.arange(len(nodes))
+    sub = _components(len(nodes), local[src[inside]], local[graph.indices[inside]])
+    labels = labels.copy()
+    labels[nodes] = int(labels.max()) + 1 + sub
+    return labels
+
+
+def update_metrics(index, state=None):
+    """
+    Приводит метрики в соответствие с графом ссылок индекса (граф должен быть
+    обновлён update_link_graph). state - прошлые метрики или None.
+    Возвращает (MetricsState, {"mode": full|incremental|unchanged, ...}).
+    """
+    epoch = link_epoch(index)
+    generation = link_generation(index)
+    if state is None or state.epoch != epoch or state.generation > generation:
+        return _full_metrics(index, epoch, generation)
+    if state.generation == generation:
+        return state, {"mode": "unchanged", "changed": 0, "pagerank_iterations": 0}
+
+    db = index.db
+    parsed, removed = changed_since(index, state.generation)
+    graph, labels, rank = state.graph, state.labels, state.rank
+    paths = list(graph.paths)
+    ids = {path: i for i, path in enumerate(paths)}
+    parsed_set = set(parsed)
+    removed_ids = [ids[path] for path in removed if path in ids and path not in parsed_set]
+    added = [path for path in parsed if path not in ids]
+
+    # Появление или исчезновение документа меняет рёбра тех, кто на него ссылается
+    affected = set(parsed)
+    for chunk in _chunks(added + [paths[i] for i in removed_ids]):
+        affected.update(row[0] for row in db.execute(
+            f"SELECT DISTINCT source FROM links WHERE resolved IN ({','.join('?' * len(chunk))})", chunk))
+
+    indptr, indices = graph.indptr, graph.indices
+    touched = set(labels[removed_ids].tolist())
+    if removed_ids:
+        keep = np.ones(len(paths), dtype=bool)
+        keep[removed_ids] = False
+        src = edge_sources(graph)
+        edge_keep = keep[src] & keep[indices]
+        remap = np.cumsum(keep) - 1
+        indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(remap[src[edge_keep]], minlength=len(indptr) - 1), out=indptr[1:])
+        indices = remap[indices[edge_keep]].astype(np.int32)
+        paths = [path for path, kept in zip(paths, keep) if kept]
+        labels, rank = labels[keep], rank[keep]
+    if added:
+        paths.extend(added)
+        indptr = np.concatenate([indptr, np.full(len(added), indptr[-1], dtype=np.int64)])
+        base = int(labels.max()) + 1 if len(labels) else 0
+        labels = np.concatenate([labels, np.arange(base, base + len(added))])
+        rank = np.concatenate([rank, np.full(len(added), 1.0 / len(paths))])
+    if removed_ids or added:
+        ids = {path: i for i, path in enumerate(paths)}
+
+    # Новые строки затронутых документов - из индекса
+    rows = {ids[path]: [] for path in affected if path in ids}
+    sources = [paths[i] for i in rows]
+    for chunk in _chunks(sources):
+        for source, resolved in db.execute(
+                f"SELECT source, resolved FROM links WHERE source IN ({','.join('?' * len(chunk))})", chunk):
+            target = ids.get(resolved)
+            if target is not None and resolved != source:
+                rows[ids[source]].append(target)
+
+    out_degree = np.diff(indptr)
+    pieces = []
+    new_src, new_dst = [], []
+    edges_removed = bool(removed_ids)
+    position = 0
+    for row in sorted(rows):
+        old = indices[indptr[row]:indptr[row + 1]]
+        new = np.unique(np.asarray(rows[row], dtype=np.int32))
+        gained = np.setdiff1d(new, old, assume_unique=True)
+        if len(np.setdiff1d(old, new, assume_unique=True)):
+            edges_removed = True
+            touched.add(int(labels[row]))
+        new_src.extend([row] * len(gained))
+        new_dst.extend(gained.tolist())
+        pieces.append(indices[position:indptr[row]])
+        pieces.append(new)
+        position = indptr[row + 1]
+        out_degree[row] = len(new)
+    pieces.append(indices[position:])
+    indices = np.concatenate(pieces).astype(np.int32) if pieces else indices
+    indptr = np.zeros(len(paths) + 1, dtype=np.int64)
+    np.cumsum(out_degree, out=indptr[1:])
+    graph = CSRGraph(paths, indptr, indices)
+
+    new_src = np.asarray(new_src, dtype=np.int64)
+    new_dst = np.asarray(new_dst, dtype=np.int64)
+    if edges_removed:
+        # Удаление ребра может расколоть компоненту - пересчитываем только затронутые
+        touched.update(labels[new_src].tolist())
+        touched.update(labels[new_dst].tolist())
+        labels = _recompute_components(graph, labels, touched)
+    elif len(new_src):
+        labels = _merge_components(labels, new_src, new_dst)
+    labels = _compact_labels(labels)
+
+    rank, iterations = pagerank(graph, start=rank)
+    state = MetricsState(graph, labels, rank, epoch, generation)
+    return state, {"mode": "incremental", "changed": len(rows), "pagerank_iterations": iterations}
+
+
+def archive_metrics(root_path=".", state_path=None, index_path=None, top=10):
+    """
+    Обновляет граф ссылок архива и возвращает его сводку (analyze) с полем "update".
+    state_path - файл сохранённых метрик для инкрементального обновления.
+    """
+    with ScanIndex(index_path, root_path) as index:
+        index.refresh(root_path, verify_files=True)
+        update_link_graph(index, root_path)
+        state = load_metrics(state_path) if state_path else None
+        state, info = update_metrics(index, state)
+    if state_path and info["mode"] != "unchanged":
+        save_metrics(state_path, state)
+    stats = analyze(state.graph, top, state.rank, state.labels)
+    stats["update"] = info
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Аналитика графа ссылок архива")
+    parser.add_argument("--index", help="путь к индексу сканирования (по умолчанию - индекс корня архива)")
+    parser.add_argument("--top", type=int, default=10, help="сколько документов показать по PageRank")
+    parser.add_argument("--state", help="файл метрик (.npz) для инкрементального обновления")
+    args = parser.parse_args()
+
+    stats = archive_metrics(".", args.state, args.index, args.top)
+    print(f"🕸️  ГРАФ ССЫЛОК: {stats['documents']} документов, {stats['links']} ссылок")
+    print(f"   Компонент связности: {stats['components']} (крупнейшая - {stats['largest_component']})")
+    print(f"   Сирот (без входящих): {stats['orphans']}")
+    print(f"   Тупиков (без исходящих): {stats['dead_ends']}")
+    print(f"   Изолированных: {stats['isolated']}")
+    print(f"   Связность: {stats['connectivity']}")
+    print(f"\n🏆 PageRank (топ-{args.top}):")
+    for path, value in stats["top_pagerank"]:
+        print(f"   {value:.6f}  {path}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+id_registry.py - Реестр ID документов
+Версия: 0.1.0
+Назначение: Выдача ID документов без повторов: счётчик на каждую пару
+(префикс, год) хранится рядом с файлом индекса сканирования этого архива
+(core/.cache/scan_index.id_sequences.json), все ID архива
+загружаются одним запросом из индекса метаданных (metadata_engine.py)
+в словарь ID -> документ, и счётчики поднимаются до них до первой выдачи.
+ID, которые прежний add_metadata.py ставил корневым документам, закреплены
+за ними. Несколько процессов выдают ID по очереди под блокировкой файла (fcntl);
+тот же словарь находит повторы ID и документ по ID.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import date
+
+from atomic_io import atomic_write_text
+from metadata_engine import update_metadata_index
+from scan_index import ScanIndex
+
+SEQUENCES_SUFFIX = ".id_sequences.json"
+# ID, которые add_metadata.py до реестра ставил корневым документам
+LEGACY_IDS = {
+    "ROOT-2024-001": "manifest.md",
+    "STR-2024-002": "symbiosis-v2.md",
+}
+# ID документа: ПРЕФИКС-ГОД-НОМЕР, например CON-2024-007
+ID_PATTERN = re.compile(r'([A-Za-z]+)-(\d{4})-(\d+)')
+
+
+def format_id(prefix, year, number):
+    return f"{prefix}-{year}-{number:03d}"
+
+
+def parse_id(doc_id):
+    """(префикс, год, номер) или None, если ID записан не по схеме"""
+    match = ID_PATTERN.fullmatch(doc_id.strip())
+    return (match.group(1), int(match.group(2)), int(match.group(3))) if match else None
+
+
+def load_ids(index):
+    """
+    Все ID архива из индекса метаданных (один запрос):
+    ({ID: документ}, {ID: [документы]} - ID, которые встречаются больше одного раза).
+    """
+    ids = {}
+    duplicates = {}
+    for doc_id, path in index.db.execute(
+            "SELECT doc_id, path FROM doc_metadata WHERE doc_id IS NOT NULL ORDER BY path"):
+        if doc_id in ids:
+            duplicates.setdefault(doc_id, [ids[doc_id]]).append(path)
+        else:
+            ids[doc_id] = path
+    return ids, duplicates
+
+
+def find_document(index, doc_id):
+    """Документ с этим ID по индексу (без загрузки реестра) или None"""
+    row = index.db.execute("SELECT path FROM doc_metadata WHERE doc_id = ? ORDER BY path LIMIT 1",
+                           (doc_id,)).fetchone()
+    return row[0] if row else None
+
+
+class IdRegistry:
+    """
+    ID архива и счётчики выдачи. Счётчик не меньше самого большого номера
+    в архиве и в reserved, так что новый ID не совпадает ни с одним существующим.
+    reserved - {ID: документ}: ID, закреплённые за документами, которые его
+    ещё не получили (по умолчанию LEGACY_IDS); другим документам они не выдаются.
+    """
+
+    def __init__(self, ids, sequences=None, duplicates=None, reserved=None):
+        self.ids = ids
+        self.duplicates = duplicates or {}
+        self.sequences = dict(sequences or {})
+        self.reserved = dict(LEGACY_IDS if reserved is None else reserved)
+        for doc_id in list(ids) + list(self.reserved):
+            parsed = parse_id(doc_id)
+            if parsed:
+                key = f"{parsed[0]}-{parsed[1]}"
+                self.sequences[key] = max(self.sequences.get(key, 0), parsed[2])
+
+    @classmethod
+    def from_index(cls, index, sequences=None):
+        ids, duplicates = load_ids(index)
+        return cls(ids, sequences, duplicates)
+
+    def allocate(self, prefix, year, path=None):
+        """
+        Следующий свободный ID для (префикс, год); сразу занимается за документом path.
+        Документ с закреплённым ID (reserved) получает его, если ID ещё свободен.
+        """
+        for doc_id, owner in self.reserved.items():
+            if owner == path and doc_id not in self.ids and parse_id(doc_id)[:2] == (prefix, year):
+                self.ids[doc_id] = path
+                return doc_id
+        key = f"{prefix}-{year}"
+        number = self.sequences.get(key, 0) + 1
+        # Номера выше счётчика могли занять вручную
+        while format_id(prefix, year, number) in self.ids or format_id(prefix, year, number) in self.reserved:
+            number += 1
+        self.sequences[key] = number
+        doc_id = format_id(prefix, year, number)
+        self.ids[doc_id] = path
+        return doc_id
+
+    def lookup(self, doc_id):
+        """Документ с этим ID или None"""
+        return self.ids.get(doc_id)
+
+
+def _load_sequences(path, root):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        # Счётчики восстанавливаются по ID архива; теряются только выданные, но не записанные
+        return {}
+    return data.get("sequences", {}) if data.get("root") == root else {}
+
+
+@contextmanager
+def open_registry(index, save=True):
+    """
+    Реестр архива индекса под блокировкой файла счётчиков: другие процессы
+    ждут, пока блок with не закончится. save=False - только посмотреть
+    (счётчики не сохраняются, блокировка разделяемая).
+    """
+    # У каждого индекса (корня архива) - свой файл счётчиков
+    path = os.path.splitext(os.path.abspath(index.index_path))[0] + SEQUENCES_SUFFIX
+    root = index.root()
+    with open(path + ".lock", "a+") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if save else fcntl.LOCK_SH)
+        try:
+            registry = IdRegistry.from_index(index, _load_sequences(path, root))
+            yield registry
+            if save:
+                data = {"root": root, "sequences": registry.sequences}
+                atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True) + "\n")
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Реестр ID документов архива")
+    parser.add_argument("--index", help="путь к индексу сканирования (по умолчанию - индекс корня архива)")
+    parser.add_argument("--lookup", metavar="ID", help="найти документ по ID")
+    parser.add_argument("--next", metavar="ПРЕФИКС", help="показать следующий ID префикса (без выдачи)")
+    parser.add_argument("--year", type=int, help="год для --next (по умолчанию текущий)")
+    args = parser.parse_args()
+
+    with ScanIndex(args.index, ".") as index:
+        index.refresh(".", verify_files=True)
+        update_metadata_index(index, ".")
+        if args.lookup:
+            path = find_document(index, args.lookup)
+            print(path or f"ID {args.lookup} не найден")
+            parser.exit(0 if path else 1)
+        with open_registry(index, save=False) as registry:
+            print(f"🆔 ID в архиве: {len(registry.ids)}")
+            if args.next:
+                print(f"   следующий: {registry.allocate(args.next, args.year or date.today().year)}")
+            if registry.duplicates:
+                print(f"⚠️  Повторяющиеся ID: {len(registry.duplicates)}")
+                for doc_id, paths in sorted(registry.duplicates.items()):
+                    print(f"   {doc_id}: {', '.join(paths)}")
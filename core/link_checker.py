@@ -1,86 +1,366 @@
 #!/usr/bin/env python3
 """
 link_checker.py - Простой анализатор связей
-Версия: 0.1.0
-Назначение: Проверка ссылок между документами
+Версия: 0.8.0
+Назначение: Проверка ссылок между документами; замены для битых ссылок
+по нечёткому индексу путей (fuzzy_paths.py) и их пакетное применение (--fix).
+Битые ссылки потоком пишутся в отчёт link_report/ (link_report.py).
+Внешние ссылки проверяются по запросу (--external, external_links.py).
+fuzzy_paths (NumPy) и external_links (requests) загружаются только под своими
+флагами: простая проверка ссылок обходится без них.
 """
 
+import argparse
 import os
-import re
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-def main():
+from archive_layout import load_layout
+from archive_walker import walk_archive
+from atomic_io import atomic_write_bytes
+from link_graph import (BAD_ANCHOR, MISSING, broken_links, document_links, document_titles, graph_counts,
+                        heading_slugs, outside_tree, resolve_link, update_link_graph, web_links)
+from link_report import REPORT_DIR, TEXT_REPORT, ReportWriter, write_text_report
+from markdown_tokens import IMAGE, INLINE, document_tokens, map_batches, markdown_digests, read_tokens, tokenize
+from scan_index import ScanIndex
+
+# Столько замен предлагается на каждую битую ссылку
+SUGGESTIONS = 3
+# --fix применяет лучшую замену, только если она не хуже этой оценки
+FIX_THRESHOLD = 0.6
+
+
+def scan_documents(root_path="."):
+    """
+    Один обход архива: множество всех известных путей (файлы и папки,
+    относительно корня) и список .md документов.
+    """
+    known = {""}
+    md_files = []
+    for entry in walk_archive(root_path):
+        known.add(entry.rel_path)
+        if not entry.is_dir and entry.name.endswith('.md'):
+            md_files.append(entry.rel_path)
+    return known, md_files
+
+
+# Множество известных путей в рабочем процессе (при fork наследуется без копирования)
+_known = None
+# Собирать ли внешние ссылки
+_external = False
+
+
+def _init_worker(known, external=False):
+    global _known, _external
+    _known = known
+    _external = external
+
+
+def path_exists(root_path, resolved, known):
+    """Проверяет путь цели по множеству известных путей, без stat на каждую ссылку"""
+    if resolved in known:
+        return True
+    if outside_tree(resolved):
+        return os.path.exists(os.path.join(root_path, resolved))
+    return False
+
+
+def _read_slugs(root_path, rel_path):
+    try:
+        return heading_slugs(document_links(read_tokens(os.path.join(root_path, rel_path)))[1])
+    except OSError:
+        return set()
+
+
+def _check_batch(root_path, rel_paths):
+    """
+    Читает пачку документов и проверяет их ссылки (выполняется в рабочем процессе).
+    Обратно уходят только счётчики, битые ссылки, ссылки с якорями в другие
+    документы - их заголовки сверяются после прохода, а не весь текст, -
+    и внешние ссылки, если их нужно проверить.
+    """
+    results = []
+    for source in rel_paths:
+        try:
+            tokens = read_tokens(os.path.join(root_path, source))
+        except OSError as e:
+            results.append((source, 0, [], [], [], str(e)))
+            continue
+        links, texts = document_links(tokens)
+        web = web_links(tokens) if _external else []
+        source_dir = os.path.dirname(source)
+        own_slugs = None
+        broken = []
+        anchored = []
+        for link in links:
+            resolved, anchor = resolve_link(source_dir, link.target)
+            if resolved is None:
+                # Якорь в этом же документе
+                if own_slugs is None:
+                    own_slugs = heading_slugs(texts)
+                if anchor not in own_slugs:
+                    broken.append((link.target, link.text, BAD_ANCHOR, link.line, link.column))
+            elif not path_exists(root_path, resolved, _known):
+                broken.append((link.target, link.text, MISSING, link.line, link.column))
+            elif anchor and resolved.endswith('.md'):
+                anchored.append((link.target, link.text, link.line, link.column, resolved, anchor))
+        results.append((source, len(links), broken, anchored, web, None))
+    return results
+
+
+def check_links(known, md_files, root_path=".", workers=None, external=False):
+    """
+    Проверяет ссылки документов md_files и выдаёт по каждому документу
+    (путь, проверено ссылок, [(цель, текст, статус, строка, столбец)],
+    внешние ссылки [Link], ошибка чтения или None)
+    в порядке md_files. Внешние ссылки собираются, только если external.
+    Ссылки с несуществующим якорем в другом документе выдаются в конце отдельными
+    записями с нулём проверенных: заголовки читаются только у документов-целей.
+    known и md_files - результат scan_documents(root_path).
+    """
+    anchored = []
+    for results in map_batches(_check_batch, root_path, md_files, workers,
+                               initializer=_init_worker, initargs=(known, external)):
+        for source, checked, broken, with_anchor, web, error in results:
+            anchored.extend((source,) + link for link in with_anchor)
+            yield source, checked, broken, web, error
+
+    slugs = {}
+    anchored.sort()
+    for source, target, text, line, column, resolved, anchor in anchored:
+        if resolved not in slugs:
+            slugs[resolved] = _read_slugs(root_path, resolved)
+        if anchor not in slugs[resolved]:
+            yield source, 0, [(target, text, BAD_ANCHOR, line, column)], [], None
+
+
+def fixed_target(source, target, replacement):
+    """
+    Новая цель ссылки из source на документ replacement; якорь исходной цели сохраняется,
+    заголовок ("...") остаётся в документе (_replace_destination)
+    """
+    target = target.strip()
+    if target.startswith('<'):
+        target = target[1:].partition('>')[0]
+    else:
+        target = target.split(None, 1)[0] if target else target
+    _, hash_mark, anchor = target.partition('#')
+    rel = os.path.relpath(replacement, os.path.dirname(source) or ".").replace(os.sep, "/")
+    if ' ' in rel:
+        rel = f"<{rel}>"
+    return rel + hash_mark + anchor
+
+
+def _replace_destination(target, new_target):
+    """Цель ссылки (путь "заголовок") с новым путём: заголовок и пробелы вокруг пути сохраняются"""
+    stripped = target.lstrip()
+    lead = target[:len(target) - len(stripped)]
+    if stripped.startswith('<'):
+        end = stripped.find('>') + 1 or len(stripped)
+    else:
+        end = next((i for i, char in enumerate(stripped) if char in ' \t\r\n'), len(stripped))
+    return lead + new_target + stripped[end:]
+
+
+def _fix_document(root_path, source, replacements):
+    """
+    Заменяет цели ссылок документа: replacements - {(текст, цель): новая цель}.
+    Правятся только ссылки [текст](цель) по их смещениям из разбора - вхождения
+    того же текста в коде не трогаются; ссылки-сноски не правятся.
+    """
+    full_path = os.path.join(root_path, source)
+    with open(full_path, 'rb') as f:
+        data = f.read()
+    parts = []
+    pos = 0
+    for link in document_links(tokenize(data))[0]:
+        new_target = replacements.get((link.text, link.target))
+        if new_target is None or link.kind not in (INLINE, IMAGE):
+            continue
+        raw = data[link.start:link.end]
+        # Цель - между последними "](" и ")"
+        split = raw.rindex(b"](") + 2
+        destination = _replace_destination(raw[split:-1].decode("utf-8"), new_target)
+        parts.append(data[pos:link.start] + raw[:split] + destination.encode("utf-8") + b")")
+        pos = link.end
+    if parts:
+        atomic_write_bytes(full_path, b"".join(parts) + data[pos:])
+    return len(parts)
+
+
+def apply_fixes(fixes, root_path=".", workers=None):
+    """
+    Применяет замены {документ: {(текст, цель): новая цель}} одним проходом:
+    каждый документ читается и атомарно перезаписывается один раз.
+    Возвращает (исправлено ссылок, [(документ, ошибка), ...]).
+    """
+    fixed = 0
+    errors = []
+
+    def work(item):
+        try:
+            return item[0], _fix_document(root_path, *item), None
+        except (OSError, UnicodeDecodeError) as e:
+            return item[0], 0, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for source, count, error in pool.map(work, sorted(fixes.items())):
+            fixed += count
+            if error is not None:
+                errors.append((source, error))
+    return fixed, errors
+
+
+def main(workers=None, graph=False, index_path=None, suggest=False, fix=False,
+         report_dir=REPORT_DIR, sharded=False, text_report=None, external=False, url_cache=None):
     print("=" * 60)
     print("ПРОСТОЙ АНАЛИЗАТОР СВЯЗЕЙ")
     print("=" * 60)
     
-    # Находим все .md файлы
-    md_files = []
-    for root, dirs, files in os.walk("."):
-        # Пропускаем служебные папки
-        if '.git' in root:
-            continue
-            
-        for file in files:
-            if file.endswith('.md'):
-                full_path = os.path.join(root, file)
-                md_files.append(full_path)
-    
-    print(f"Найдено Markdown файлов: {len(md_files)}")
+    total_links = 0
+    broken_count = 0
+    documents = 0
+    first_broken = []
+    # Нечёткий индекс документов строится, только если нужны замены
+    fuzzy = None
+    fixes = {}
+    suggest = suggest or fix
+    if suggest:
+        from fuzzy_paths import FuzzyPathIndex
+    if external:
+        from external_links import DEFAULT_CACHE_PATH, OK, check_urls, normalize_url
+        url_cache = url_cache or DEFAULT_CACHE_PATH
+    # Внешние ссылки: адрес -> [(документ, цель, текст, строка, столбец)]
+    web = {}
+    web_broken = 0
     
-    links = []
-    broken_links = []
+    def add_web(source, links):
+        for link in links:
+            web.setdefault(normalize_url(link.target), []).append(
+                (source, link.target, link.text, link.line, link.column))
     
-    for md_file in md_files[:50]:  # Проверяем первые 50 файлов
-        try:
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Ищем ссылки вида [текст](ссылка)
-            matches = re.findall(r'\[([^\]]+)\]\(([^)]+)\)', content)
-            
-            for text, target in matches:
-                # Пропускаем внешние ссылки
-                if target.startswith(('http://', 'https://', '#')):
+    # Битые ссылки сразу уходят в отчёт, а не копятся в списке
+    with ReportWriter(report_dir, sharded) as report:
+        def add_broken(source, target, text, status, line, column, detail=None):
+            suggestions = []
+            best = score = new_target = None
+            # Замену ищем только для несуществующих путей: при битом якоре файл на месте
+            if fuzzy is not None and status == MISSING:
+                suggestions = fuzzy.suggest(target, text, SUGGESTIONS, exclude=source)
+            if suggestions:
+                best, score = suggestions[0]
+                new_target = fixed_target(source, target, best)
+                if fix and score >= FIX_THRESHOLD:
+                    fixes.setdefault(source, {})[(text, target)] = new_target
+            if len(first_broken) < 10:
+                first_broken.append({'source': source, 'target': target, 'line': line, 'column': column,
+                                     'suggestions': suggestions, 'detail': detail})
+            report.add(source, target, line, column, status, text, best, score, new_target, detail)
+        
+        if graph:
+            # Постоянный граф ссылок: перечитываются только изменённые документы
+            with ScanIndex(index_path, ".") as index:
+                index.refresh(".", verify_files=True)
+                update = update_link_graph(index, ".", workers)
+                documents = index.count_files('.md')
+                print(f"Найдено Markdown файлов: {documents}")
+                print(f"Перечитано документов: {update['parsed']}")
+                for source, error in update["errors"]:
+                    print(f"Ошибка при чтении {source}: {error}")
+                total_links = graph_counts(index)["links"]
+                if suggest:
+                    fuzzy = FuzzyPathIndex(document_titles(index))
+                for link in broken_links(index):
+                    broken_count += 1
+                    add_broken(*link)
+                if external:
+                    # Токены всех документов - из кэша разбора, после обновления графа
+                    with index.db:
+                        for source, tokens, error in document_tokens(index, markdown_digests(index), ".", workers):
+                            if error is None:
+                                add_web(source, web_links(tokens))
+        else:
+            # Один обход: все известные пути и все .md файлы (служебные папки отсекаются обходчиком)
+            known, md_files = scan_documents(".")
+            documents = len(md_files)
+            print(f"Найдено Markdown файлов: {documents}")
+            if suggest:
+                fuzzy = FuzzyPathIndex((path, "") for path in md_files)
+            for source, checked, broken, links, error in check_links(known, md_files, ".", workers, external):
+                if error is not None:
+                    print(f"Ошибка при чтении {source}: {error}")
                     continue
-                
-                # Проверяем, существует ли файл
-                file_dir = os.path.dirname(md_file)
-                target_path = os.path.join(file_dir, target)
-                exists = os.path.exists(target_path)
-                
-                link_info = {
-                    'source': md_file[2:],  # Убираем './' в начале
-                    'target': target,
-                    'exists': exists
-                }
-                
-                links.append(link_info)
-                if not exists:
-                    broken_links.append(link_info)
-                    
-        except Exception as e:
-            print(f"Ошибка при чтении {md_file}: {e}")
+                total_links += checked
+                broken_count += len(broken)
+                for link in broken:
+                    add_broken(source, *link)
+                add_web(source, links)
+        
+        if external:
+            # Каждый адрес проверяется один раз, сколько бы ссылок на него ни было
+            print(f"Проверка внешних адресов: {len(web)}")
+            results = check_urls(web, url_cache)
+            for url, occurrences in sorted(web.items()):
+                result = results[url]
+                if result.status == OK:
+                    continue
+                detail = f"HTTP {result.code}" if result.code else result.error
+                for source, target, text, line, column in occurrences:
+                    web_broken += 1
+                    add_broken(source, target, text, result.status, line, column, detail)
+        
+        report.finish(documents=documents, checked=total_links, external=len(web))
     
     print(f"\n📊 РЕЗУЛЬТАТЫ:")
-    print(f"   Проверено ссылок: {len(links)}")
-    print(f"   Битых ссылок: {len(broken_links)}")
+    print(f"   Проверено ссылок: {total_links}")
+    print(f"   Битых ссылок: {broken_count}")
+    if external:
+        print(f"   Внешних адресов: {len(web)}, недоступных ссылок на них: {web_broken}")
     
-    if broken_links:
+    if first_broken:
         print(f"\n⚠️  БИТЫЕ ССЫЛКИ (первые 10):")
-        for link in broken_links[:10]:
-            print(f"   Из: {link['source']}")
+        for link in first_broken:
+            print(f"   Из: {link['source']}:{link['line']}:{link['column']}")
             print(f"   В: {link['target']}")
+            if link['detail']:
+                print(f"   Ответ сервера: {link['detail']}")
+            for path, score in link['suggestions']:
+                print(f"   Возможно: {path} ({score})")
             print()
+    print(f"📝 Отчёт: {report_dir}/")
+    
+    # Текстовый отчёт - только по запросу, из записанных данных
+    if text_report:
+        write_text_report(report_dir, text_report)
+        print(f"📝 Текстовый отчёт: {text_report}")
+
+    if fix:
+        fixed, errors = apply_fixes(fixes, ".", workers)
+        for source, error in errors:
+            print(f"Ошибка при исправлении {source}: {error}")
+        print(f"\n🔧 Исправлено ссылок: {fixed} в {len(fixes) - len(errors)} документах")
     
     # Анализ структуры
     print(f"\n📁 СТРУКТУРА АРХИВА:")
     
-    # Ключевые папки
-    key_folders = ['concepts', 'dialoguesstrategies', 'strategies', 'system', 'templates', 'core']
+    # Ключевые папки - разделы из archive_layout.json
+    key_folders = load_layout().folders
+    
+    # Если запущен наблюдатель (scanner_v2.py --watch), берём его свежие счётчики.
+    # Модуль наблюдателя тянет за собой сканер, поэтому импортируется только здесь
+    from archive_watch import load_published_state
+    state = load_published_state(".")
+    key_counts = state.get("key_folders") if state else None
+    if key_counts is not None:
+        print(f"   (данные наблюдателя архива)")
     
     for folder in key_folders:
-        if os.path.exists(folder):
+        if key_counts is not None:
+            if folder in key_counts:
+                counts = key_counts[folder]
+                print(f"   {folder}/: {counts['files']} файлов, {counts['markdown']} .md")
+            else:
+                print(f"   {folder}/: отсутствует")
+        elif os.path.exists(folder):
             files = os.listdir(folder)
             md_count = sum(1 for f in files if f.endswith('.md'))
             print(f"   {folder}/: {len(files)} файлов, {md_count} .md")
@@ -90,19 +370,24 @@ def main():
     print(f"\n" + "=" * 60)
     print("✅ Проверка завершена")
     print("=" * 60)
-    
-    # Сохраняем отчет
-    with open('link_check_report.txt', 'w') as f:
-        f.write(f"Отчет проверки ссылок\n")
-        f.write(f"====================\n")
-        f.write(f"Проверено ссылок: {len(links)}\n")
-        f.write(f"Битых ссылок: {len(broken_links)}\n\n")
-        
-        if broken_links:
-            f.write("Битые ссылки:\n")
-            for link in broken_links:
-                f.write(f"Из: {link['source']}\n")
-                f.write(f"В: {link['target']}\n\n")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Проверка ссылок между документами архива")
+    parser.add_argument("--workers", type=int, help="число процессов для разбора документов")
+    parser.add_argument("--graph", action="store_true",
+                        help="брать ссылки из постоянного графа (перечитываются только изменённые документы)")
+    parser.add_argument("--index", help="путь к индексу сканирования (по умолчанию - индекс корня архива)")
+    parser.add_argument("--suggest", action="store_true",
+                        help="предлагать замены для битых ссылок по похожим путям и названиям")
+    parser.add_argument("--fix", action="store_true",
+                        help=f"заменить битые ссылки лучшим вариантом с оценкой от {FIX_THRESHOLD}")
+    parser.add_argument("--report-dir", default=REPORT_DIR, help="папка отчёта (NDJSON и summary.json)")
+    parser.add_argument("--shard", action="store_true", help="отдельный файл отчёта на каждую папку верхнего уровня")
+    parser.add_argument("--text", nargs="?", const=TEXT_REPORT, help=f"собрать и текстовый отчёт (по умолчанию {TEXT_REPORT})")
+    parser.add_argument("--external", action="store_true",
+                        help="проверить и внешние ссылки http/https (результаты кэшируются на неделю)")
+    parser.add_argument("--url-cache",
+                        help="путь к кэшу проверки внешних адресов (по умолчанию core/.cache/url_cache.db)")
+    args = parser.parse_args()
+    main(args.workers, args.graph, args.index, args.suggest, args.fix, args.report_dir, args.shard, args.text,
+         args.external, args.url_cache)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+link_graph.py - Граф ссылок архива
+Версия: 0.7.1
+Назначение: Постоянный граф ссылок между документами в индексе сканирования:
+узлы - документы, рёбра - ссылки [текст](цель) вместе с текстом ссылки.
+При обновлении перечитываются только документы, чей хэш содержимого изменился,
+и заменяются только их исходящие рёбра. Якоря (файл.md#раздел) сверяются
+с индексом заголовков документов. У каждой ссылки хранится строка и столбец.
+Документы разбирает markdown_tokens.py (с кэшем по хэшу содержимого).
+"""
+
+import os
+import re
+import uuid
+from functools import lru_cache
+from urllib.parse import unquote
+
+from archive_walker import IGNORE_FOLDERS
+from content_hash import update_hashes
+from markdown_tokens import AUTOLINK, document_tokens, outside_generated
+
+# Внешние ссылки в граф не входят (их проверяет external_links.py)
+SKIP_PREFIXES = ('http://', 'https://')
+# Раздел обратных ссылок, который пишет backlinks.py; его ссылки - производные
+# данные и в граф не попадают, иначе каждая обратная ссылка стала бы прямой
+BACKLINKS = "backlinks"
+BACKLINKS_START = f"<!-- {BACKLINKS}:start -->"
+BACKLINKS_END = f"<!-- {BACKLINKS}:end -->"
+
+# Статусы битых ссылок: нет такого файла или папки / нет такого заголовка
+MISSING = "missing"
+BAD_ANCHOR = "bad_anchor"
+
+# Всё, кроме букв любого алфавита, цифр, _, - и пробела, из якоря выбрасывается
+SLUG_DROP = re.compile(r'[^\w\- ]')
+
+
+@lru_cache(maxsize=1 << 16)
+def resolve_link(source_dir, target):
+    """
+    Разбирает цель ссылки: (путь относительно корня архива, якорь).
+    Путь None - ссылка на якорь в том же документе, '' - корень архива.
+    Цель и якорь раскодируются из %XX; одинаковые пары (папка, цель) берутся из кэша.
+    """
+    target = target.strip()
+    if target.startswith('<') and target.endswith('>'):
+        target = target[1:-1]
+    elif '"' in target:
+        # [текст](путь "Заголовок") - заголовок к пути не относится
+        target = target.split(' "', 1)[0]
+    anchor = ''
+    if '#' in target:
+        target, _, anchor = target.partition('#')
+        anchor = unquote(anchor)
+        if not target:
+            return None, anchor
+    if '%' in target:
+        target = unquote(target)
+    resolved = os.path.normpath(os.path.join(source_dir, target))
+    return ("" if resolved == "." else resolved), anchor
+
+
+def heading_slug(text):
+    """Якорь заголовка в стиле GitHub: строчные буквы, пробелы -> дефисы, без пунктуации"""
+    return SLUG_DROP.sub('', text.strip().lower()).replace(' ', '-')
+
+
+def heading_slugs(texts):
+    """Якоря заголовков с текстами texts; повторы получают суффиксы -1, -2, ..."""
+    slugs = set()
+    seen = {}
+    for text in texts:
+        slug = heading_slug(text)
+        count = seen.get(slug, 0)
+        seen[slug] = count + 1
+        slugs.add(f"{slug}-{count}" if count else slug)
+    return slugs
+
+
+def outside_tree(resolved):
+    """Цель вне обойдённого дерева: выше корня, абсолютный путь или служебная папка"""
+    parts = resolved.split(os.sep)
+    return parts[0] == '..' or os.path.isabs(resolved) or not IGNORE_FOLDERS.isdisjoint(parts)
+
+
+def document_links(tokens):
+    """
+    Авторские ссылки и заголовки документа - без раздела обратных ссылок:
+    (внутренние ссылки [Link], тексты заголовков).
+    """
+    links = [link for link in outside_generated(tokens, tokens.links, BACKLINKS)
+             if link.kind != AUTOLINK and not link.target.startswith(SKIP_PREFIXES)]
+    texts = [heading.text for heading in outside_generated(tokens, tokens.headings, BACKLINKS)]
+    return links, texts
+
+
+def web_links(tokens):
+    """Внешние ссылки документа (http/https, и автоссылки) - без раздела обратных ссылок"""
+    return [link for link in outside_generated(tokens, tokens.links, BACKLINKS)
+            if link.target.startswith(SKIP_PREFIXES)]
+
+
+def _document_edges(source, tokens):
+    """Рёбра, якоря заголовков и название (первый заголовок) документа"""
+    links, texts = document_links(tokens)
+    source_dir = os.path.dirname(source)
+    edges = []
+    for link in links:
+        resolved, anchor = resolve_link(source_dir, link.target)
+        edges.append((source, len(edges), link.line, link.column, link.text, link.target,
+                      source if resolved is None else resolved, anchor))
+    slugs = [(source, slug) for slug in heading_slugs(texts)]
+    return edges, slugs, texts[0] if texts else ""
+
+
+def link_generation(index):
+    """Номер поколения графа: растёт при каждом обновлении, которое что-то изменило"""
+    row = index.db.execute("SELECT value FROM meta WHERE key = 'link_generation'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def link_epoch(index):
+    """
+    Метка графа: меняется, когда граф строится с нуля (новый индекс или смена корня),
+    и поколения до и после несравнимы.
+    """
+    db = index.db
+    row = db.execute("SELECT value FROM meta WHERE key = 'link_epoch'").fetchone()
+    if row:
+        return row[0]
+    epoch = uuid.uuid4().hex
+    with db:
+        db.execute("INSERT INTO meta (key, value) VALUES ('link_epoch', ?)", (epoch,))
+    return epoch
+
+
+def changed_since(index, generation):
+    """
+    Что изменилось в графе после поколения generation:
+    (перечитанные документы, удалённые документы).
+    """
+    db = index.db
+    parsed = [row[0] for row in db.execute(
+        "SELECT path FROM link_docs WHERE generation > ?", (generation,))]
+    removed = [row[0] for row in db.execute(
+        "SELECT path FROM link_tombstones WHERE generation > ?", (generation,))]
+    return parsed, removed
+
+
+def update_link_graph(index, root_path=None, workers=None):
+    """
+    Обновляет граф ссылок в индексе. Индекс должен быть свежим: refresh(verify_files=True).
+    Перечитанные документы помечаются новым поколением, удалённые попадают
+    в link_tombstones - так потребители графа (graph_metrics.py) находят изменения.
+    Возвращает {"parsed": N, "removed": N, "errors": [(путь, ошибка), ...]}.
+    """
+    root = root_path or index.root()
+    update_hashes(index, root, workers, suffix=".md")
+    db = index.db
+    generation = link_generation(index) + 1
+    result = {"parsed": 0, "removed": 0, "errors": []}
+    with db:
+        # Удалённые документы уносят с собой исходящие рёбра
+        gone = db.execute("SELECT path FROM link_docs WHERE path NOT IN (SELECT path FROM files)").fetchall()
+        db.executemany("DELETE FROM links WHERE source = ?", gone)
+        db.executemany("DELETE FROM headings WHERE path = ?", gone)
+        db.executemany("DELETE FROM link_docs WHERE path = ?", gone)
+        db.executemany("INSERT OR REPLACE INTO link_tombstones VALUES (?, ?)",
+                       [(path, generation) for path, in gone])
+        result["removed"] = len(gone)
+
+        stale = db.execute("""
+            SELECT h.path, h.digest, d.path IS NOT NULL
+            FROM files f JOIN hashes h ON h.path = f.path
+            LEFT JOIN link_docs d ON d.path = f.path
+            WHERE f.suffix = '.md' AND (d.path IS NULL OR d.digest != h.digest)
+        """).fetchall()
+        digests = {path: digest for path, digest, _ in stale}
+        # Рёбра есть только у документов из link_docs - остальным удалять нечего
+        parsed_before = {path for path, _, known in stale if known}
+
+        for source, tokens, error in document_tokens(index, digests, root, workers):
+            if source in parsed_before:
+                db.execute("DELETE FROM links WHERE source = ?", (source,))
+                db.execute("DELETE FROM headings WHERE path = ?", (source,))
+            if error is not None:
+                # Без записи в link_docs документ перечитается в следующий раз
+                db.execute("DELETE FROM link_docs WHERE path = ?", (source,))
+                db.execute("INSERT OR REPLACE INTO link_tombstones VALUES (?, ?)", (source, generation))
+                result["errors"].append((source, error))
+                continue
+            edges, slugs, title = _document_edges(source, tokens)
+            db.executemany("INSERT INTO links VALUES (?, ?, ?, ?, ?, ?, ?, ?)", edges)
+            db.executemany("INSERT INTO headings VALUES (?, ?)", slugs)
+            db.execute("INSERT OR REPLACE INTO link_docs VALUES (?, ?, ?, ?)",
+                       (source, digests[source], generation, title))
+            result["parsed"] += 1
+
+        if result["parsed"] or result["removed"] or result["errors"]:
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('link_generation', ?)",
+                       (str(generation),))
+    return result
+
+
+def links_from(index, path):
+    """Исходящие ссылки документа: [(текст, цель, путь цели), ...] в порядке текста"""
+    return index.db.execute(
+        "SELECT text, target, resolved FROM links WHERE source = ? ORDER BY position", (path,)).fetchall()
+
+
+def links_to(index, path):
+    """Входящие ссылки на документ или папку: [(документ, текст), ...] - поиск по индексу целей"""
+    return index.db.execute(
+        "SELECT source, text FROM links WHERE resolved = ? ORDER BY source, position", (path,)).fetchall()
+
+
+def broken_links(index, root_path=None):
+    """
+    Битые ссылки из графа: (документ, цель, текст ссылки, статус, строка, столбец).
+    Статус MISSING - цель не найдена ни среди файлов, ни среди папок,
+    BAD_ANCHOR - в документе-цели нет заголовка с таким якорем.
+    """
+    root = root_path or index.root()
+    # Сначала множество отсутствующих целей (слиянием, а не поиском на каждое ребро)
+    rows = index.db.execute("""
+        SELECT l.source, l.position, l.target, l.text, l.line, l.col, l.resolved FROM links l
+        WHERE l.resolved IN (
+            SELECT resolved FROM links EXCEPT SELECT path FROM files EXCEPT SELECT path FROM dirs)
+        UNION ALL
+        SELECT l.source, l.position, l.target, l.text, l.line, l.col, NULL FROM links l
+        WHERE l.anchor != '' AND l.resolved IN (SELECT path FROM link_docs)
+          AND NOT EXISTS (SELECT 1 FROM headings h WHERE h.path = l.resolved AND h.slug = l.anchor)
+        ORDER BY 1, 2
+    """)
+    for source, _, target, text, line, column, resolved in rows:
+        if resolved is None:
+            yield source, target, text, BAD_ANCHOR, line, column
+        # Цели вне индекса проверяем по диску
+        elif not (outside_tree(resolved) and os.path.exists(os.path.join(root, resolved))):
+            yield source, target, text, MISSING, line, column
+
+
+def document_titles(index):
+    """[(путь, название)] всех документов графа"""
+    return index.db.execute("SELECT path, title FROM link_docs ORDER BY path").fetchall()
+
+
+def graph_counts(index):
+    """Число документов в графе и ссылок между ними"""
+    documents, = index.db.execute("SELECT COUNT(*) FROM link_docs").fetchone()
+    links, = index.db.execute("SELECT COUNT(*) FROM links").fetchone()
+    return {"documents": documents, "links": links}
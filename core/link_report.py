@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+link_report.py - Отчёт о битых ссылках
+Версия: 0.1.1
+Назначение: Потоковая запись битых ссылок в NDJSON (по строке JSON на ссылку,
+по желанию - отдельный файл на каждую папку верхнего уровня) и сводка
+summary.json со счётчиками: панель читает только сводку, не подробности.
+Текстовый отчёт собирается из этих данных по запросу.
+"""
+
+import argparse
+import json
+import os
+from contextlib import ExitStack
+from datetime import datetime
+
+from atomic_io import atomic_open, atomic_write_text
+from link_graph import BAD_ANCHOR
+
+# Папка отчёта относительно корня архива
+REPORT_DIR = "link_report"
+SUMMARY_NAME = "summary.json"
+# Файл с подробностями без разбиения и шард документов из корня архива
+ALL_SHARD = "links"
+ROOT_SHARD = "_root"
+TEXT_REPORT = "link_check_report.txt"
+
+# Поля записи о битой ссылке; suggestion/score/fix - лучшая замена, если найдена,
+# detail - ответ сервера для внешней ссылки (код HTTP или ошибка)
+FIELDS = ("source", "target", "line", "column", "status", "text", "suggestion", "score", "fix", "detail")
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False)
+
+
+def shard_name(source):
+    """Шард записи: папка верхнего уровня документа-источника"""
+    head, sep, _ = source.partition(os.sep)
+    return head if sep else ROOT_SHARD
+
+
+class ReportWriter:
+    """
+    Пишет записи по мере поступления, не держа отчёт в памяти.
+    Файлы подменяются атомарно при выходе из блока with; при исключении
+    остаётся прежний отчёт. Сводка пишется последней.
+    """
+
+    def __init__(self, directory=REPORT_DIR, sharded=False):
+        self.directory = directory
+        self.sharded = sharded
+        self.totals = {}
+        self._stack = ExitStack()
+        self._files = {}
+        self._shards = {}
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not self.sharded:
+            self._open(ALL_SHARD)
+        return self
+
+    def _open(self, name):
+        path = os.path.join(self.directory, name + ".ndjson")
+        self._files[name] = self._stack.enter_context(atomic_open(path))
+        self._shards[name] = {"name": name, "file": name + ".ndjson", "broken": 0, "sources": set(),
+                              "statuses": {}}
+        return self._files[name]
+
+    def add(self, source, target, line, column, status, text, suggestion=None, score=None, fix=None,
+            detail=None):
+        """Добавляет запись о битой ссылке (поля FIELDS)"""
+        name = shard_name(source) if self.sharded else ALL_SHARD
+        f = self._files.get(name) or self._open(name)
+        f.write(_encoder.encode({"source": source, "target": target, "line": line, "column": column,
+                                 "status": status, "text": text, "suggestion": suggestion,
+                                 "score": score, "fix": fix, "detail": detail}))
+        f.write("\n")
+        shard = self._shards[name]
+        shard["broken"] += 1
+        shard["sources"].add(source)
+        shard["statuses"][status] = shard["statuses"].get(status, 0) + 1
+
+    def finish(self, **totals):
+        """Итоги проверки для сводки (проверено ссылок, документов и т.п.)"""
+        self.totals = totals
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stack.__exit__(exc_type, exc, tb)
+        if exc_type is not None:
+            return False
+        shards = []
+        statuses = {}
+        for name in sorted(self._shards):
+            shard = self._shards[name]
+            for status, count in shard["statuses"].items():
+                statuses[status] = statuses.get(status, 0) + count
+            shards.append(dict(shard, sources=len(shard["sources"])))
+        summary = dict(self.totals, generated_at=datetime.now().isoformat(timespec="seconds"),
+                       broken=sum(shard["broken"] for shard in shards), statuses=statuses,
+                       sharded=self.sharded, shards=shards)
+        atomic_write_text(os.path.join(self.directory, SUMMARY_NAME),
+                          json.dumps(summary, ensure_ascii=False, indent=2) + "\n")
+        # Шарды прошлых запусков, которых нет в новой сводке, удаляются
+        current = {shard["file"] for shard in shards}
+        for name in os.listdir(self.directory):
+            if name.endswith(".ndjson") and name not in current:
+                os.remove(os.path.join(self.directory, name))
+        return False
+
+
+def load_summary(directory=REPORT_DIR):
+    """Сводка последней проверки или None, если отчёта ещё нет"""
+    try:
+        with open(os.path.join(directory, SUMMARY_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def iter_records(directory=REPORT_DIR, shard=None, status=None):
+    """Записи о битых ссылках по порядку шардов сводки; shard/status - фильтры"""
+    summary = load_summary(directory)
+    if summary is None:
+        return
+    for entry in summary["shards"]:
+        if shard is not None and entry["name"] != shard:
+            continue
+        with open(os.path.join(directory, entry["file"]), encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if status is None or record["status"] == status:
+                    yield record
+
+
+def write_text_report(directory=REPORT_DIR, path=TEXT_REPORT):
+    """Текстовый отчёт из данных отчёта; возвращает False, если отчёта нет"""
+    summary = load_summary(directory)
+    if summary is None:
+        return False
+    with atomic_open(path) as f:
+        f.write("Отчет проверки ссылок\n")
+        f.write("====================\n")
+        f.write(f"Проверено ссылок: {summary.get('checked', 0)}\n")
+        f.write(f"Битых ссылок: {summary['broken']}\n\n")
+        if summary["broken"]:
+            f.write("Битые ссылки:\n")
+        for record in iter_records(directory):
+            f.write(f"Из: {record['source']}:{record['line']}:{record['column']}\n")
+            f.write(f"В: {record['target']}\n")
+            if record["status"] == BAD_ANCHOR:
+                f.write("Нет заголовка с таким якорем\n")
+            elif record.get("detail"):
+                f.write(f"Ответ сервера: {record['detail']}\n")
+            if record["suggestion"]:
+                f.write(f"Возможно: {record['suggestion']} ({record['score']})\n")
+            f.write("\n")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отчёт о битых ссылках (данные пишет link_checker.py)")
+    parser.add_argument("--dir", default=REPORT_DIR, help="папка отчёта")
+    parser.add_argument("--text", nargs="?", const=TEXT_REPORT, help="собрать текстовый отчёт")
+    parser.add_argument("--shard", help="показать ссылки одной папки верхнего уровня")
+    parser.add_argument("--status", help="показать ссылки с этим статусом (missing, bad_anchor, url_broken, url_unreachable)")
+    args = parser.parse_args()
+
+    summary = load_summary(args.dir)
+    if summary is None:
+        parser.exit(1, f"Отчёта нет в {args.dir}: запустите link_checker.py\n")
+    print(f"📊 Проверка от {summary['generated_at']}: ссылок {summary.get('checked', 0)}, "
+          f"битых {summary['broken']}")
+    for status, count in sorted(summary["statuses"].items()):
+        print(f"   {status}: {count}")
+    for entry in summary["shards"]:
+        print(f"   {entry['name']}/: {entry['broken']} битых в {entry['sources']} документах")
+
+    if args.shard or args.status:
+        for record in iter_records(args.dir, args.shard, args.status):
+            print(f"   {record['source']}:{record['line']}:{record['column']} → {record['target']} "
+                  f"[{record['status']}]")
+    if args.text:
+        write_text_report(args.dir, args.text)
+        print(f"📝 Текстовый отчёт: {args.text}")
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+markdown_tokens.py - Разбор Markdown-документов
+Версия: 0.1.0
+Назначение: Однопроходный токенизатор Markdown: ссылки (обычные, картинки,
+ссылки-сноски [текст][метка] и автоссылки <https://...>), заголовки, поля
+метаданных, блоки и фрагменты кода, сгенерированные разделы. У каждого токена
+есть смещение в байтах и строка; у ссылок ещё и столбец (в байтах, с 1).
+Ссылки внутри кода ссылками не считаются.
+
+Результат разбора кэшируется в индексе сканирования по хэшу содержимого:
+все инструменты (граф ссылок, метаданные) разбирают документ один раз
+на каждое его изменение.
+"""
+
+import marshal
+import os
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# Меняется при любом изменении вывода токенизатора - кэш тогда сбрасывается
+TOKENIZER_VERSION = 1
+# Столько документов рабочий процесс читает за одно задание
+BATCH_SIZE = 256
+# Столько хэшей запрашивается из кэша одним запросом
+CACHE_QUERY_CHUNK = 500
+
+# Виды ссылок
+INLINE = "inline"
+IMAGE = "image"
+REFERENCE = "reference"
+AUTOLINK = "autolink"
+
+Link = namedtuple("Link", "start end line column text target kind")
+Heading = namedtuple("Heading", "start line level text")
+# Поле метаданных: строка **Ключ:** значение или ключ: значение во front matter
+MetaField = namedtuple("MetaField", "start end line key value")
+CodeSpan = namedtuple("CodeSpan", "start end fenced")
+# Раздел между <!-- имя:start --> и <!-- имя:end -->, который пишут инструменты
+Generated = namedtuple("Generated", "start end name")
+MarkdownTokens = namedtuple("MarkdownTokens", "links headings metadata code generated")
+_TOKEN_TYPES = (Link, Heading, MetaField, CodeSpan, Generated)
+
+# Шаблоны начинаются с буквального символа (перевод строки, [, <, `): так re ищет
+# их быстрым поиском подстроки, а не пробует каждую позицию текста. Шаблоны
+# "с начала строки" ищутся в тексте с добавленным в начало переводом строки,
+# условие для определений ссылок проверяется отдельно.
+# Границы блоков кода и заголовки ATX
+BLOCK = re.compile(rb'\n {0,3}(?:(`{3,}|~{3,})|(#{1,6})(?:[ \t]+([^\n]*?))?[ \t#]*\r?(?=\n|\Z))')
+FRONT_MATTER_END = re.compile(rb'^(?:---|\.\.\.)[ \t]*\r?$', re.M)
+FRONT_MATTER_FIELD = re.compile(rb'^([\w-]+):[ \t]*(.*?)[ \t]*\r?$', re.M)
+META_FIELD = re.compile(rb'\n\*\*([^*\n]+?):\*\*[ \t]*([^\n]*?)[ \t]*\r?(?=\n|\Z)')
+INLINE_CODE = re.compile(rb'(`+)([^`]|[^`][^\n]*?[^`])\1(?!`)')
+DEFINITION = re.compile(rb'\[([^\]\n]+)\]:[ \t]*(<[^>\n]*>|\S+)')
+LINK = re.compile(rb'\[([^\]]+)\](?:\(([^)\n]+)\)|\[([^\]\n]*)\])?')
+AUTOLINK_PATTERN = re.compile(rb'<([a-zA-Z][a-zA-Z0-9+.-]{1,31}:[^<>\s]*)>')
+GENERATED_START = re.compile(rb'<!-- ([\w-]+):start -->')
+WHITESPACE = re.compile(r'\s+')
+
+
+def _text(raw):
+    return raw.decode("utf-8", "replace")
+
+
+def _label(text):
+    """Метка ссылки-сноски: без регистра и лишних пробелов"""
+    return WHITESPACE.sub(" ", text.strip()).casefold()
+
+
+class _Lines:
+    """
+    Номер строки (с 1) по смещению в байтах. Смещения запрашиваются
+    по возрастанию: строки досчитываются от предыдущего запроса.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        self.line = 1
+
+    def __call__(self, offset):
+        self.line += self.data.count(b"\n", self.offset, offset)
+        self.offset = offset
+        return self.line
+
+
+def _segments(data, fences, start):
+    """Участки текста вне блоков кода: [(начало, конец)]"""
+    segments = []
+    for fence in fences:
+        if fence.start > start:
+            segments.append((start, fence.start))
+        start = fence.end
+    if start < len(data):
+        segments.append((start, len(data)))
+    return segments
+
+
+def _indent(data, pos):
+    """Число символов между началом строки и pos, если перед pos только пробелы, иначе -1"""
+    line_start = data.rfind(b"\n", 0, pos) + 1
+    return pos - line_start if not data[line_start:pos].strip(b" ") else -1
+
+
+def tokenize(data):
+    """Разбирает документ (bytes) в MarkdownTokens"""
+    headings = []
+    metadata = []
+    code = []
+    generated = []
+
+    # Front matter в начале документа: поля метаданных, но не текст
+    start = 0
+    if data.startswith(b"---\n") or data.startswith(b"---\r\n"):
+        end_match = FRONT_MATTER_END.search(data, 4)
+        if end_match:
+            start = data.find(b"\n", end_match.end())
+            start = len(data) if start < 0 else start + 1
+            lines = _Lines(data)
+            for match in FRONT_MATTER_FIELD.finditer(data, 4, end_match.start()):
+                metadata.append(MetaField(match.start(), match.end(), lines(match.start()),
+                                          _text(match.group(1)), _text(match.group(2))))
+
+    # Блоки кода и заголовки - один проход по началам строк. Перед текстом
+    # ставится перевод строки, и смещение в нём совпадает с началом строки в data.
+    padded = b"\n" + data
+    lines = _Lines(data)
+    fence = None
+    for match in BLOCK.finditer(padded, start):
+        marker = match.group(1)
+        if fence is not None:
+            if marker and marker[:1] == fence[1][:1] and len(marker) >= len(fence[1]):
+                line_end = data.find(b"\n", match.end() - 1)
+                line_end = len(data) if line_end < 0 else line_end + 1
+                if not data[match.end() - 1:line_end].strip():
+                    code.append(CodeSpan(fence[0], line_end, True))
+                    fence = None
+        elif marker:
+            fence = (match.start(), marker)
+        elif match.group(3):
+            headings.append(Heading(match.start(), lines(match.start()),
+                                    len(match.group(2)), _text(match.group(3))))
+    if fence is not None:
+        code.append(CodeSpan(fence[0], len(data), True))
+
+    segments = _segments(data, code, start)
+
+    # Фрагменты `кода`, определения ссылок-сносок, поля **Ключ:** - вне блоков кода
+    inline_code = []
+    definitions = {}
+    definition_starts = set()
+    has_code = b"`" in data
+    has_definitions = b"]:" in data
+    lines = _Lines(data)
+    for seg_start, seg_end in segments:
+        if has_code:
+            inline_code.extend(CodeSpan(match.start(), match.end(), False)
+                               for match in INLINE_CODE.finditer(data, seg_start, seg_end))
+        if has_definitions:
+            for match in DEFINITION.finditer(data, seg_start, seg_end):
+                if not 0 <= _indent(data, match.start()) <= 3:
+                    continue
+                target = match.group(2)
+                if target.startswith(b"<") and target.endswith(b">"):
+                    target = target[1:-1]
+                definitions.setdefault(_label(_text(match.group(1))), _text(target))
+                definition_starts.add(match.start())
+        for match in META_FIELD.finditer(padded, seg_start, seg_end + 1):
+            metadata.append(MetaField(match.start(), match.end() - 1, lines(match.start()),
+                                      _text(match.group(1)), _text(match.group(2))))
+
+    # Ссылки - вне блоков и фрагментов кода
+    code_starts = [span.start for span in inline_code]
+
+    def in_code(pos):
+        i = bisect_right(code_starts, pos) - 1
+        return i >= 0 and pos < inline_code[i].end
+
+    # Строка и столбец (в байтах, с 1) досчитываются от предыдущей ссылки
+    links = []
+    line = 1
+    line_start = pos = 0
+    for seg_start, seg_end in segments:
+        for match in LINK.finditer(data, seg_start, seg_end):
+            link_start = match.start()
+            if code_starts and in_code(link_start):
+                continue
+            text, target, label = match.groups()
+            if target is not None:
+                kind = INLINE
+                target = target.decode("utf-8", "replace")
+            else:
+                # [текст][метка], [текст][] и [текст] - только если метка определена
+                if not definitions or link_start in definition_starts:
+                    continue
+                target = definitions.get(_label(_text(label or text)))
+                if target is None:
+                    continue
+                kind = REFERENCE
+            if link_start > seg_start and data[link_start - 1] == 0x21:  # "!"
+                link_start -= 1
+                if kind == INLINE:
+                    kind = IMAGE
+            newlines = data.count(b"\n", pos, link_start)
+            if newlines:
+                line += newlines
+                line_start = data.rfind(b"\n", pos, link_start) + 1
+            pos = link_start
+            links.append(Link(link_start, match.end(), line, link_start - line_start + 1,
+                              text.decode("utf-8", "replace"), target, kind))
+
+    # Автоссылки редки: для них строка считается от начала текста
+    if b"<" in data:
+        for seg_start, seg_end in segments:
+            for match in AUTOLINK_PATTERN.finditer(data, seg_start, seg_end):
+                link_start = match.start()
+                if code_starts and in_code(link_start):
+                    continue
+                url = _text(match.group(1))
+                links.append(Link(link_start, match.end(), data.count(b"\n", 0, link_start) + 1,
+                                  link_start - data.rfind(b"\n", 0, link_start), url, url, AUTOLINK))
+        links.sort()
+
+    for match in GENERATED_START.finditer(data):
+        end_marker = b"<!-- " + match.group(1) + b":end -->"
+        end = data.find(end_marker, match.end())
+        end = len(data) if end < 0 else end + len(end_marker)
+        generated.append(Generated(match.start(), end, _text(match.group(1))))
+
+    metadata.sort()
+    code.extend(inline_code)
+    code.sort()
+    return MarkdownTokens(links, headings, metadata, code, generated)
+
+
+def outside_generated(tokens, items, name):
+    """Токены items, которые не попадают в сгенерированный раздел name"""
+    ranges = [(region.start, region.end) for region in tokens.generated if region.name == name]
+    if not ranges:
+        return items
+    return [item for item in items if not any(start <= item.start < end for start, end in ranges)]
+
+
+def read_tokens(path):
+    """Читает и разбирает файл"""
+    with open(path, "rb") as f:
+        return tokenize(f.read())
+
+
+def dumps(tokens):
+    """Компактное представление токенов для кэша (marshal: только кортежи и строки)"""
+    return marshal.dumps(tuple(tuple(map(tuple, group)) for group in tokens))
+
+
+def loads(blob):
+    return MarkdownTokens(*(list(map(kind._make, group)) for kind, group in zip(_TOKEN_TYPES, marshal.loads(blob))))
+
+
+def map_batches(func, root_path, rel_paths, workers=None, batch_size=BATCH_SIZE,
+                initializer=None, initargs=()):
+    """
+    Выдаёт результаты func(root_path, пачка) по пачкам rel_paths в исходном порядке.
+    Больше одной пачки - в пуле процессов, иначе в текущем процессе.
+    """
+    batches = [rel_paths[i:i + batch_size] for i in range(0, len(rel_paths), batch_size)]
+    if len(batches) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for batch in batches:
+            yield func(root_path, batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=initargs) as pool:
+        yield from pool.map(func, repeat(root_path), batches)
+
+
+def _tokenize_batch(root_path, rel_paths):
+    """Разбирает пачку документов (в рабочем процессе); обратно уходят готовые для кэша байты"""
+    results = []
+    for path in rel_paths:
+        try:
+            results.append((path, dumps(read_tokens(os.path.join(root_path, path))), None))
+        except OSError as e:
+            results.append((path, None, str(e)))
+    return results
+
+
+def _check_cache_version(db):
+    version = f"{TOKENIZER_VERSION}.{marshal.version}"
+    row = db.execute("SELECT value FROM meta WHERE key = 'tokens_version'").fetchone()
+    if row is None or row[0] != version:
+        with db:
+            db.execute("DELETE FROM token_cache")
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('tokens_version', ?)", (version,))
+
+
+def markdown_digests(index):
+    """{путь: хэш} всех .md документов индекса (хэши считает update_hashes)"""
+    return dict(index.db.execute(
+        "SELECT f.path, h.digest FROM files f JOIN hashes h ON h.path = f.path WHERE f.suffix = '.md'"))
+
+
+def document_tokens(index, digests, root_path=None, workers=None):
+    """
+    Выдаёт (путь, токены, ошибка чтения или None) для документов digests ({путь: хэш}).
+    Токены берутся из кэша по хэшу; недостающие документы разбираются в пуле
+    процессов и сразу кэшируются. Записи кэша, чьих хэшей больше нет в индексе, удаляются.
+    Кэш пишется в текущей транзакции индекса - её фиксирует вызывающий (with index.db).
+    """
+    root = root_path or index.root()
+    db = index.db
+    _check_cache_version(db)
+    by_digest = {}
+    for path, digest in digests.items():
+        by_digest.setdefault(digest, []).append(path)
+    wanted = list(by_digest)
+    missing = []
+    for i in range(0, len(wanted), CACHE_QUERY_CHUNK):
+        chunk = wanted[i:i + CACHE_QUERY_CHUNK]
+        found = dict(db.execute(f"SELECT digest, data FROM token_cache WHERE digest IN "
+                                f"({','.join('?' * len(chunk))})", chunk))
+        for digest in chunk:
+            blob = found.get(digest)
+            if blob is None:
+                # Одинаковое содержимое разбирается один раз
+                missing.append(by_digest[digest][0])
+                continue
+            tokens = loads(blob)
+            for path in by_digest[digest]:
+                yield path, tokens, None
+
+    for results in map_batches(_tokenize_batch, root, missing, workers):
+        rows = []
+        for path, blob, error in results:
+            if error is not None:
+                for same in by_digest[digests[path]]:
+                    yield same, None, error
+                continue
+            rows.append((digests[path], blob))
+            tokens = loads(blob)
+            for same in by_digest[digests[path]]:
+                yield same, tokens, None
+        db.executemany("INSERT OR REPLACE INTO token_cache VALUES (?, ?)", rows)
+    if missing:
+        db.execute("DELETE FROM token_cache WHERE digest NOT IN (SELECT digest FROM hashes)")
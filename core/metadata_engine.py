@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+metadata_engine.py - Метаданные документов
+Версия: 0.3.0
+Назначение: Индекс блоков метаданных документов в индексе сканирования:
+ID, автор, даты создания и обновления, статус и версия из строк **Ключ:** значение
+(или front matter), а также ключи для поиска (metadata_query.py): префикс ID,
+даты в ISO, статус без пояснений, mtime файла. Документ разбирается один раз на изменение (кэш
+markdown_tokens.py). План добавления метаданных строится только по индексу,
+без чтения документов, ID выдаёт реестр (id_registry.py); применяется в пуле
+потоков с атомарной записью, и каждый документ перед записью проверяется заново.
+"""
+
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from archive_layout import load_layout
+from atomic_io import atomic_write_bytes
+from content_hash import update_hashes
+from markdown_tokens import document_tokens, tokenize
+
+# Ключ поля в документе -> столбец индекса; ключи front matter сравниваются без регистра
+FIELD_COLUMNS = {
+    "ID": "doc_id",
+    "Автор": "author",
+    "Авторы": "author",
+    "Дата создания": "created",
+    "Дата": "created",
+    "Статус": "status",
+    "Версия": "version",
+    "Последнее обновление": "updated",
+}
+FRONT_MATTER_COLUMNS = {"id": "doc_id", "author": "author", "created": "created", "date": "created",
+                        "status": "status", "version": "version", "updated": "updated"}
+COLUMNS = ("doc_id", "author", "created", "status", "version", "updated")
+
+# Строка индекса: title_line - строка первого заголовка первого уровня (None - его нет),
+# mtime_ns - время изменения файла
+DocMetadata = namedtuple("DocMetadata", ("path",) + COLUMNS + ("title_line", "mtime_ns"))
+# Изменение плана: документ и поля {ключ: значение} в порядке записи
+Change = namedtuple("Change", "path fields")
+
+# Значения по умолчанию для новых блоков метаданных
+DEFAULT_AUTHOR = "Водан"
+DEFAULT_STATUS = "Активный"
+DEFAULT_VERSION = "1.0.0"
+ROOT_CREATED = "2024-01-15"
+
+
+# Даты пишутся как 2024-01-15, 15.01.2024 или 15 января 2024 года
+ISO_DATE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+DOTTED_DATE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')
+WORD_DATE = re.compile(r'(\d{1,2})\s+([а-яё]+)\s+(\d{4})', re.IGNORECASE)
+MONTHS = {name: number for number, name in enumerate(
+    ("января", "февраля", "марта", "апреля", "мая", "июня", "июля", "августа",
+     "сентября", "октября", "ноября", "декабря"), 1)}
+
+
+def parse_date(text):
+    """Дата из значения поля в виде YYYY-MM-DD или None, если даты в нём нет"""
+    if not text:
+        return None
+    match = ISO_DATE.search(text)
+    if match:
+        year, month, day = map(int, match.groups())
+    elif (match := DOTTED_DATE.search(text)):
+        day, month, year = map(int, match.groups())
+    elif (match := WORD_DATE.search(text)) and match.group(2).lower() in MONTHS:
+        day, month, year = int(match.group(1)), MONTHS[match.group(2).lower()], int(match.group(3))
+    else:
+        return None
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def status_key(status):
+    """Статус для поиска: без пояснений после запятой и без регистра ("Активный, для применения" -> "активный")"""
+    return status.split(",", 1)[0].strip().casefold() if status else None
+
+
+def id_prefix(doc_id):
+    """Префикс ID (CON-2024-001 -> CON)"""
+    return doc_id.split("-", 1)[0] if doc_id else None
+
+
+def document_metadata(tokens):
+    """{столбец: значение} полей метаданных документа; при повторах берётся первое"""
+    values = {}
+    for field in tokens.metadata:
+        column = FIELD_COLUMNS.get(field.key) or FRONT_MATTER_COLUMNS.get(field.key.lower())
+        if column and column not in values:
+            values[column] = field.value
+    return values
+
+
+def _title_line(tokens):
+    return next((heading.line for heading in tokens.headings if heading.level == 1), None)
+
+
+def update_metadata_index(index, root_path=None, workers=None, paths=None):
+    """
+    Обновляет индекс метаданных: перечитываются (из кэша разбора) только
+    документы, чей хэш изменился. Индекс должен быть свежим: refresh(verify_files=True).
+    paths - обновить только эти документы (множество путей), остальные остаются как есть.
+    Возвращает {"parsed": N, "removed": N, "errors": [(путь, ошибка), ...]}.
+    """
+    root = root_path or index.root()
+    update_hashes(index, root, workers, suffix=".md", paths=paths)
+    db = index.db
+    result = {"parsed": 0, "removed": 0, "errors": []}
+    with db:
+        result["removed"] = db.execute("""
+            DELETE FROM doc_metadata WHERE path NOT IN (SELECT path FROM files WHERE suffix = '.md')
+        """).rowcount
+        stale = db.execute("""
+            SELECT h.path, h.digest, h.mtime_ns, m.digest
+            FROM files f JOIN hashes h ON h.path = f.path
+            LEFT JOIN doc_metadata m ON m.path = f.path
+            WHERE f.suffix = '.md' AND (m.path IS NULL OR m.digest != h.digest OR m.mtime_ns != h.mtime_ns)
+        """).fetchall()
+        if paths is not None:
+            stale = [row for row in stale if row[0] in paths]
+        # Файл тронут, но содержимое то же - меняется только mtime
+        db.executemany("UPDATE doc_metadata SET mtime_ns = ? WHERE path = ?",
+                       [(mtime_ns, path) for path, digest, mtime_ns, old in stale if digest == old])
+        digests = {path: digest for path, digest, _, old in stale if digest != old}
+        mtimes = {path: mtime_ns for path, _, mtime_ns, _ in stale}
+        rows = []
+        for path, tokens, error in document_tokens(index, digests, root, workers):
+            if error is not None:
+                db.execute("DELETE FROM doc_metadata WHERE path = ?", (path,))
+                result["errors"].append((path, error))
+                continue
+            values = document_metadata(tokens)
+            doc_id, author, created, status, version, updated = (values.get(column) for column in COLUMNS)
+            rows.append((path, digests[path], mtimes[path], doc_id, id_prefix(doc_id), author,
+                         author.casefold() if author else None, created, parse_date(created), status,
+                         status_key(status), version, updated, parse_date(updated), _title_line(tokens)))
+        db.executemany(f"INSERT OR REPLACE INTO doc_metadata VALUES ({', '.join('?' * 15)})", rows)
+        if rows:
+            # Статистика для выбора индексов в metadata_query.py
+            db.execute("PRAGMA optimize")
+        result["parsed"] = len(rows)
+    return result
+
+
+def metadata_of(index, path):
+    """DocMetadata документа или None, если его нет в индексе"""
+    row = index.db.execute(f"SELECT {', '.join(DocMetadata._fields)} FROM doc_metadata WHERE path = ?",
+                           (path,)).fetchone()
+    return DocMetadata(*row) if row else None
+
+
+def new_metadata(doc_id, created):
+    """Поля нового блока метаданных в порядке записи"""
+    return {
+        "ID": doc_id,
+        "Автор": DEFAULT_AUTHOR,
+        "Дата создания": created,
+        "Статус": DEFAULT_STATUS,
+        "Версия": DEFAULT_VERSION,
+    }
+
+
+def _scope_rows(db, layout):
+    """(префикс, корневой ли документ, путь) документов, которым нужны метаданные"""
+    for folder, prefix in layout.doc_prefixes.items():
+        for path, in db.execute("""
+            SELECT path FROM files WHERE parent = ? AND suffix = '.md' AND name != 'README.md' ORDER BY name
+        """, (folder,)):
+            yield prefix, False, path
+    for filename, prefix in layout.root_documents.items():
+        if db.execute("SELECT 1 FROM files WHERE path = ?", (filename,)).fetchone():
+            yield prefix, True, filename
+
+
+def metadata_scope(index, layout=None):
+    """Пути документов, которые рассматривает plan_metadata"""
+    return {path for _, _, path in _scope_rows(index.db, layout or load_layout())}
+
+
+def plan_metadata(index, registry, layout=None, created=None):
+    """
+    План добавления метаданных по индексу (документы не читаются):
+    (изменения [Change], пропущенные [(путь, причина)]).
+    Кандидаты - документы разделов с префиксом ID (кроме README.md) и корневые
+    документы из archive_layout.json, у которых в индексе нет ID.
+    ID выдаёт registry (IdRegistry) по префиксу и году даты создания.
+    """
+    created = created or datetime.now().strftime("%Y-%m-%d")
+    changes = []
+    skipped = []
+    for prefix, is_root, path in list(_scope_rows(index.db, layout or load_layout())):
+        entry = metadata_of(index, path)
+        if entry is None:
+            skipped.append((path, "нет в индексе метаданных"))
+        elif entry.doc_id is not None:
+            skipped.append((path, "уже имеет метаданные"))
+        elif entry.title_line is None:
+            skipped.append((path, "нет заголовка первого уровня"))
+        else:
+            date = ROOT_CREATED if is_root else created
+            changes.append(Change(path, new_metadata(registry.allocate(prefix, int(date[:4]), path), date)))
+    return changes, skipped
+
+
+def insert_metadata(data, tokens, fields):
+    """
+    Документ data (bytes) с блоком полей fields после первого заголовка первого уровня.
+    None - блок не нужен или вставить его некуда: ID уже есть или нет заголовка.
+    """
+    if "doc_id" in document_metadata(tokens):
+        return None
+    heading = next((heading for heading in tokens.headings if heading.level == 1), None)
+    if heading is None:
+        return None
+    line_end = data.find(b"\n", heading.start)
+    if line_end < 0:
+        data += b"\n"
+        line_end = len(data) - 1
+    pos = line_end + 1
+    block = "\n" + "".join(f"**{key}:** {value}\n" for key, value in fields.items())
+    # Пустая строка после блока, если за заголовком сразу идёт текст
+    if pos < len(data) and not data.startswith((b"\n", b"\r\n"), pos):
+        block += "\n"
+    return data[:pos] + block.encode("utf-8") + data[pos:]
+
+
+def _apply_change(root_path, change):
+    full_path = os.path.join(root_path, change.path)
+    with open(full_path, "rb") as f:
+        data = f.read()
+    # Документ мог измениться после построения плана - проверяем заново
+    new_data = insert_metadata(data, tokenize(data), change.fields)
+    if new_data is None:
+        return False
+    atomic_write_bytes(full_path, new_data)
+    return True
+
+
+def apply_plan(changes, root_path=".", workers=None):
+    """
+    Применяет изменения плана в пуле потоков; каждый документ читается
+    и атомарно перезаписывается один раз.
+    Возвращает (записанные [Change], пропущенные [Change], ошибки [(путь, ошибка)]).
+    """
+    written = []
+    skipped = []
+    errors = []
+
+    def work(change):
+        try:
+            return change, _apply_change(root_path, change), None
+        except OSError as e:
+            return change, False, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for change, done, error in pool.map(work, changes):
+            if error is not None:
+                errors.append((change.path, error))
+            elif done:
+                written.append(change)
+            else:
+                skipped.append(change)
+    return written, skipped, errors
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+metadata_query.py - Поиск документов по метаданным
+Версия: 0.1.0
+Назначение: Выборки вида "все активные CON версии 1.x, изменённые после X"
+по индексу метаданных (metadata_engine.py) в индексе сканирования:
+выборка идёт по самому избирательному из вторичных индексов SQLite,
+документы не открываются. Перед выборкой индекс обновляется инкрементально
+(только изменённые документы), --no-refresh - выборка по индексу как есть.
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from metadata_engine import DocMetadata, status_key, update_metadata_index
+from scan_index import ScanIndex
+
+# Верхняя граница диапазона для поиска по началу строки: "водан" <= x < "водан" + MAX_CHAR
+MAX_CHAR = "\U0010ffff"
+
+
+# Индексы выборок (см. scan_index.SCHEMA): имя -> столбцы
+QUERY_INDEXES = (
+    ("doc_metadata_id", ("doc_id",)),
+    ("doc_metadata_prefix", ("id_prefix", "status_key", "version", "mtime_ns")),
+    ("doc_metadata_status", ("status_key", "version", "mtime_ns")),
+    ("doc_metadata_author", ("author_key", "created_on")),
+    ("doc_metadata_created", ("created_on",)),
+    ("doc_metadata_updated", ("updated_on",)),
+    ("doc_metadata_version", ("version",)),
+    ("doc_metadata_mtime", ("mtime_ns",)),
+)
+# Сколько записей индекса самое большее просматривает оценка избирательности
+PROBE_LIMIT = 5_000
+
+
+def _prefix_range(column, prefix):
+    return column, f"{column} >= ? AND {column} < ?", [prefix, prefix + MAX_CHAR], False
+
+
+def version_condition(pattern):
+    """
+    Условие на версию: "1.x" или "1.*" - ровно "1" или "1." и что угодно дальше
+    (точка по индексу и диапазон "1." <= версия < "1/": "/" идёт сразу за "."),
+    но не "1-beta" или "10.0"; "1.0" - ровно 1.0
+    """
+    if pattern.endswith((".x", ".*")):
+        major = pattern[:-2]
+        return ("version", "(version = ? OR (version >= ? AND version < ?))",
+                [major, major + ".", major + "/"], False)
+    return "version", "version = ?", [pattern], True
+
+
+def _ns(day):
+    """Начало дня YYYY-MM-DD в наносекундах (местное время, как mtime файлов)"""
+    return int(datetime.fromisoformat(day).timestamp()) * 1_000_000_000
+
+
+def conditions(doc_id=None, prefix=None, status=None, author=None, version=None,
+               created_since=None, created_until=None, updated_since=None,
+               modified_since=None, modified_until=None):
+    """
+    Условия выборки: [(столбец, SQL, параметры, точное ли совпадение)].
+    Даты - YYYY-MM-DD, границы включительно.
+    author - начало имени автора без регистра, status - без пояснений и регистра.
+    """
+    result = []
+    if doc_id is not None:
+        result.append(("doc_id", "doc_id = ?", [doc_id], True))
+    if prefix is not None:
+        result.append(("id_prefix", "id_prefix = ?", [prefix], True))
+    if status is not None:
+        result.append(("status_key", "status_key = ?", [status_key(status)], True))
+    if author is not None:
+        result.append(_prefix_range("author_key", author.casefold()))
+    if version is not None:
+        result.append(version_condition(version))
+    if created_since is not None:
+        result.append(("created_on", "created_on >= ?", [created_since], False))
+    if created_until is not None:
+        result.append(("created_on", "created_on <= ?", [created_until], False))
+    if updated_since is not None:
+        result.append(("updated_on", "updated_on >= ?", [updated_since], False))
+    if modified_since is not None:
+        result.append(("mtime_ns", "mtime_ns >= ?", [_ns(modified_since)], False))
+    if modified_until is not None:
+        # До конца указанного дня
+        result.append(("mtime_ns", "mtime_ns < ?", [_ns(modified_until) + 86_400 * 1_000_000_000], False))
+    return result
+
+
+def _where(conds):
+    return " AND ".join(cond[1] for cond in conds), [param for cond in conds for param in cond[2]]
+
+
+def _seek(conds, columns):
+    """Условия, по которым индекс со столбцами columns ищет диапазон: точные по первым столбцам и один диапазон"""
+    seek = []
+    for column in columns:
+        on_column = [cond for cond in conds if cond[0] == column]
+        seek.extend(on_column)
+        if not on_column or not all(cond[3] for cond in on_column):
+            break
+    return seek
+
+
+def choose_index(db, conds):
+    """
+    Самый избирательный индекс для условий или None. Планировщик SQLite
+    не знает распределения дат и версий, поэтому диапазон каждого подходящего
+    индекса измеряется на деле: до PROBE_LIMIT записей, только по индексу.
+    При равенстве выигрывает индекс, который проверяет больше условий сам.
+    """
+    best = None
+    for name, columns in QUERY_INDEXES:
+        seek = _seek(conds, columns)
+        if not seek:
+            continue
+        sql, params = _where(seek)
+        found = db.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM doc_metadata INDEXED BY {name} "
+                           f"WHERE {sql} LIMIT {PROBE_LIMIT})", params).fetchone()[0]
+        key = (found, -sum(cond[0] in columns for cond in conds))
+        if best is None or key < best[0]:
+            best = (key, name)
+        if found == 0:
+            break
+    return best and best[1]
+
+
+def _from_where(db, filters):
+    conds = conditions(**filters)
+    sql = "FROM doc_metadata"
+    if not conds:
+        return sql, []
+    name = choose_index(db, conds)
+    if name:
+        sql += f" INDEXED BY {name}"
+    where, params = _where(conds)
+    return f"{sql} WHERE {where}", params
+
+
+def query_documents(index, limit=None, **filters):
+    """Документы, подходящие под все условия (аргументы conditions), по порядку путей: [DocMetadata]"""
+    sql, params = _from_where(index.db, filters)
+    sql = f"SELECT {', '.join(DocMetadata._fields)} {sql} ORDER BY path"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [DocMetadata(*row) for row in index.db.execute(sql, params)]
+
+
+def count_documents(index, **filters):
+    """Число документов, подходящих под условия (без выборки строк)"""
+    sql, params = _from_where(index.db, filters)
+    return index.db.execute(f"SELECT COUNT(*) {sql}", params).fetchone()[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск документов архива по метаданным")
+    parser.add_argument("--id", dest="doc_id", help="ID документа")
+    parser.add_argument("--prefix", help="префикс ID (CON, STR, ...)")
+    parser.add_argument("--status", help="статус (Активный, Черновик, ...)")
+    parser.add_argument("--author", help="автор (начало имени, без регистра)")
+    parser.add_argument("--version", help="версия: 1.0.0 или шаблон 1.x")
+    parser.add_argument("--created-since", help="создан не раньше YYYY-MM-DD")
+    parser.add_argument("--created-until", help="создан не позже YYYY-MM-DD")
+    parser.add_argument("--updated-since", help="поле «Последнее обновление» не раньше YYYY-MM-DD")
+    parser.add_argument("--modified-since", help="файл изменён не раньше YYYY-MM-DD")
+    parser.add_argument("--modified-until", help="файл изменён не позже YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, help="не больше N документов")
+    parser.add_argument("--count", action="store_true", help="только число документов")
+    parser.add_argument("--no-refresh", action="store_true", help="не обновлять индекс перед выборкой")
+    parser.add_argument("--index", help="путь к индексу сканирования (по умолчанию - индекс корня архива)")
+    args = parser.parse_args()
+    filters = {name: getattr(args, name) for name in (
+        "doc_id", "prefix", "status", "author", "version", "created_since", "created_until",
+        "updated_since", "modified_since", "modified_until")}
+
+    with ScanIndex(args.index, ".") as index:
+        if not args.no_refresh:
+            index.refresh(".", verify_files=True)
+            update_metadata_index(index, ".")
+        start = time.perf_counter()
+        if args.count:
+            found = count_documents(index, **filters)
+            spent = time.perf_counter() - start
+            print(f"🔎 Найдено документов: {found} ({spent * 1000:.1f} мс)")
+        else:
+            documents = query_documents(index, limit=args.limit, **filters)
+            spent = time.perf_counter() - start
+            for doc in documents:
+                print(f"{doc.path}\t{doc.doc_id or '-'}\t{doc.status or '-'}\t{doc.version or '-'}\t"
+                      f"{doc.created or '-'}")
+            print(f"🔎 Найдено документов: {len(documents)} ({spent * 1000:.1f} мс)")
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+scan_index.py - Постоянный индекс сканирования архива
+Версия: 0.8.0
+Назначение: Инкрементальное сканирование по mtime папок вместо полного обхода
+
+Индекс хранится в SQLite в служебной папке core/.cache/ (обходчик в неё не заходит),
+у каждого корня архива - свой файл (index_path_for), так что запуск из другой
+папки не трогает индекс архива:
+для каждого файла - путь, размер, mtime_ns и inode, для каждой папки - mtime_ns.
+Повторное сканирование делает один stat на папку и перечитывает только те папки,
+чей mtime изменился (в них появились, исчезли или переименованы записи).
+Содержимое файлов в неизменённых папках по умолчанию не перепроверяется -
+для этого есть refresh(verify_files=True).
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+from archive_walker import IGNORE_FOLDERS, list_dir
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+# Корень архива - папка над core/; его индекс - scan_index.db
+ARCHIVE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(CACHE_DIR, "scan_index.db")
+
+# Папки с mtime моложе этого порога перечитываются и в следующий раз:
+# изменение в пределах того же тика часов иначе осталось бы незамеченным.
+RACY_WINDOW_NS = 2_000_000_000
+
+# Версия схемы: индекс - кэш, при несовпадении он пересоздаётся с нуля
+SCHEMA_VERSION = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    name TEXT,
+    suffix TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    inode INTEGER
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    digest TEXT
+);
+CREATE TABLE IF NOT EXISTS file_stats (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    lines INTEGER,
+    words INTEGER,
+    headings INTEGER
+);
+CREATE TABLE IF NOT EXISTS link_docs (
+    path TEXT PRIMARY KEY,
+    digest TEXT,
+    generation INTEGER,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS link_tombstones (
+    path TEXT PRIMARY KEY,
+    generation INTEGER
+);
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT,
+    position INTEGER,
+    line INTEGER,
+    col INTEGER,
+    text TEXT,
+    target TEXT,
+    resolved TEXT,
+    anchor TEXT
+);
+CREATE TABLE IF NOT EXISTS headings (
+    path TEXT,
+    slug TEXT
+);
+CREATE TABLE IF NOT EXISTS backlink_docs (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS token_cache (
+    digest TEXT PRIMARY KEY,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS doc_metadata (
+    path TEXT PRIMARY KEY,
+    digest TEXT,
+    mtime_ns INTEGER,
+    doc_id TEXT,
+    id_prefix TEXT,
+    author TEXT,
+    author_key TEXT,
+    created TEXT,
+    created_on TEXT,
+    status TEXT,
+    status_key TEXT,
+    version TEXT,
+    updated TEXT,
+    updated_on TEXT,
+    title_line INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE INDEX IF NOT EXISTS hashes_digest ON hashes(digest);
+CREATE INDEX IF NOT EXISTS files_parent ON files(parent);
+CREATE INDEX IF NOT EXISTS files_suffix ON files(suffix);
+CREATE INDEX IF NOT EXISTS links_source ON links(source);
+CREATE INDEX IF NOT EXISTS links_resolved ON links(resolved);
+CREATE INDEX IF NOT EXISTS headings_path ON headings(path, slug);
+CREATE INDEX IF NOT EXISTS link_docs_generation ON link_docs(generation);
+CREATE INDEX IF NOT EXISTS link_tombstones_generation ON link_tombstones(generation);
+CREATE INDEX IF NOT EXISTS doc_metadata_id ON doc_metadata(doc_id);
+CREATE INDEX IF NOT EXISTS doc_metadata_prefix ON doc_metadata(id_prefix, status_key, version, mtime_ns);
+CREATE INDEX IF NOT EXISTS doc_metadata_status ON doc_metadata(status_key, version, mtime_ns);
+CREATE INDEX IF NOT EXISTS doc_metadata_author ON doc_metadata(author_key, created_on);
+CREATE INDEX IF NOT EXISTS doc_metadata_created ON doc_metadata(created_on);
+CREATE INDEX IF NOT EXISTS doc_metadata_updated ON doc_metadata(updated_on);
+CREATE INDEX IF NOT EXISTS doc_metadata_version ON doc_metadata(version);
+CREATE INDEX IF NOT EXISTS doc_metadata_mtime ON doc_metadata(mtime_ns);
+"""
+
+
+def index_path_for(root_path="."):
+    """
+    Файл индекса для корня root_path (по абсолютному пути): у архива - DEFAULT_INDEX_PATH,
+    у любого другого корня - отдельный файл рядом, чтобы индексы разных корней не затирали друг друга
+    """
+    root = os.path.abspath(root_path)
+    if root == ARCHIVE_ROOT:
+        return DEFAULT_INDEX_PATH
+    key = hashlib.blake2b(root.encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(CACHE_DIR, f"scan_index-{key}.db")
+
+
+def _subtree_bounds(rel_path):
+    """Границы диапазона путей внутри папки (для выборок по первичному ключу)"""
+    prefix = rel_path + os.sep
+    return prefix, rel_path + chr(ord(os.sep) + 1)
+
+
+class ScanIndex:
+    """
+    Индекс файлов и папок одного архива.
+    index_path=None - файл индекса корня root_path (index_path_for).
+    """
+
+    def __init__(self, index_path=None, root_path="."):
+        index_path = index_path or index_path_for(root_path)
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        self.db = sqlite3.connect(index_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._reset_schema()
+        self.db.executescript(SCHEMA)
+
+    def _reset_schema(self):
+        """Удаляет таблицы устаревшей схемы; при следующем refresh индекс заполнится заново"""
+        tables = [row[0] for row in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        with self.db:
+            for table in tables:
+                self.db.execute(f'DROP TABLE "{table}"')
+        self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _bind_root(self, root):
+        """
+        Привязывает индекс к корню архива; при смене корня индекс сбрасывается.
+        Файлы index_path_for у разных корней разные, так что сброс возможен
+        только с явно переданным чужим index_path.
+        """
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        if row and row[0] == root:
+            return
+        self.db.execute("DELETE FROM dirs")
+        self.db.execute("DELETE FROM files")
+        self.db.execute("DELETE FROM hashes")
+        self.db.execute("DELETE FROM file_stats")
+        self.db.execute("DELETE FROM link_docs")
+        self.db.execute("DELETE FROM links")
+        self.db.execute("DELETE FROM backlink_docs")
+        self.db.execute("DELETE FROM headings")
+        self.db.execute("DELETE FROM link_tombstones")
+        self.db.execute("DELETE FROM token_cache")
+        self.db.execute("DELETE FROM doc_metadata")
+        self.db.execute("DELETE FROM meta WHERE key IN ('link_generation', 'link_epoch')")
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('root', ?)", (root,))
+
+    def _drop_subtree(self, rel_path):
+        low, high = _subtree_bounds(rel_path)
+        self.db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (rel_path, low, high))
+        self.db.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+
+    def _sync_files(self, rel_path, files, stats):
+        """Сверяет файлы папки с индексом и записывает только изменения"""
+        known = {
+            row[0]: row[1:]
+            for row in self.db.execute(
+                "SELECT name, size, mtime_ns, inode FROM files WHERE parent = ?", (rel_path,))
+        }
+        changed = []
+        for entry in files:
+            if known.pop(entry.name, None) != (entry.size, entry.mtime_ns, entry.inode):
+                changed.append((entry.rel_path, rel_path, entry.name, os.path.splitext(entry.name)[1],
+                                entry.size, entry.mtime_ns, entry.inode))
+        if changed:
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", changed)
+        if known:
+            prefix = rel_path + os.sep if rel_path else ""
+            self.db.executemany("DELETE FROM files WHERE path = ?", [(prefix + name,) for name in known])
+        stats["files_updated"] += len(changed)
+        stats["files_removed"] += len(known)
+
+    def refresh(self, root_path=".", ignore=IGNORE_FOLDERS, verify_files=False):
+        """
+        Приводит индекс в соответствие с диском.
+        Возвращает статистику: сколько папок проверено, перечитано,
+        сколько файлов обновлено и удалено из индекса.
+        """
+        root = os.path.abspath(root_path)
+        start_ns = time.time_ns()
+        stats = {"dirs_checked": 0, "dirs_listed": 0, "files_updated": 0, "files_removed": 0}
+
+        with self.db:
+            self._bind_root(root)
+            known_dirs = {}
+            children = {}
+            for path, parent, mtime_ns in self.db.execute("SELECT path, parent, mtime_ns FROM dirs"):
+                known_dirs[path] = mtime_ns
+                if path:
+                    children.setdefault(parent, []).append(path)
+
+            stack = [""]
+            while stack:
+                rel_path = stack.pop()
+                abs_path = os.path.join(root, rel_path) if rel_path else root
+                stats["dirs_checked"] += 1
+                try:
+                    mtime_ns = os.stat(abs_path).st_mtime_ns
+                except FileNotFoundError:
+                    self._drop_subtree(rel_path)
+                    continue
+
+                if known_dirs.get(rel_path) == mtime_ns:
+                    # Состав папки не менялся - спускаемся по известным подпапкам
+                    stack.extend(children.get(rel_path, ()))
+                    if verify_files:
+                        try:
+                            files, _ = list_dir(abs_path, rel_path, ignore, with_stat=True)
+                        except OSError:
+                            continue
+                        self._sync_files(rel_path, files, stats)
+                    continue
+
+                stats["dirs_listed"] += 1
+                try:
+                    files, subdirs = list_dir(abs_path, rel_path, ignore, with_stat=True)
+                except OSError:
+                    # Папка исчезла или стала нечитаемой посреди обхода
+                    self._drop_subtree(rel_path)
+                    continue
+
+                self._sync_files(rel_path, files, stats)
+
+                current = {folder.rel_path for folder in subdirs}
+                for old in children.get(rel_path, ()):
+                    if old not in current:
+                        self._drop_subtree(old)
+                stack.extend(current)
+
+                stored_mtime = -1 if mtime_ns > start_ns - RACY_WINDOW_NS else mtime_ns
+                parent = os.path.dirname(rel_path) if rel_path else None
+                self.db.execute("INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                                (rel_path, parent, stored_mtime))
+        return stats
+
+    def folders(self):
+        """Все папки архива (без корня), как относительные пути"""
+        return [row[0] for row in self.db.execute("SELECT path FROM dirs WHERE path != '' ORDER BY path")]
+
+    def count_files(self, suffix=None):
+        if suffix is None:
+            return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return self.db.execute("SELECT COUNT(*) FROM files WHERE suffix = ?", (suffix,)).fetchone()[0]
+
+    def files_under(self, rel_path):
+        """Имена и пути файлов внутри папки (рекурсивно)"""
+        low, high = _subtree_bounds(rel_path)
+        return self.db.execute(
+            "SELECT path, name, size, mtime_ns FROM files WHERE path >= ? AND path < ?", (low, high)).fetchall()
+
+    def file_names(self, rel_path):
+        """Имена файлов непосредственно в папке - из индекса, без обращения к диску"""
+        return frozenset(row[0] for row in self.db.execute("SELECT name FROM files WHERE parent = ?", (rel_path,)))
+
+    def root(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        return row[0] if row else None
+
+    def has_dir(self, rel_path):
+        return self.db.execute("SELECT 1 FROM dirs WHERE path = ?", (rel_path,)).fetchone() is not None
+
+    def has_file(self, rel_path):
+        return self.db.execute("SELECT 1 FROM files WHERE path = ?", (rel_path,)).fetchone() is not None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обновление постоянного индекса сканирования")
+    parser.add_argument("root", nargs="?", default=".", help="корень архива")
+    parser.add_argument("--index", help="путь к индексу (по умолчанию - свой файл у каждого корня)")
+    parser.add_argument("--verify-files", action="store_true", help="перепроверить файлы и в неизменённых папках")
+    args = parser.parse_args()
+
+    with ScanIndex(args.index, args.root) as index:
+        start = time.perf_counter()
+        stats = index.refresh(args.root, verify_files=args.verify_files)
+        spent = time.perf_counter() - start
+    print(f"🗂️  Индекс обновлён за {spent:.3f} с: {stats}")
@@ -1,41 +1,44 @@
 #!/usr/bin/env python3
 """
 scanner.py - Первый орган чувств ИИ-Садовода
-Версия: 0.1.0
+Версия: 0.1.2
 Назначение: Анализ структуры архива
 """
 
 import os
 from pathlib import Path
 
+from archive_layout import load_layout
+from archive_walker import walk_archive
+
 def scan_archive(root_path="."):
     """Сканирует структуру архива"""
     print("🔍 Сканирую архив...")
     
     root = Path(root_path)
     
-    # Считаем файлы по типам
+    # Считаем файлы по типам и собираем папки за один проход
     total_files = 0
     markdown_files = []
-    
-    for file_path in root.rglob("*"):
-        if file_path.is_file():
-            total_files += 1
-            if file_path.suffix == ".md":
-                markdown_files.append(file_path)
-    
-    # Анализируем структуру папок
     folders = []
-    for folder in root.rglob("*/"):
-        if folder.is_dir():
-            folders.append(str(folder.relative_to(root)))
+    core_files = []
+    core_prefix = "core" + os.sep
     
-    # Проверяем наличие README в папках
     folders_without_readme = []
-    for folder in folders:
-        readme_path = root / folder / "README.md"
-        if not readme_path.exists():
-            folders_without_readme.append(folder)
+    
+    for entry in walk_archive(root):
+        if entry.is_dir:
+            folders.append(entry.rel_path)
+            # Наличие README видно из уже прочитанного каталога папки
+            if "README.md" not in (entry.files or ()):
+                folders_without_readme.append(entry.rel_path)
+            continue
+        total_files += 1
+        if os.path.splitext(entry.name)[1] == ".md":
+            markdown_files.append(entry.path)
+            continue
+        if entry.rel_path.startswith(core_prefix) and entry.name.endswith(".py"):
+            core_files.append(entry.name)
     
     print(f"\n📊 Результаты сканирования:")
     print(f"   Всего файлов: {total_files}")
@@ -50,14 +53,7 @@ def scan_archive(root_path="."):
     
     # Анализируем основные документы
     print(f"\n📚 Основные документы:")
-    important_docs = [
-        "concepts/transcendental-rationalism.md",
-        "concepts/garden-of-minds.md",
-        "system/memory_protocols.md",
-        "CHRONOLOGY.md"
-    ]
-    
-    for doc in important_docs:
+    for doc in load_layout().important_docs:
         doc_path = root / doc
         if doc_path.exists():
             print(f"   ✅ {doc}")
@@ -65,10 +61,9 @@ def scan_archive(root_path="."):
             print(f"   ❌ {doc} (отсутствует!)")
     
     # Проверяем core
-    core_files = list((root / "core").rglob("*.py")) if (root / "core").exists() else []
     print(f"\n🤖 Файлы в core/: {len(core_files)}")
-    for py_file in core_files:
-        print(f"   - {py_file.name}")
+    for py_name in core_files:
+        print(f"   - {py_name}")
 
 if __name__ == "__main__":
     scan_archive()
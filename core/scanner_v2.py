@@ -1,61 +1,152 @@
 #!/usr/bin/env python3
 """
 scanner_v2.py - Улучшенный сканер ИИ-Садовода
-Версия: 0.2.0
+Версия: 0.10.0
 Назначение: Анализ структуры архива с игнорированием служебных папок
 """
 
+import argparse
+import fnmatch
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
 
-def scan_archive(root_path="."):
-    """Сканирует структуру архива, игнорируя служебные папки"""
-    print("🔍 Улучшенный сканер архива...")
-    print("=" * 50)
-    
-    root = Path(root_path)
+from archive_layout import load_layout
+from archive_walker import list_dir, walk_archive
+from content_hash import find_duplicates, update_hashes
+from file_stats import folder_rollup, render_rollup, update_file_stats
+from scan_index import ScanIndex, index_path_for
+
+# Разделы проекта, обязательные файлы и основные документы - из archive_layout.json
+LAYOUT = load_layout()
+
+def _has_match(names, pattern):
+    if any(ch in pattern for ch in "*?["):
+        return any(fnmatch.fnmatchcase(name, pattern) for name in names)
+    return pattern in names
+
+def check_folder(folder, names, required_files=None):
+    """
+    Сверяет имена файлов папки (уже прочитанные при обходе) с обязательными для её типа
+    (тип - имя раздела; в списках допускаются шаблоны fnmatch).
+    Возвращает запись о соответствии или None, если папка не относится к проекту.
+    """
+    folder_type = os.path.basename(folder)
+    if folder_type not in LAYOUT.folder_set:
+        return None
+    required = (LAYOUT.required_files if required_files is None else required_files).get(
+        folder_type, LAYOUT.default_required_files)
+    names = names or ()
+    return {
+        "folder": folder,
+        "type": folder_type,
+        "required": list(required),
+        "missing": [pattern for pattern in required if not _has_match(names, pattern)]
+    }
+
+def _add_compliance(summary, compliance):
+    summary["compliance"].append(compliance)
+    if "README.md" in compliance["missing"]:
+        summary["folders_without_readme"].append(compliance["folder"])
+
+def _new_summary():
+    return {
+        "type": "summary",
+        "total_files": 0,
+        "markdown_files": 0,
+        "project_folders": 0,
+        "folders_without_readme": [],
+        "compliance": [],
+        "core_files": {"python": 0, "markdown": 0, "total": 0}
+    }
+
+def iter_scan_records(root_path=".", with_stat=True, required_files=None, start=""):
+    """
+    Потоковое сканирование: выдаёт запись на каждую папку и файл по мере обхода,
+    последней - сводку с теми же полями, что возвращает scan_archive.
+    Списки файлов не накапливаются, поэтому память не растёт с размером архива.
+    with_stat=False экономит stat на файл, если нужны только итоги.
+    Соответствие папок проекта обязательным файлам берётся из уже прочитанного
+    каталога, без отдельных проверок существования.
+    start - обход одного поддерева (оно само тоже попадает в записи).
+    """
+    summary = _new_summary()
+    core_prefix = "core" + os.sep
     
-    # Папки, которые нужно игнорировать
-    ignore_folders = {'.git', '.github', '__pycache__', '.idea', '.vscode', 'node_modules'}
-    
-    # Считаем файлы по типам
-    total_files = 0
-    markdown_files = []
-    
-    for file_path in root.rglob("*"):
-        if file_path.is_file():
-            # Пропускаем файлы в игнорируемых папках
-            if any(part in ignore_folders for part in file_path.parts):
-                continue
-            total_files += 1
-            if file_path.suffix == ".md":
-                markdown_files.append(file_path)
-    
-    # Анализируем структуру папок (исключая игнорируемые)
-    folders = []
-    for folder in root.rglob("*/"):
-        if folder.is_dir():
-            # Пропускаем игнорируемые папки
-            if any(part in ignore_folders for part in folder.parts):
-                continue
-            folders.append(str(folder.relative_to(root)))
-    
-    # Проверяем наличие README в папках проекта
-    project_folders = ['concepts', 'dialoguesstrategies', 'strategies', 'system', 'templates', 'core']
-    folders_without_readme = []
+    for entry in walk_archive(root_path, with_stat=with_stat, start=start):
+        if entry.is_dir:
+            summary["project_folders"] += 1
+            record = {"type": "folder", "path": entry.rel_path, "mtime_ns": entry.mtime_ns}
+            compliance = check_folder(entry.rel_path, entry.files, required_files)
+            if compliance is not None:
+                _add_compliance(summary, compliance)
+                record["missing"] = compliance["missing"]
+            yield record
+            continue
+        
+        suffix = os.path.splitext(entry.name)[1]
+        summary["total_files"] += 1
+        if suffix == ".md":
+            summary["markdown_files"] += 1
+        if entry.rel_path.startswith(core_prefix):
+            summary["core_files"]["total"] += 1
+            if suffix == ".py":
+                summary["core_files"]["python"] += 1
+            elif suffix == ".md":
+                summary["core_files"]["markdown"] += 1
+        yield {"type": "file", "path": entry.rel_path, "size": entry.size, "mtime_ns": entry.mtime_ns}
     
+    yield summary
+
+def index_summary(index, required_files=None):
+    """Сводка сканирования по уже обновлённому индексу - без обращений к диску"""
+    summary = _new_summary()
+    summary["total_files"] = index.count_files()
+    summary["markdown_files"] = index.count_files(".md")
+    folders = index.folders()
     for folder in folders:
-        # Проверяем только основные папки проекта
-        folder_name = Path(folder).name
-        if folder_name in project_folders or folder in project_folders:
-            readme_path = root / folder / "README.md"
-            if not readme_path.exists():
-                folders_without_readme.append(folder)
+        if os.path.basename(folder) in LAYOUT.folder_set:
+            _add_compliance(summary, check_folder(folder, index.file_names(folder), required_files))
+    for _, name, _, _ in index.files_under("core"):
+        summary["core_files"]["total"] += 1
+        suffix = os.path.splitext(name)[1]
+        if suffix == ".py":
+            summary["core_files"]["python"] += 1
+        elif suffix == ".md":
+            summary["core_files"]["markdown"] += 1
+    summary["project_folders"] = len(folders)
+    return summary
+
+def _summary_from_index(index_path, root_path, required_files=None, hashes=False):
+    """
+    Обновляет постоянный индекс (перечитывая только изменённые папки) и берёт сводку из него.
+    С hashes=True размеры и mtime сверяются у всех файлов, а изменившиеся хэшируются.
+    """
+    with ScanIndex(index_path, root_path) as index:
+        index.refresh(root_path, verify_files=hashes)
+        summary = index_summary(index, required_files)
+        if hashes:
+            hashed = update_hashes(index, os.path.abspath(root_path))
+            summary["hashed_files"] = hashed["hashed"]
+            summary["changed_files"] = hashed["changed"]
+            summary["duplicates"] = find_duplicates(index)
+        return summary
+
+def print_scan_report(root_path, summary):
+    """Печатает привычный отчёт сканера по сводной записи"""
+    root = Path(root_path)
+    folders_without_readme = summary["folders_without_readme"]
     
+    print("🔍 Улучшенный сканер архива...")
+    print("=" * 50)
     print(f"📊 РЕЗУЛЬТАТЫ СКАНИРОВАНИЯ:")
-    print(f"   📁 Всего файлов: {total_files}")
-    print(f"   📄 Markdown документов: {len(markdown_files)}")
-    print(f"   📂 Папок проекта: {len(folders)}")
+    print(f"   📁 Всего файлов: {summary['total_files']}")
+    print(f"   📄 Markdown документов: {summary['markdown_files']}")
+    print(f"   📂 Папок проекта: {summary['project_folders']}")
     print(f"   ⚠️  Папок без README: {len(folders_without_readme)}")
     
     if folders_without_readme:
@@ -63,18 +154,24 @@ def scan_archive(root_path="."):
         for folder in folders_without_readme:
             print(f"   - {folder}")
     
+    if "duplicates" in summary:
+        print(f"\n🧬 СОДЕРЖИМОЕ (захэшировано заново: {summary['hashed_files']}):")
+        print(f"   ✏️  Изменённых файлов: {len(summary['changed_files'])}")
+        for path in summary["changed_files"][:10]:
+            print(f"   - {path}")
+        print(f"   👯 Групп дубликатов: {len(summary['duplicates'])}")
+        for group in summary["duplicates"]:
+            print(f"   - {' = '.join(group)}")
+    
+    incomplete = [c for c in summary["compliance"] if c["missing"] and c["missing"] != ["README.md"]]
+    if incomplete:
+        print(f"\n📌 Папки без обязательных файлов:")
+        for compliance in incomplete:
+            print(f"   - {compliance['folder']}: {', '.join(compliance['missing'])}")
+    
     # Анализируем основные документы
     print(f"\n📚 ОСНОВНЫЕ ДОКУМЕНТЫ:")
-    important_docs = [
-        "manifest.md",
-        "concepts/transcendental-rationalism.md",
-        "concepts/garden-of-minds.md",
-        "system/memory_protocols.md",
-        "CHRONOLOGY.md",
-        "core/companion-ai-manifesto-v1.md"
-    ]
-    
-    for doc in important_docs:
+    for doc in LAYOUT.important_docs:
         doc_path = root / doc
         if doc_path.exists():
             # Получаем размер файла
@@ -85,50 +182,180 @@ def scan_archive(root_path="."):
     
     # Анализ core
     print(f"\n🤖 КОМПОНЕНТЫ ИИ-СОРАТНИКА:")
-    core_files = list((root / "core").rglob("*")) if (root / "core").exists() else []
-    
-    for file_type, extension in [("Python скрипты", ".py"), ("Документы", ".md"), ("Все файлы", "*")]:
-        if extension == "*":
-            files = core_files
-        else:
-            files = [f for f in core_files if f.suffix == extension]
-        print(f"   📂 {file_type}: {len(files)}")
+    core_files = summary["core_files"]
+    for file_type, key in [("Python скрипты", "python"), ("Документы", "markdown"), ("Все файлы", "total")]:
+        print(f"   📂 {file_type}: {core_files[key]}")
     
     print(f"\n💡 РЕКОМЕНДАЦИИ:")
-    if len(markdown_files) < 30:
+    if summary["markdown_files"] < 30:
         print("   1. Добавить больше Markdown документов для развития архива")
     if folders_without_readme:
         print("   2. Создать README.md в папках проекта")
     print("   3. Проверить связи между документами")
+
+def scan_archive(root_path=".", index_path=None, report=True, required_files=None, hashes=False):
+    """
+    Сканирует структуру архива, игнорируя служебные папки.
+    С index_path результаты восстанавливаются из постоянного индекса сканирования.
+    report=False отключает печать отчёта; required_files переопределяет обязательные файлы раскладки.
+    В "compliance" - соответствие каждой папки проекта обязательным файлам.
+    hashes=True (работает через индекс) добавляет "duplicates" - группы файлов
+    с одинаковым содержимым и "changed_files" - файлы, чьё содержимое изменилось.
+    """
+    if hashes and not index_path:
+        index_path = index_path_for(root_path)
+    if index_path:
+        summary = _summary_from_index(index_path, root_path, required_files, hashes)
+    else:
+        for record in iter_scan_records(root_path, with_stat=False, required_files=required_files):
+            pass
+        summary = record
+    
+    if report:
+        print_scan_report(root_path, summary)
     
+    results = {
+        "total_files": summary["total_files"],
+        "markdown_files": summary["markdown_files"],
+        "project_folders": summary["project_folders"],
+        "folders_without_readme": summary["folders_without_readme"],
+        "compliance": summary["compliance"]
+    }
+    if hashes:
+        results["duplicates"] = summary["duplicates"]
+        results["changed_files"] = summary["changed_files"]
+    return results
+
+def _scan_subtree(root_path, rel_path):
+    """Сканирует одно поддерево верхнего уровня (выполняется в рабочем процессе)"""
+    start = time.perf_counter()
+    for summary in iter_scan_records(root_path, with_stat=False, start=rel_path):
+        pass
     return {
-        "total_files": total_files,
-        "markdown_files": len(markdown_files),
-        "project_folders": len(folders),
-        "folders_without_readme": folders_without_readme
+        "root": root_path,
+        "subtree": rel_path,
+        "total_files": summary["total_files"],
+        "markdown_files": summary["markdown_files"],
+        "project_folders": summary["project_folders"],
+        "folders_without_readme": summary["folders_without_readme"],
+        "compliance": summary["compliance"],
+        "seconds": time.perf_counter() - start,
+        "worker": os.getpid(),
     }
 
-def generate_structure_map(root_path="."):
-    """Генерирует карту структуры проекта"""
+def scan_archives(roots, workers=None):
+    """
+    Сканирует несколько архивов параллельно, разбивая обход по поддеревьям верхнего уровня.
+    Возвращает объединённый результат в формате scan_archive; в "timings"
+    лежит время каждого поддерева и номер процесса, который его сканировал.
+    """
+    print(f"🔍 Параллельное сканирование архивов: {len(roots)}")
+    print("=" * 50)
+    
+    results = {
+        "total_files": 0,
+        "markdown_files": 0,
+        "project_folders": 0,
+        "folders_without_readme": [],
+        "compliance": [],
+        "timings": []
+    }
+    start = time.perf_counter()
+    
+    # Файлы в корнях считаем сразу, папки верхнего уровня раздаём процессам
+    tasks = []
+    for root_path in roots:
+        files, subdirs = list_dir(root_path)
+        results["total_files"] += len(files)
+        results["markdown_files"] += sum(1 for f in files if os.path.splitext(f.name)[1] == ".md")
+        tasks.extend((root_path, folder.rel_path) for folder in subdirs)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_scan_subtree, root_path, rel_path) for root_path, rel_path in tasks]
+        for future in as_completed(futures):
+            part = future.result()
+            results["total_files"] += part["total_files"]
+            results["markdown_files"] += part["markdown_files"]
+            results["project_folders"] += part["project_folders"]
+            for folder in part["folders_without_readme"]:
+                if len(roots) > 1:
+                    folder = os.path.join(part["root"], folder)
+                results["folders_without_readme"].append(folder)
+            for compliance in part["compliance"]:
+                if len(roots) > 1:
+                    compliance["folder"] = os.path.join(part["root"], compliance["folder"])
+                results["compliance"].append(compliance)
+            results["timings"].append({
+                "root": part["root"],
+                "subtree": part["subtree"],
+                "seconds": part["seconds"],
+                "worker": part["worker"]
+            })
+    
+    results["folders_without_readme"].sort()
+    results["compliance"].sort(key=lambda c: c["folder"])
+    results["timings"].sort(key=lambda t: t["seconds"], reverse=True)
+    
+    print(f"📊 РЕЗУЛЬТАТЫ СКАНИРОВАНИЯ:")
+    print(f"   📁 Всего файлов: {results['total_files']}")
+    print(f"   📄 Markdown документов: {results['markdown_files']}")
+    print(f"   📂 Папок проекта: {results['project_folders']}")
+    print(f"   ⚠️  Папок без README: {len(results['folders_without_readme'])}")
+    for folder in results["folders_without_readme"]:
+        print(f"   - {folder}")
+    
+    print(f"\n⏱️  ВРЕМЯ ПО ПОДДЕРЕВЬЯМ (всего {time.perf_counter() - start:.2f} с):")
+    for timing in results["timings"][:10]:
+        print(f"   {timing['seconds']:8.3f} с  {os.path.join(timing['root'], timing['subtree'])} (процесс {timing['worker']})")
+    if len(results["timings"]) > 10:
+        print(f"   ... и ещё {len(results['timings']) - 10} поддеревьев")
+    
+    per_worker = {}
+    for timing in results["timings"]:
+        seconds, count = per_worker.get(timing["worker"], (0.0, 0))
+        per_worker[timing["worker"]] = (seconds + timing["seconds"], count + 1)
+    print(f"\n👷 НАГРУЗКА ПО ПРОЦЕССАМ:")
+    for worker, (seconds, count) in sorted(per_worker.items(), key=lambda item: item[1][0], reverse=True):
+        print(f"   процесс {worker}: {seconds:.3f} с, поддеревьев: {count}")
+    
+    return results
+
+def generate_structure_map(root_path=".", stats=False, index_path=None, depth=2):
+    """
+    Генерирует карту структуры проекта.
+    stats=True - режим для планирования объёма: по всем файлам считаются байты, строки,
+    слова и заголовки (в пуле потоков, с кэшем в индексе - пересчитываются только
+    изменённые файлы), печатается свёртка по папкам и возвращается её дерево.
+    """
     print(f"\n🗺️  КАРТА СТРУКТУРЫ ПРОЕКТА:")
     print("=" * 50)
     
-    root = Path(root_path)
-    ignore_folders = {'.git', '.github', '__pycache__', '.idea', '.vscode'}
+    if stats:
+        with ScanIndex(index_path, root_path) as index:
+            index.refresh(root_path, verify_files=True)
+            recounted = update_file_stats(index, os.path.abspath(root_path))
+            tree = folder_rollup(index)
+        print(f"📏 Пересчитано файлов: {recounted}")
+        for line in render_rollup(tree, max_depth=depth):
+            print(line)
+        return tree
     
-    # Основные папки проекта
-    project_folders = ['concepts', 'dialoguesstrategies', 'strategies', 'system', 'templates', 'core']
+    root = Path(root_path)
     
-    for folder_name in project_folders:
+    for folder_name in LAYOUT.folders:
         folder_path = root / folder_name
         if folder_path.exists():
-            # Считаем файлы в папке
-            files = list(folder_path.rglob("*"))
-            # Исключаем файлы в подпапках для простоты
-            direct_files = [f for f in folder_path.iterdir() if f.is_file()]
+            # Только непосредственное содержимое папки, одним чтением каталога
+            direct_files = []
+            subfolders = 0
+            for entry in walk_archive(folder_path, max_depth=0):
+                if entry.is_dir:
+                    subfolders += 1
+                else:
+                    direct_files.append(entry)
             
             print(f"\n{folder_name}/")
-            print(f"  📁 Подпапок: {len([f for f in folder_path.iterdir() if f.is_dir()])}")
+            print(f"  📁 Подпапок: {subfolders}")
             print(f"  📄 Файлов: {len(direct_files)}")
             
             # Показываем первые 5 файлов
@@ -141,12 +368,69 @@ def generate_structure_map(root_path="."):
             print(f"\n{folder_name}/ (отсутствует!)")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Анализ структуры архива")
+    parser.add_argument("roots", nargs="*", default=["."], help="корни архивов")
+    parser.add_argument("--index",
+                        help="файл постоянного индекса сканирования (по умолчанию - свой у каждого корня)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="полный обход без индекса")
+    parser.add_argument("--workers", type=int,
+                        help="параллельное сканирование поддеревьев в N процессах")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="потоковый вывод: JSON-строка на каждый файл и папку, в конце - сводка")
+    parser.add_argument("--hash", action="store_true",
+                        help="хэшировать содержимое (BLAKE2) и искать дубликаты и изменённые файлы")
+    parser.add_argument("--stats", action="store_true",
+                        help="карта структуры со статистикой: байты, строки, слова, заголовки по папкам")
+    parser.add_argument("--stats-json", metavar="FILE",
+                        help="сохранить дерево статистики по папкам в JSON (подразумевает --stats)")
+    parser.add_argument("--watch", action="store_true",
+                        help="следить за архивом (inotify или опрос) и публиковать свежие итоги")
+    parser.add_argument("--poll", type=float, metavar="SEC",
+                        help="в режиме --watch опрашивать индекс раз в SEC секунд вместо inotify")
+    parser.add_argument("--debounce", type=float, default=0.5,
+                        help="пауза затишья перед публикацией изменений в режиме --watch")
+    args = parser.parse_args()
+    
+    if args.watch:
+        from archive_watch import watch_archive
+        
+        def show(summary):
+            print(f"🔄 {datetime.now():%H:%M:%S} файлов: {summary['total_files']}, "
+                  f"Markdown: {summary['markdown_files']}, папок: {summary['project_folders']}, "
+                  f"без README: {len(summary['folders_without_readme'])}", flush=True)
+        
+        print(f"👁️  Слежу за архивом {os.path.abspath(args.roots[0])} (Ctrl+C - выход)")
+        try:
+            watch_archive(args.roots[0], on_update=show, debounce=args.debounce,
+                          poll=args.poll is not None, interval=args.poll or 5.0, index_path=args.index)
+        except KeyboardInterrupt:
+            print("\n👋 Наблюдение остановлено")
+        sys.exit(0)
+    
+    if args.ndjson:
+        for record in iter_scan_records(args.roots[0]):
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if record["type"] != "file":
+                sys.stdout.flush()
+        sys.exit(0)
+    
     print("=" * 60)
     print("ИИ-СОРАТНИК: АНАЛИЗ АРХИВА")
     print("=" * 60)
     
-    results = scan_archive()
-    generate_structure_map()
+    if args.workers or len(args.roots) > 1:
+        results = scan_archives(args.roots, workers=args.workers)
+    else:
+        index_path = args.index or index_path_for(args.roots[0])
+        results = scan_archive(args.roots[0], index_path=None if args.no_index else index_path,
+                               hashes=args.hash)
+        tree = generate_structure_map(args.roots[0], stats=args.stats or bool(args.stats_json),
+                                      index_path=args.index)
+        if args.stats_json:
+            with open(args.stats_json, "w", encoding="utf-8") as f:
+                json.dump(tree, f, ensure_ascii=False, indent=2)
+            print(f"💾 Статистика по папкам сохранена: {args.stats_json}")
     
     print(f"\n" + "=" * 60)
     print("✅ Анализ завершен. Архив готов к развитию.")
@@ -6,10 +6,16 @@ import numpy as np
 
 # Импортируем нашего существующего Садовода
 from ai_architect_v1 import AI_Architect
+from archive_watch import load_published_state
+from graph_metrics import archive_metrics, metrics_path_for
+from scan_index import index_path_for
+from scanner_v2 import scan_archive
 
 class StewardOrchestrator:
     def __init__(self, memory_path="core/memory.json"):
         self.memory_path = memory_path
+        # Векторы метрик графа ссылок (компоненты, PageRank) - рядом с памятью
+        self.metrics_path = metrics_path_for(memory_path)
         self.memory = self._load_memory()
         self.gardener = AI_Architect()
         print(f"[Оркестратор] Инициализирован. Память загружена: {len(self.memory['cycles'])} записей.")
@@ -35,11 +41,21 @@ class StewardOrchestrator:
             json.dump(self.memory, f, indent=2, ensure_ascii=False)
 
     def take_snapshot(self):
-        """Создаёт снимок текущего состояния архива (заглушка для scanner.py)."""
-        # В будущем здесь будет вызов scanner.scan_archive()
+        """Создаёт снимок текущего состояния архива."""
+        # Свежие итоги работающего наблюдателя (scanner_v2.py --watch) - без обхода дерева,
+        # иначе - инкрементальное сканирование через постоянный индекс
+        results = load_published_state(".")
+        if results is None:
+            results = scan_archive(".", index_path=index_path_for("."), report=False)
+        # Метрики графа ссылок обновляются инкрементально от прошлого цикла
+        graph = archive_metrics(".", self.metrics_path, top=0)
         snapshot = {
             "timestamp": datetime.now().isoformat(),
-            "file_count": len(os.listdir("concepts")) + len(os.listdir("strategies")) + 10, # Примерная логика
+            "file_count": results["total_files"],
+            "markdown_count": results["markdown_files"],
+            "connectivity": graph["connectivity"],
+            "link_components": graph["components"],
+            "orphan_documents": graph["orphans"],
             "hypothesis": "В архиве преобладают концептуальные документы над стратегическими."
         }
         self.memory["archive_snapshots"].append(snapshot)
@@ -67,7 +83,7 @@ class StewardOrchestrator:
             action = "Проанализировать связность существующих концепций"
             topic = "Связность"
 
-        evaluation = self.gardener.evaluate_action(action)
+        evaluation = self.gardener.evaluate_action(action, connectivity=snapshot["connectivity"])
         print(f"         Решение: '{action}' -> {evaluation['verdict']}")
 
         # ФАЗА 3: ДЕЙСТВИЕ (Action) - только если рекомендовано
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+synthetic_archive.py - Генератор синтетического архива
+Версия: 0.1.0
+Назначение: Создание архива заданного размера для замеров: документы с блоком
+метаданных (**ID:**, **Автор:** ...), ссылки [текст](путь.md) между ними
+(часть - битые), вложенные папки, а также .git и виртуальное окружение,
+которые инструменты должны пропускать
+"""
+
+import argparse
+import os
+import random
+from pathlib import Path
+
+from archive_layout import load_layout
+
+DOCS_PER_FOLDER = 200
+FOLDERS_PER_TOPIC = 20
+
+WORDS = (
+    "сад разум симбиоз связность преемственность разнообразие концепция стратегия "
+    "диалог память архив усложнение сознание принцип императив эволюция мост "
+    "протокол гипотеза наблюдение рефлексия садовод семя корень ветвь"
+).split()
+
+
+def _doc_paths(docs, sections):
+    """Раскладывает документы по разделам и вложенным папкам: раздел/тема/папка/doc.md"""
+    paths = []
+    for i in range(docs):
+        section = sections[i % len(sections)]
+        n = i // len(sections)
+        folder = n // DOCS_PER_FOLDER
+        topic = folder // FOLDERS_PER_TOPIC
+        paths.append(f"{section}/topic-{topic:03d}/part-{folder:04d}/doc-{n:07d}.md")
+    return paths
+
+
+def _paragraph(rng, words=40):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def render_document(rng, rel_path, prefix, number, targets, with_metadata, broken_share, links):
+    """Текст одного документа в стиле архива"""
+    lines = [f"# Документ {number}: {rng.choice(WORDS)} и {rng.choice(WORDS)}", ""]
+    if with_metadata:
+        lines += [
+            f"**ID:** {prefix}-2024-{number:03d}",
+            "**Автор:** Водан",
+            f"**Дата создания:** 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            f"**Статус:** {rng.choice(('Активный', 'Черновик', 'Архивный'))}",
+            f"**Версия:** {rng.randint(1, 3)}.{rng.randint(0, 9)}.0",
+            "",
+        ]
+    lines += [_paragraph(rng), "", "## Связи", ""]
+    source_dir = os.path.dirname(rel_path)
+    for _ in range(links):
+        if rng.random() < broken_share:
+            target = f"missing-{rng.randint(0, 10**6)}.md"
+        else:
+            target = os.path.relpath(rng.choice(targets), source_dir).replace(os.sep, "/")
+        lines.append(f"- [{rng.choice(WORDS)}]({target})")
+    lines += ["", "## Источники", "", "- [Сайт проекта](https://example.org/garden)", "",
+              _paragraph(rng, 80), ""]
+    return "\n".join(lines)
+
+
+def generate_archive(root, docs, seed=0, broken_share=0.05, links_per_doc=5,
+                     metadata_share=0.8, ignored_share=0.5):
+    """
+    Создаёт синтетический архив из docs документов в папке root.
+    ignored_share - сколько файлов (относительно docs) положить в .git и venv.
+    Возвращает число созданных документов.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    layout = load_layout()
+    sections = [name for name in layout.folders if name in layout.doc_prefixes]
+    paths = _doc_paths(docs, sections)
+
+    made_dirs = set()
+    for number, rel_path in enumerate(paths, 1):
+        folder = os.path.dirname(rel_path)
+        if folder not in made_dirs:
+            (root / folder).mkdir(parents=True, exist_ok=True)
+            made_dirs.add(folder)
+        section = rel_path.split("/", 1)[0]
+        text = render_document(rng, rel_path, layout.doc_prefixes[section], number, paths,
+                               rng.random() < metadata_share, broken_share, links_per_doc)
+        with open(root / rel_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    for section in layout.folders:
+        (root / section).mkdir(exist_ok=True)
+        (root / section / "README.md").write_text(f"# {section}\n\nРаздел архива.\n", encoding="utf-8")
+    for doc in layout.important_docs:
+        doc_path = root / doc
+        doc_path.parent.mkdir(parents=True, exist_ok=True)
+        if not doc_path.exists():
+            doc_path.write_text(f"# {doc}\n\n{_paragraph(rng)}\n", encoding="utf-8")
+    (root / "docs").mkdir(exist_ok=True)
+    (root / "docs" / "index.html").write_text("<html><body>Сад</body></html>\n", encoding="utf-8")
+
+    # Служебные папки: их содержимое не должно влиять на результаты инструментов
+    ignored = int(docs * ignored_share)
+    for i in range(ignored):
+        if i % 2:
+            folder = root / ".git" / "objects" / f"{i % 256:02x}"
+            name = f"{i:038x}"
+        else:
+            folder = root / "venv" / "lib" / "python3.12" / "site-packages" / f"pkg{i // 500:04d}"
+            name = f"module_{i}.py"
+        if folder not in made_dirs:
+            folder.mkdir(parents=True, exist_ok=True)
+            made_dirs.add(folder)
+        (folder / name).write_text("# vendored\n", encoding="utf-8")
+    return len(paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор синтетического архива")
+    parser.add_argument("root", help="папка, в которой создать архив")
+    parser.add_argument("--docs", type=int, default=1000, help="число документов")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--broken-share", type=float, default=0.05, help="доля битых ссылок")
+    args = parser.parse_args()
+
+    created = generate_archive(args.root, args.docs, seed=args.seed, broken_share=args.broken_share)
+    print(f"✅ Создано документов: {created} в {args.root}")
@@ -17,6 +17,11 @@ except ImportError as e:
     print(f"Внимание: Не удалось загрузить модули ИИ. Интерфейс будет в демо-режиме. Ошибка: {e}")
     ARCHITECT_AVAILABLE = False
 
+from link_report import REPORT_DIR, load_summary
+
+# Отчёт link_checker.py лежит в корне архива, на уровень выше core/
+ARCHIVE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 app = Flask(__name__)
 
 # Инициализируем ядро системы (один раз при запуске)
@@ -99,6 +104,10 @@ def system_status():
     }
     if orchestrator is not None and hasattr(orchestrator, 'memory'):
         status['last_cycle'] = f"Всего циклов: {len(orchestrator.memory.get('cycles', []))}"
+    # Только сводка проверки ссылок - подробности отчёта не читаются
+    summary = load_summary(os.path.join(ARCHIVE_ROOT, REPORT_DIR))
+    if summary is not None:
+        status['links'] = {key: summary.get(key) for key in ('generated_at', 'checked', 'broken', 'statuses')}
     return jsonify(status)
 
 if __name__ == '__main__':
@@ -0,0 +1,38 @@
+"""Общее для проверок: модули core/ импортируются по имени, как их импортируют сами инструменты"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "core"))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """Пустой временный архив"""
+    root = tmp_path / "archive"
+    root.mkdir()
+    return root
+
+
+@pytest.fixture
+def write(archive):
+    """write({относительный путь: текст}) - пишет файлы архива; None вместо текста - удалить файл"""
+    def write_files(files):
+        for rel_path, text in files.items():
+            path = archive / rel_path
+            if text is None:
+                path.unlink()
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(text, encoding="utf-8")
+    return write_files
+
+
+@pytest.fixture
+def index(tmp_path, archive):
+    """Индекс сканирования временного архива в отдельном файле (индекс архива репозитория не трогается)"""
+    from scan_index import ScanIndex
+
+    with ScanIndex(str(tmp_path / "scan_index.db"), str(archive)) as index:
+        yield index
@@ -0,0 +1,41 @@
+"""Раскладка архива: манифест разбирается в неизменяемые структуры, разделы определяются по первой папке пути"""
+import json
+import os
+
+from archive_layout import load_layout, section_of
+
+
+def test_manifest_is_compiled_once(tmp_path):
+    path = tmp_path / "layout.json"
+    path.write_text(json.dumps({
+        "default_required_files": ["README.md"],
+        "sections": {
+            "notes": {"doc_prefix": "NOT"},
+            "drafts": {"required_files": ["README.md", "index.*"]},
+        },
+        "root_documents": {"manifest.md": "ROOT"},
+        "important_docs": ["manifest.md", "notes/main.md"],
+    }), encoding="utf-8")
+
+    layout = load_layout(str(path))
+    assert layout.folders == ("notes", "drafts")
+    assert layout.folder_set == frozenset({"notes", "drafts"})
+    assert layout.doc_prefixes == {"notes": "NOT"}
+    assert layout.required_files == {"notes": ("README.md",), "drafts": ("README.md", "index.*")}
+    assert layout.root_documents == {"manifest.md": "ROOT"}
+    assert layout.important_docs == ("manifest.md", "notes/main.md")
+    # Повторное чтение - из кэша, без разбора файла
+    path.unlink()
+    assert load_layout(str(path)) is layout
+
+    assert section_of(os.path.join("notes", "deep", "a.md"), layout) == "notes"
+    assert section_of("notes/a.md", layout) == "notes"
+    assert section_of(os.path.join("concepts", "a.md"), layout) is None
+    assert section_of("manifest.md", layout) is None
+
+
+def test_archive_manifest_matches_tools():
+    layout = load_layout()
+    assert "core" in layout.folder_set and "core" not in layout.doc_prefixes
+    assert section_of(os.path.join("templates", "README.md")) == "templates"
+    assert "new-*.md" in layout.required_files["templates"]
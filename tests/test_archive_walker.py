@@ -0,0 +1,57 @@
+"""Обходчик архива: служебные папки отсекаются, файлы и папки выдаются за один проход"""
+import os
+
+import archive_walker
+from archive_walker import IGNORE_FOLDERS, iter_files, walk_archive
+
+
+def test_walk_prunes_ignored_folders(archive, write, monkeypatch):
+    write({
+        "manifest.md": "# Манифест\n",
+        "concepts/a.md": "# A\n",
+        "concepts/deep/b.txt": "b\n",
+        "core/tool.py": "print()\n",
+    })
+    for name in IGNORE_FOLDERS:
+        write({f"{name}/inner/skip.md": "# нет\n", f"concepts/{name}/skip.md": "# нет\n"})
+
+    listed = []
+    real_list_dir = archive_walker.list_dir
+    monkeypatch.setattr(archive_walker, "list_dir",
+                        lambda path, rel_path="", *args: listed.append(rel_path) or real_list_dir(path, rel_path, *args))
+    entries = list(walk_archive(archive))
+
+    files = sorted(entry.rel_path for entry in entries if not entry.is_dir)
+    folders = sorted(entry.rel_path for entry in entries if entry.is_dir)
+    assert files == sorted(os.path.join(*path.split("/")) for path in
+                           ["manifest.md", "concepts/a.md", "concepts/deep/b.txt", "core/tool.py"])
+    assert folders == ["concepts", os.path.join("concepts", "deep"), "core"]
+    # В игнорируемые папки обходчик не спускается вовсе
+    assert sorted(listed) == ["", "concepts", os.path.join("concepts", "deep"), "core"]
+
+
+def test_entries_carry_stat_and_paths(archive, write):
+    write({"concepts/a.md": "# A\n", "concepts/b.txt": "bb\n"})
+    entries = {entry.rel_path: entry for entry in walk_archive(archive, with_stat=True)}
+    doc = entries[os.path.join("concepts", "a.md")]
+    assert doc.path == os.path.join(archive, "concepts", "a.md")
+    assert (doc.name, doc.is_dir, doc.size) == ("a.md", False, 4)
+    assert doc.mtime_ns == os.stat(doc.path).st_mtime_ns
+    assert doc.inode == os.stat(doc.path).st_ino
+
+    assert [entry.name for entry in iter_files(archive, suffix=".md")] == ["a.md"]
+    # max_depth=0 - только содержимое корня
+    assert [entry.rel_path for entry in walk_archive(archive, max_depth=0)] == ["concepts"]
+
+
+def test_folders_carry_file_names_and_subtree_start(archive, write):
+    write({"concepts/README.md": "# К\n", "concepts/a.md": "# A\n", "concepts/deep/b.md": "# B\n", "c.md": "# C\n"})
+    folders = {entry.rel_path: entry for entry in walk_archive(archive) if entry.is_dir}
+    # Имена файлов папки - из того же чтения каталога, без отдельных проверок
+    assert folders["concepts"].files == {"README.md", "a.md"}
+    assert folders[os.path.join("concepts", "deep")].files == {"b.md"}
+
+    subtree = [entry.rel_path for entry in walk_archive(archive, start="concepts")]
+    assert subtree[0] == "concepts"
+    assert sorted(subtree) == sorted(["concepts", os.path.join("concepts", "README.md"), os.path.join("concepts", "a.md"),
+                                      os.path.join("concepts", "deep"), os.path.join("concepts", "deep", "b.md")])
@@ -0,0 +1,112 @@
+"""Наблюдатель архива: события inotify и запасной опрос индекса обновляют опубликованные итоги"""
+import os
+import queue
+import threading
+
+import pytest
+
+from archive_watch import Inotify, load_published_state, watch_archive
+
+
+class StopWatch(Exception):
+    pass
+
+
+@pytest.fixture
+def watcher(tmp_path, archive):
+    """watcher(**параметры watch_archive) - запускает наблюдатель в потоке; возвращает функцию ожидания итогов"""
+    updates = queue.Queue()
+    stop = threading.Event()
+    threads = []
+
+    def on_update(summary):
+        if stop.is_set():
+            raise StopWatch()
+        updates.put(summary)
+
+    def run(**kwargs):
+        def target():
+            try:
+                watch_archive(str(archive), on_update=on_update, state_path=str(tmp_path / "scan_state.json"),
+                              debounce=0.05, index_path=str(tmp_path / "scan_index.db"), **kwargs)
+            except StopWatch:
+                pass
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+        def wait_for(condition, timeout=10):
+            while True:
+                summary = updates.get(timeout=timeout)
+                if condition(summary):
+                    return summary
+        return wait_for
+
+    yield run
+    # Следующее событие (или проход опроса) останавливает наблюдатель
+    stop.set()
+    (archive / "stop.txt").write_text("стоп\n", encoding="utf-8")
+    for thread in threads:
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+
+
+def counts(summary):
+    return summary["total_files"], summary["markdown_files"]
+
+
+def test_inotify_tracks_create_delete_and_move(watcher, archive, write, tmp_path):
+    try:
+        Inotify().close()
+    except (OSError, AttributeError):
+        pytest.skip("inotify недоступен")
+    write({"concepts/a.md": "# A\n", "system/README.md": "# Система\n", "system/notes.txt": "заметки\n"})
+    wait_for = watcher()
+    assert counts(wait_for(lambda summary: True)) == (3, 2)
+
+    write({"concepts/b.md": "# B\n"})
+    assert counts(wait_for(lambda summary: summary["total_files"] == 4)) == (4, 3)
+
+    write({"system/notes.txt": None})
+    assert counts(wait_for(lambda summary: summary["total_files"] == 3)) == (3, 3)
+
+    # Перенос файла между папками не меняет итогов, но меняет счётчики папок
+    os.rename(archive / "concepts" / "b.md", archive / "system" / "b.md")
+    summary = wait_for(lambda summary: summary["key_folders"]["system"]["files"] == 2)
+    assert summary["key_folders"]["concepts"] == {"files": 1, "markdown": 1}
+
+    # Новая папка с файлами - наблюдение ставится до чтения её содержимого
+    outside = tmp_path / "drafts"
+    (outside / "deep").mkdir(parents=True)
+    (outside / "deep" / "c.md").write_text("# C\n", encoding="utf-8")
+    os.rename(outside, archive / "concepts" / "drafts")
+    summary = wait_for(lambda summary: summary["total_files"] == 4)
+    assert summary["project_folders"] == 4
+    write({"concepts/drafts/deep/d.md": "# D\n"})
+    assert counts(wait_for(lambda summary: summary["total_files"] == 5)) == (5, 5)
+
+    # Папка, унесённая из архива, исчезает вместе с содержимым
+    os.rename(archive / "concepts" / "drafts", tmp_path / "gone")
+    summary = wait_for(lambda summary: summary["total_files"] == 3)
+    assert summary["project_folders"] == 2
+    assert load_published_state(str(archive), str(tmp_path / "scan_state.json")) == summary
+
+
+def test_polling_fallback_publishes_changes(watcher, archive, write, tmp_path):
+    write({"concepts/a.md": "# A\n", "system/notes.txt": "заметки\n"})
+    wait_for = watcher(poll=True, interval=0.05)
+    summary = wait_for(lambda summary: True)
+    assert counts(summary) == (2, 1)
+    assert summary["folders_without_readme"] == ["concepts", "system"]
+
+    write({"concepts/README.md": "# Концепции\n", "system/notes.txt": None})
+    summary = wait_for(lambda summary: summary["total_files"] == 2 and summary["markdown_files"] == 2)
+    assert summary["folders_without_readme"] == ["system"]
+    assert summary["key_folders"]["concepts"] == {"files": 2, "markdown": 2}
+
+    os.rename(archive / "concepts", archive / "system" / "concepts")
+    summary = wait_for(lambda summary: "concepts" not in summary["key_folders"])
+    assert counts(summary) == (2, 2)
+    # Опубликованные итоги отдаются, пока жив процесс наблюдателя
+    assert load_published_state(str(archive), str(tmp_path / "scan_state.json")) == summary
+    assert load_published_state(str(tmp_path), str(tmp_path / "scan_state.json")) is None
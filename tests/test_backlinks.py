@@ -0,0 +1,53 @@
+"""Обратные ссылки: запрос по индексу целей, разделы пишутся только при изменениях и не попадают в граф"""
+import os
+
+from backlinks import backlinks, write_backlink_sections
+from link_graph import BACKLINKS_START, graph_counts, update_link_graph
+
+
+def refresh(index, archive):
+    index.refresh(str(archive), verify_files=True)
+    return update_link_graph(index, str(archive))
+
+
+def test_sections_follow_the_graph(index, archive, write):
+    write({
+        "manifest.md": "# Манифест\n\n[Сад  разумов](concepts/garden.md)\n",
+        "concepts/garden.md": "# Сад\n\n[Манифест](../manifest.md)\n",
+        "system/memory.md": "# Память\n\n[сад](../concepts/garden.md) [снова](../concepts/garden.md)\n",
+    })
+    refresh(index, archive)
+    assert backlinks(index, "concepts/garden.md") == [
+        ("manifest.md", "Сад  разумов"), (os.path.join("system", "memory.md"), "сад"),
+        (os.path.join("system", "memory.md"), "снова")]
+
+    # Без write - только план, документы не трогаются
+    garden = archive / "concepts" / "garden.md"
+    before = garden.read_text(encoding="utf-8")
+    plan = write_backlink_sections(index, str(archive))
+    assert plan == {"documents": 2, "changed": [os.path.join("concepts", "garden.md"), "manifest.md"]}
+    assert garden.read_text(encoding="utf-8") == before
+
+    assert write_backlink_sections(index, str(archive), write=True)["changed"] == plan["changed"]
+    text = garden.read_text(encoding="utf-8")
+    assert text.startswith(before.rstrip() + "\n\n" + BACKLINKS_START)
+    assert "- [manifest.md](../manifest.md) — Сад разумов\n" in text
+    assert text.count("system/memory.md") == 2
+
+    # Раздел не становится прямыми ссылками графа; повторный запуск ничего не меняет
+    assert refresh(index, archive)["parsed"] == 2
+    assert graph_counts(index)["links"] == 4
+    assert write_backlink_sections(index, str(archive), write=True)["changed"] == []
+
+    # Документ, на который больше не ссылаются, теряет раздел
+    manifest = archive / "manifest.md"
+    manifest.write_text(manifest.read_text(encoding="utf-8").replace("[Сад  разумов](concepts/garden.md)", "Сад разумов"),
+                        encoding="utf-8")
+    refresh(index, archive)
+    assert write_backlink_sections(index, str(archive), write=True)["changed"] == [
+        os.path.join("concepts", "garden.md")]
+    assert garden.read_text(encoding="utf-8").count("[system/memory.md]") == 1
+    write({"system/memory.md": "# Память\n"})
+    refresh(index, archive)
+    write_backlink_sections(index, str(archive), write=True)
+    assert garden.read_text(encoding="utf-8") == before
@@ -0,0 +1,56 @@
+"""Замеры: синтетический архив воспроизводим, база дополняется, регрессии считаются с порогом шума"""
+import json
+import os
+
+from bench_suite import compare_with_baseline, save_baseline
+from scanner_v2 import scan_archive
+from synthetic_archive import generate_archive
+
+
+def test_synthetic_archive_is_reproducible(tmp_path):
+    one, two = tmp_path / "one", tmp_path / "two"
+    assert generate_archive(str(one), 60) == generate_archive(str(two), 60) == 60
+    summary = scan_archive(str(one), report=False)
+    # Файлы в .git и venv сканер не видит
+    documents = [os.path.join(folder, name) for folder, _, names in os.walk(one)
+                 for name in names if ".git" not in folder and "venv" not in folder]
+    assert summary["total_files"] == len(documents) > 60
+    assert (one / "concepts" / "README.md").exists() and any((one / ".git").iterdir())
+    for path in documents:
+        rel_path = os.path.relpath(path, one)
+        assert (two / rel_path).read_bytes() == (one / rel_path).read_bytes()
+
+
+def test_saved_baseline_keeps_other_sizes(tmp_path):
+    path = tmp_path / "baselines.json"
+    path.write_text(json.dumps({"results": {
+        "scan_archive": {"1000": {"seconds": 1.0, "peak_rss_kb": 1}, "1000000": {"seconds": 9.0, "peak_rss_kb": 9}},
+        "add_metadata": {"1000": {"seconds": 2.0, "peak_rss_kb": 2}},
+    }}), encoding="utf-8")
+    results = {"scan_archive": {"1000": {"seconds": 0.5, "peak_rss_kb": 1}}}
+    save_baseline(results, str(path))
+
+    text = path.read_text(encoding="utf-8")
+    assert text.endswith("}\n")
+    saved = json.loads(text)["results"]
+    assert saved["scan_archive"] == {"1000": {"seconds": 0.5, "peak_rss_kb": 1},
+                                     "1000000": {"seconds": 9.0, "peak_rss_kb": 9}}
+    assert saved["add_metadata"] == {"1000": {"seconds": 2.0, "peak_rss_kb": 2}}
+    # Результаты прогона не дополняются старыми размерами
+    assert results == {"scan_archive": {"1000": {"seconds": 0.5, "peak_rss_kb": 1}}}
+
+
+def test_regressions_need_relative_and_absolute_growth():
+    baseline = {"results": {"scan_archive": {"1000": {"seconds": 1.0, "peak_rss_kb": 100_000}}}}
+
+    def regressions(seconds, rss):
+        return compare_with_baseline({"scan_archive": {"1000": {"seconds": seconds, "peak_rss_kb": rss}}},
+                                     baseline, 0.25)
+
+    assert regressions(1.2, 110_000) == []
+    assert regressions(2.0, 100_000) == ["scan_archive @ 1000: seconds 1.0 -> 2.0"]
+    assert regressions(1.0, 200_000) == ["scan_archive @ 1000: peak_rss_kb 100000 -> 200000"]
+    # Рост на 50%, но меньше порога шума
+    assert compare_with_baseline({"scan_archive": {"1000": {"seconds": 0.15, "peak_rss_kb": 100_000}}},
+                                 {"results": {"scan_archive": {"1000": {"seconds": 0.1, "peak_rss_kb": 100_000}}}},
+                                 0.25) == []
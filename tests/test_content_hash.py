@@ -0,0 +1,55 @@
+"""Хэши содержимого: BLAKE2 через буфер и mmap, кэш в индексе, дубликаты и изменённые файлы"""
+import hashlib
+import os
+
+import content_hash
+from content_hash import DIGEST_SIZE, find_duplicates, hash_file, update_hashes
+from scanner_v2 import scan_archive
+
+
+def blake2(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def test_buffered_and_mmapped_hashes_agree(tmp_path, monkeypatch):
+    path = tmp_path / "big.bin"
+    data = os.urandom(3 * content_hash.CHUNK_SIZE + 17)
+    path.write_bytes(data)
+    assert hash_file(str(path)) == blake2(data)
+    monkeypatch.setattr(content_hash, "MMAP_THRESHOLD", 1)
+    assert hash_file(str(path)) == blake2(data)
+
+
+def test_only_changed_files_are_rehashed(index, archive, write):
+    write({"concepts/a.md": "# Одинаковый\n", "system/b.md": "# Одинаковый\n",
+           "system/c.md": "# Другой\n", "empty1.md": "", "empty2.md": ""})
+    index.refresh(str(archive), verify_files=True)
+    first = update_hashes(index, str(archive))
+    assert (first["hashed"], first["changed"]) == (5, [])
+    assert find_duplicates(index) == [[os.path.join("concepts", "a.md"), os.path.join("system", "b.md")]]
+
+    index.refresh(str(archive), verify_files=True)
+    assert update_hashes(index, str(archive))["hashed"] == 0
+
+    # Тот же размер, другое содержимое: файл опознаётся по новому mtime
+    path = archive / "system" / "c.md"
+    stat = path.stat()
+    path.write_text("# Другиx\n", encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    write({"concepts/a.md": None})
+    index.refresh(str(archive), verify_files=True)
+    second = update_hashes(index, str(archive))
+    assert (second["hashed"], second["changed"]) == (1, [os.path.join("system", "c.md")])
+    assert find_duplicates(index) == []
+
+
+def test_scan_reports_duplicates_and_changes(archive, write, tmp_path):
+    write({"concepts/a.md": "# A\n", "concepts/copy.md": "# A\n", "system/b.md": "# B\n"})
+    index_path = str(tmp_path / "index.db")
+    summary = scan_archive(str(archive), index_path=index_path, hashes=True, report=False)
+    assert summary["changed_files"] == []
+    assert summary["duplicates"] == [[os.path.join("concepts", "a.md"), os.path.join("concepts", "copy.md")]]
+
+    write({"system/b.md": "# B, исправлено\n"})
+    summary = scan_archive(str(archive), index_path=index_path, hashes=True, report=False)
+    assert summary["changed_files"] == [os.path.join("system", "b.md")]
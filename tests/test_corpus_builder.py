@@ -0,0 +1,88 @@
+"""Корпус собирается потоком без служебных папок, повторная сборка берёт неизменённые сегменты и совпадает с --full"""
+import os
+import subprocess
+import sys
+
+from corpus_builder import SHORT_NAME, SHORT_TAIL, build_corpus, load_manifest, read_segment
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_corpus_skips_service_folders_and_reports_bad_files(tmp_path, archive, write):
+    write({
+        "manifest.md": "# Манифест\n\n\n\nТекст.\n",
+        "concepts/garden.md": "# Сад\n",
+        "empty.txt": "",
+        "venv/lib/site.py": "print('venv')\n",
+        ".git/HEAD.txt": "ref\n",
+        "skip.bin": "не входит в корпус\n",
+    })
+    (archive / "legacy.txt").write_bytes("старое".encode("cp1251"))
+    output = tmp_path / "out" / "corpus.txt"
+    stats = build_corpus(str(archive), str(output), short_limit=40)
+
+    corpus = output.read_text(encoding="utf-8")
+    assert stats.files == 2 and stats.size == len(corpus.encode("utf-8"))
+    assert "📄 ФАЙЛ: concepts/garden.md" in corpus and "# Манифест\n\nТекст." in corpus
+    assert "venv" not in corpus and "ref" not in corpus and "старое" not in corpus
+    assert sorted(stats.skipped) == [("empty.txt", "пустой"), ("legacy.txt", "не UTF-8 (байт 0)")]
+    # Краткая версия - начало корпуса, разрезанный символ отбрасывается
+    short = (output.parent / SHORT_NAME).read_text(encoding="utf-8")
+    assert short.endswith(SHORT_TAIL) and corpus.startswith(short[:-len(SHORT_TAIL)])
+    assert len(short[:-len(SHORT_TAIL)].encode("utf-8")) <= 40
+
+
+def test_collect_corpus_forwards_arguments(tmp_path, archive, write):
+    write({"manifest.md": "# Манифест\n", "concepts/garden.md": "# Сад\n"})
+    output = tmp_path / "corpus.txt"
+    result = subprocess.run([sys.executable, os.path.join(REPO_ROOT, "collect_corpus.py"),
+                             "--root", str(archive), "--output", str(output), "--quiet"],
+                            capture_output=True, text=True, check=True)
+    # --quiet дошёл до сборщика: файлы не перечисляются
+    assert "✓" not in result.stdout and "файлов 2" in result.stdout
+    assert "📄 ФАЙЛ: manifest.md" in output.read_text(encoding="utf-8")
+
+
+def test_reuse_after_one_edit_equals_full_build(tmp_path, archive, write):
+    write({
+        "manifest.md": "# Манифест\n\nТекст.\n",
+        "concepts/garden.md": "# Сад\n\n\n\nСознаний.\n",
+        "core/tool.py": "print('сад')\n",
+        "notes.txt": "заметки\n",
+        "skip.bin": "не входит в корпус\n",
+    })
+    output = tmp_path / "out" / "corpus.txt"
+    first = build_corpus(str(archive), str(output))
+    assert (first.files, first.reused) == (4, 0)
+
+    write({"concepts/garden.md": "# Сад\n\nСознаний, изменённый.\n"})
+    incremental = build_corpus(str(archive), str(output))
+    assert incremental.reused == 3
+    corpus = output.read_bytes()
+    manifest = load_manifest(str(output))
+    assert len(manifest) == 4
+    assert "изменённый" in read_segment("concepts/garden.md", str(output))
+
+    full = build_corpus(str(archive), str(output), full=True)
+    assert full.reused == 0
+    assert (full.files, full.chars, full.size) == (incremental.files, incremental.chars, incremental.size)
+    assert output.read_bytes() == corpus
+    assert load_manifest(str(output)) == manifest
+
+
+def test_cli_full_and_show(tmp_path, archive, write):
+    write({"manifest.md": "# Манифест\n", "concepts/garden.md": "# Сад\n\nСознаний.\n"})
+    output = str(tmp_path / "corpus.txt")
+
+    def run(*args):
+        return subprocess.run([sys.executable, os.path.join(REPO_ROOT, "collect_corpus.py"),
+                               "--root", str(archive), "--output", output, *args],
+                              capture_output=True, text=True)
+
+    assert run("--quiet").returncode == 0
+    rebuilt = run("--quiet", "--full")
+    assert rebuilt.returncode == 0 and "файлов 2" in rebuilt.stdout
+    shown = run("--show", "concepts/garden.md")
+    assert shown.returncode == 0 and "Сознаний." in shown.stdout and "Манифест" not in shown.stdout
+    missing = run("--show", "none.md")
+    assert missing.returncode == 1 and "нет в манифесте корпуса" in missing.stderr
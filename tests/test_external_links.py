@@ -0,0 +1,70 @@
+"""Внешние ссылки на локальных заглушках: статусы, предел на хост, кэш, отчёт link_checker --external"""
+import asyncio
+import time
+
+import link_checker
+from external_links import (OK, URL_BROKEN, URL_UNREACHABLE, UrlCache, UrlResult, _check_all, check_urls,
+                            make_session, normalize_url, stub_server, stub_servers)
+from link_report import iter_records, load_summary
+
+EXPECTED = {"/ok": OK, "/missing": URL_BROKEN, "/gone": URL_BROKEN, "/no-head": OK,
+            "/redirect": OK, "/error": URL_UNREACHABLE}
+
+
+def test_statuses_host_limit_and_cache(tmp_path):
+    cache_path = str(tmp_path / "url_cache.db")
+    with stub_servers(3) as servers:
+        urls = {}
+        for _, base in servers:
+            urls.update((base + path, status) for path, status in EXPECTED.items())
+            urls.update((f"{base}/slow?{i}", OK) for i in range(40))
+        results = check_urls(urls, cache_path, per_host=2)
+        assert {url: results[url].status for url in urls} == urls
+        assert max(server.peak for server, _ in servers) == 2
+        assert results[servers[0][1] + "/missing"].code == 404
+
+        # Повторный прогон - целиком из кэша
+        sent = sum(server.requests for server, _ in servers)
+        assert check_urls(urls, cache_path, per_host=2, ttl=3600) == results
+        assert sum(server.requests for server, _ in servers) == sent
+
+
+def test_dedicated_executor_leaves_the_default_one():
+    async def run(urls):
+        results = await _check_all(urls, session, 4, 2, 5)
+        return results, asyncio.get_running_loop()._default_executor
+
+    session = make_session(2)
+    with stub_server() as (_, base), session:
+        results, default = asyncio.run(run([base + "/ok", base + "/missing"]))
+    # Запросы шли через свой пул: пул цикла по умолчанию так и не создан
+    assert [result.status for result in results] == [OK, URL_BROKEN]
+    assert default is None
+
+
+def test_retry_ttl_and_normalized_targets(tmp_path):
+    now = time.time()
+    with UrlCache(str(tmp_path / "url_cache.db")) as cache:
+        cache.store([UrlResult("http://a/", OK, 200, None, None, now - 7 * 3600),
+                     UrlResult("http://b/", URL_UNREACHABLE, None, None, "timeout", now - 7 * 3600)])
+        assert list(cache.fresh(["http://a/", "http://b/"], now=now)) == ["http://a/"]
+    assert normalize_url('<http://a/x y#якорь>') == "http://a/x y"
+    assert normalize_url('http://a/x "Заголовок"') == "http://a/x"
+
+
+def test_link_checker_reports_broken_urls(archive, write, tmp_path, monkeypatch):
+    with stub_server() as (server, base):
+        write({
+            "manifest.md": (f"# Манифест\n\n[сайт]({base}/ok) [нет]({base}/missing) <{base}/missing>\n"
+                            f"`[код]({base}/gone)`\n"),
+            "concepts/a.md": f"# A\n\n[снова]({base}/missing#раздел) [сбой]({base}/error)\n",
+        })
+        monkeypatch.chdir(archive)
+        link_checker.main(external=True, url_cache=str(tmp_path / "url_cache.db"))
+        # Каждый адрес проверен один раз, сколько бы ссылок на него ни было; код не в счёт
+        assert server.requests == 3 + 2
+    summary = load_summary("link_report")
+    assert (summary["external"], summary["statuses"]) == (3, {URL_BROKEN: 3, URL_UNREACHABLE: 1})
+    assert sorted((r["source"], r["status"], r["detail"]) for r in iter_records("link_report")) == [
+        ("concepts/a.md", URL_BROKEN, "HTTP 404"), ("concepts/a.md", URL_UNREACHABLE, "HTTP 503"),
+        ("manifest.md", URL_BROKEN, "HTTP 404"), ("manifest.md", URL_BROKEN, "HTTP 404")]
@@ -0,0 +1,41 @@
+"""Статистика файлов: строки, слова и заголовки вне блоков кода, кэш в индексе, свёртка по папкам"""
+import file_stats
+from file_stats import count_file, folder_rollup, update_file_stats
+
+DOC = "# Заголовок\n\nТекст из четырёх слов.\n\n```\n# не заголовок\n```\n## Раздел\nбез перевода строки"
+
+
+def test_counts_skip_fenced_code(tmp_path, monkeypatch):
+    path = tmp_path / "doc.md"
+    path.write_text(DOC, encoding="utf-8")
+    expected = (9, 16, 2)
+    assert count_file(str(path)) == expected
+
+    # Блоки через mmap, дочитанные до конца строки, дают те же числа
+    monkeypatch.setattr(file_stats, "MMAP_THRESHOLD", 1)
+    monkeypatch.setattr(file_stats, "CHUNK_SIZE", 7)
+    assert count_file(str(path)) == expected
+
+    notes = tmp_path / "notes.txt"
+    notes.write_text("# не markdown\nдве строки\n", encoding="utf-8")
+    assert count_file(str(notes)) == (2, 5, 0)
+
+
+def test_rollup_recounts_only_changed_files(index, archive, write):
+    write({"concepts/a.md": DOC, "concepts/deep/b.md": "# B\n", "system/logo.png": "PNG данные\n"})
+    index.refresh(str(archive), verify_files=True)
+    assert update_file_stats(index, str(archive)) == 3
+    tree = folder_rollup(index)
+    assert (tree["files"], tree["lines"], tree["headings"]) == (3, 10, 3)
+    concepts = next(child for child in tree["children"] if child["path"] == "concepts")
+    assert (concepts["files"], concepts["lines"], concepts["words"]) == (2, 10, 18)
+    # Нетекстовые файлы - только байты
+    system = next(child for child in tree["children"] if child["path"] == "system")
+    assert (system["bytes"], system["lines"]) == (len("PNG данные\n".encode()), 0)
+
+    index.refresh(str(archive), verify_files=True)
+    assert update_file_stats(index, str(archive)) == 0
+    write({"concepts/deep/b.md": "# B\n\n## C\n"})
+    index.refresh(str(archive), verify_files=True)
+    assert update_file_stats(index, str(archive)) == 1
+    assert folder_rollup(index)["headings"] == 4
@@ -0,0 +1,58 @@
+"""Замены для битых ссылок: нечёткий поиск по кириллическим именам, --fix сохраняет якорь и заголовок"""
+import os
+
+import link_checker
+from fuzzy_paths import FuzzyPathIndex, normalize
+from link_report import load_summary
+
+
+def test_suggest_matches_cyrillic_names():
+    index = FuzzyPathIndex([
+        ("concepts/сад-разумов.md", "Сад разумов"),
+        ("concepts/ёмкость-памяти.md", "Ёмкость памяти"),
+        ("system/протоколы-памяти.md", "Протоколы памяти"),
+        ("strategies/garden-plan.md", "План сада"),
+    ])
+    assert normalize("ЁМКОСТЬ") == normalize("емкость")
+    # Опечатка и другой регистр в имени файла
+    assert index.suggest("concepts/Сад-разумав.md")[0][0] == "concepts/сад-разумов.md"
+    # ё/е и %XX в цели
+    assert index.suggest("../concepts/%D0%B5%D0%BC%D0%BA%D0%BE%D1%81%D1%82%D1%8C-%D0%BF%D0%B0%D0%BC%D1%8F%D1%82%D0%B8.md")[0] == (
+        "concepts/ёмкость-памяти.md", 1.0)
+    # Старое имя папки: найден по имени и тексту ссылки, якорь не мешает
+    best, score = index.suggest("old/протоколы.md#раздел", "Протоколы памяти")[0]
+    assert best == "system/протоколы-памяти.md" and score >= link_checker.FIX_THRESHOLD
+    # Название сравнивается с текстом ссылки; сам документ со ссылкой не предлагается
+    assert [path for path, _ in index.suggest("сад.md", "План сада")] == [
+        "strategies/garden-plan.md", "concepts/сад-разумов.md"]
+    assert index.suggest("concepts/сад-разумов.md", exclude="concepts/сад-разумов.md") == []
+    assert index.suggest("совсем-другое.md") == []
+
+
+def test_fix_keeps_anchor_and_title(archive, write, monkeypatch):
+    write({
+        "concepts/сад-разумов.md": "# Сад разумов\n\n## Корни\n",
+        "system/протоколы-памяти.md": "# Протоколы памяти\n",
+        "manifest.md": ("# Манифест\n\n"
+                        '[Сад](concepts/сад-разумав.md#корни "Сад разумов") и '
+                        "[протоколы](<system/протоколы памяти.md>)\n"
+                        "[чужой](https://example.org/нет.md)\n"),
+    })
+    monkeypatch.chdir(archive)
+    link_checker.main(fix=True)
+    assert (archive / "manifest.md").read_text(encoding="utf-8") == (
+        "# Манифест\n\n"
+        '[Сад](concepts/сад-разумов.md#корни "Сад разумов") и '
+        "[протоколы](system/протоколы-памяти.md)\n"
+        "[чужой](https://example.org/нет.md)\n")
+
+    # После исправления ссылки целы, повторный --fix ничего не меняет
+    link_checker.main(fix=True)
+    assert load_summary(str(archive / "link_report"))["broken"] == 0
+
+
+def test_fixed_target_is_relative_to_the_source():
+    source = os.path.join("concepts", "deep", "a.md")
+    assert link_checker.fixed_target(source, 'old.md#якорь "Заголовок"', os.path.join("system", "b c.md")) == (
+        "<../../system/b c.md>#якорь")
+    assert link_checker.fixed_target(source, "<old name.md>", os.path.join("concepts", "deep", "b.md")) == "b.md"
@@ -0,0 +1,185 @@
+"""Аналитика графа ссылок: расчёты на NumPy совпадают с простыми, инкрементальные метрики - с полным пересчётом"""
+import os
+import random
+
+import numpy as np
+
+import graph_metrics
+from ai_architect_v1 import AI_Architect
+from graph_metrics import (archive_metrics, connected_components, csr_from_edges, load_metrics, pagerank,
+                           save_metrics, update_metrics)
+from link_graph import changed_since, link_epoch, link_generation, update_link_graph
+from scan_index import ScanIndex
+
+
+def random_graph(n, m, seed):
+    rng = random.Random(seed)
+    edges = [(rng.randrange(n), rng.randrange(n)) for _ in range(m)]
+    return csr_from_edges([f"d{i}.md" for i in range(n)], [a for a, _ in edges], [b for _, b in edges]), edges
+
+
+def union_find(n, edges):
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in edges:
+        parent[find(a)] = find(b)
+    return [find(x) for x in range(n)]
+
+
+def partition(labels):
+    groups = {}
+    for node, label in enumerate(labels):
+        groups.setdefault(label, set()).add(node)
+    return {frozenset(group) for group in groups.values()}
+
+
+def test_components_match_union_find():
+    for seed in range(5):
+        graph, edges = random_graph(300, 200, seed)
+        assert partition(connected_components(graph).tolist()) == partition(union_find(300, edges))
+
+
+def test_pagerank_matches_dense_power_iteration():
+    graph, edges = random_graph(40, 80, 1)
+    n = 40
+    links = np.zeros((n, n))
+    for a, b in set(edges):
+        if a != b:
+            links[b, a] = 1.0
+    out_degree = links.sum(axis=0)
+    # Тупики ссылаются на всех поровну
+    transition = np.where(out_degree > 0, links / np.maximum(out_degree, 1), 1.0 / n)
+    expected = np.full(n, 1.0 / n)
+    for _ in range(200):
+        expected = 0.85 * transition @ expected + 0.15 / n
+    rank, _ = pagerank(graph)
+    assert np.allclose(rank, expected, atol=1e-8)
+    assert abs(rank.sum() - 1.0) < 1e-9
+
+
+def test_archive_summary_and_cached_connectivity(archive, write, tmp_path, monkeypatch):
+    write({
+        "a.md": "# A\n[b](b.md) [b снова](b.md) [сам](a.md)\n",
+        "b.md": "# B\n[a](a.md)\n",
+        "c.md": "# C\n[a](a.md)\n",
+        "d.md": "# D\n",
+    })
+    index_path = str(tmp_path / "index.db")
+    stats = archive_metrics(str(archive), None, index_path, top=2)
+    assert (stats["documents"], stats["links"], stats["components"], stats["largest_component"]) == (4, 3, 2, 3)
+    assert (stats["orphans"], stats["dead_ends"], stats["isolated"]) == (2, 1, 1)
+    assert stats["connectivity"] == round(0.5 * 3 / 4 + 0.5 * 2 / 4, 4)
+    assert [path for path, _ in stats["top_pagerank"]] == ["a.md", "b.md"]
+
+    # Садовод берёт связность из файла метрик и обходит архив, только пока файла нет
+    calls = []
+    real_archive_metrics = graph_metrics.archive_metrics
+    monkeypatch.setattr(graph_metrics, "archive_metrics", lambda root_path, state_path, top: calls.append(
+        root_path) or real_archive_metrics(root_path, state_path, index_path, top))
+    metrics_path = tmp_path / "memory_graph.npz"
+    architect = AI_Architect(metrics_path=str(metrics_path))
+    assert architect.measure_connectivity(str(archive)) == stats["connectivity"]
+    architect.evaluate_action("Связать документы")
+    assert calls == [str(archive)] and metrics_path.exists()
+
+    # Оркестратор обновил метрики - перечитывается файл, а не архив
+    write({"d.md": "# D\n[a](a.md)\n"})
+    state, _ = update_metrics_for(archive, index_path, load_metrics(str(metrics_path)))
+    save_metrics(str(metrics_path), state)
+    os.utime(metrics_path, ns=(0, os.stat(metrics_path).st_mtime_ns + 1_000_000))
+    assert architect.measure_connectivity() == round(0.5 * 4 / 4 + 0.5 * 2 / 4, 4)
+    assert calls == [str(archive)]
+
+
+def update_metrics_for(archive, index_path, state):
+    with ScanIndex(index_path, str(archive)) as index:
+        sync(index, archive)
+        return update_metrics(index, state)
+
+
+def sync(index, archive):
+    index.refresh(str(archive), verify_files=True)
+    update_link_graph(index, str(archive))
+
+
+def components(state):
+    """Компоненты связности как множество множеств путей (метки у полного и инкрементального расчёта разные)"""
+    groups = {}
+    for path, label in zip(state.graph.paths, state.labels.tolist()):
+        groups.setdefault(label, set()).add(path)
+    return {frozenset(group) for group in groups.values()}
+
+
+def edges(state):
+    graph = state.graph
+    src = np.repeat(np.arange(len(graph.paths)), np.diff(graph.indptr))
+    return {(graph.paths[a], graph.paths[b]) for a, b in zip(src.tolist(), graph.indices.tolist())}
+
+
+def assert_same(incremental, full):
+    assert edges(incremental) == edges(full)
+    assert components(incremental) == components(full)
+    # Метки подряд 0..k-1 после каждого обновления
+    assert sorted(set(incremental.labels.tolist())) == list(range(len(components(full))))
+    rank = dict(zip(full.graph.paths, full.rank.tolist()))
+    for path, value in zip(incremental.graph.paths, incremental.rank.tolist()):
+        assert abs(value - rank[path]) < 1e-6
+
+
+def test_generations_and_tombstones(index, archive, write):
+    write({"a.md": "# A\n", "b.md": "# B\n"})
+    sync(index, archive)
+    epoch, first = link_epoch(index), link_generation(index)
+    assert sorted(changed_since(index, 0)[0]) == ["a.md", "b.md"]
+
+    # Обновление без изменений не заводит нового поколения
+    sync(index, archive)
+    assert link_generation(index) == first
+    assert changed_since(index, first) == ([], [])
+
+    write({"a.md": "# A\n[b](b.md)\n", "b.md": None, "c.md": "# C\n"})
+    sync(index, archive)
+    assert link_generation(index) == first + 1
+    parsed, removed = changed_since(index, first)
+    assert (sorted(parsed), removed) == (["a.md", "c.md"], ["b.md"])
+
+    # Вернувшийся документ снова перечитан, а его надгробие больше не выдаётся
+    write({"b.md": "# B\n"})
+    sync(index, archive)
+    assert changed_since(index, first + 1) == (["b.md"], [])
+    assert link_epoch(index) == epoch
+
+
+def test_incremental_update_equals_full_recompute(index, archive, write):
+    write({
+        "a.md": "# A\n[b](b.md) [c](c.md)\n",
+        "b.md": "# B\n[a](a.md)\n",
+        "c.md": "# C\n",
+        "d.md": "# D\n[e](e.md)\n",
+        "e.md": "# E\n",
+    })
+    sync(index, archive)
+    state, info = update_metrics(index)
+    assert info["mode"] == "full"
+    assert update_metrics(index, state)[1]["mode"] == "unchanged"
+
+    steps = [
+        {"c.md": "# C\n[d](d.md)\n"},                     # новое ребро сливает компоненты
+        {"a.md": "# A\n[b](b.md)\n"},                     # удалённое ребро раскалывает компоненту
+        {"f.md": "# F\n[a](a.md) [g](g.md)\n"},           # новый документ и ссылка на несуществующий
+        {"g.md": "# G\n"},                                # появился документ, на который уже ссылались
+        {"b.md": None, "d.md": "# D\n"},                  # удалённый документ и его рёбра
+    ]
+    for files in steps:
+        write(files)
+        sync(index, archive)
+        state, info = update_metrics(index, state)
+        assert info["mode"] == "incremental"
+        full, _ = update_metrics(index)
+        assert_same(state, full)
@@ -0,0 +1,56 @@
+"""Реестр ID: повторы в архиве, закреплённые ID и выдача под блокировкой из нескольких процессов"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from id_registry import SEQUENCES_SUFFIX, IdRegistry, open_registry
+from metadata_engine import update_metadata_index
+from scan_index import ScanIndex
+
+
+def doc(doc_id):
+    return f"# Документ\n\n**ID:** {doc_id}\n"
+
+
+def sync(index, archive):
+    index.refresh(str(archive), verify_files=True)
+    update_metadata_index(index, str(archive))
+
+
+def test_duplicates_and_sequences_from_archive(index, archive, write):
+    write({
+        "concepts/a.md": doc("CON-2024-003"),
+        "concepts/b.md": doc("CON-2024-003"),
+        "concepts/c.md": doc("CON-2024-010"),
+    })
+    sync(index, archive)
+    with open_registry(index, save=False) as registry:
+        assert registry.duplicates == {"CON-2024-003": ["concepts/a.md", "concepts/b.md"]}
+        assert registry.lookup("CON-2024-010") == "concepts/c.md"
+        assert registry.allocate("CON", 2024, "concepts/d.md") == "CON-2024-011"
+
+
+def test_reserved_ids():
+    registry = IdRegistry({"STR-2024-006": "strategies/symbiosis-v2.md"})
+    # Закреплённый ID поднимает счётчик и достаётся только своему документу
+    assert registry.allocate("STR", 2024, "strategies/new.md") == "STR-2024-007"
+    assert registry.allocate("STR", 2024, "symbiosis-v2.md") == "STR-2024-002"
+    assert registry.allocate("ROOT", 2024, "other.md") == "ROOT-2024-002"
+
+
+def test_concurrent_allocation_is_unique(index, archive, write, tmp_path):
+    write({"concepts/a.md": doc("CON-2024-001")})
+    sync(index, archive)
+
+    def allocate(worker):
+        # У каждого потока своё соединение и свой дескриптор файла блокировки, как у отдельного процесса
+        with ScanIndex(index.index_path, str(archive)) as own:
+            ids = []
+            for i in range(5):
+                with open_registry(own) as registry:
+                    ids.append(registry.allocate("CON", 2024, f"concepts/new-{worker}-{i}.md"))
+            return ids
+
+    with ThreadPoolExecutor(8) as pool:
+        ids = [doc_id for chunk in pool.map(allocate, range(8)) for doc_id in chunk]
+    assert len(set(ids)) == 40
+    assert sorted(ids) == [f"CON-2024-{number:03d}" for number in range(2, 42)]
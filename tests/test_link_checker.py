@@ -0,0 +1,82 @@
+"""Анализатор связей: проверяются все документы, большие архивы - в пуле процессов"""
+import os
+
+import link_checker
+from link_checker import check_links, scan_documents
+from link_graph import MISSING
+from link_report import REPORT_DIR, TEXT_REPORT, ReportWriter, iter_records, load_summary
+
+
+def make_archive(write, docs=300):
+    files = {"manifest.md": "# Манифест\n\n[первый](concepts/doc-0.md)\n"}
+    for number in range(docs):
+        # Битая ссылка - только у последнего документа, далеко за прежним пределом в 50
+        target = "missing.md" if number == docs - 1 else f"doc-{(number + 1) % docs}.md"
+        files[f"concepts/doc-{number}.md"] = (
+            f"# Документ {number}\n\n## Раздел\n\n[дальше]({target}) [манифест](../manifest.md) "
+            f"[сайт](https://example.org) [раздел](#раздел) [модуль](../.git/config)\n")
+    files[".git/config"] = "[core]\n"
+    write(files)
+
+
+def test_every_document_is_checked(archive, write):
+    make_archive(write)
+    known, md_files = scan_documents(str(archive))
+    assert len(md_files) == 301
+    # Больше одной пачки - проверка в пуле процессов
+    results = list(check_links(known, md_files, str(archive), workers=2))
+    assert [source for source, *_ in results] == md_files
+    assert sum(checked for _, checked, *_ in results) == 1 + 300 * 4
+    assert [(source, broken) for source, _, broken, *_ in results if broken] == [
+        (os.path.join("concepts", "doc-299.md"), [("missing.md", "дальше", MISSING, 5, 1)])]
+
+
+def test_report_lists_all_broken_links(archive, write, monkeypatch, capsys):
+    make_archive(write)
+    write({"system/a.md": "# A\n\n[нет](../concepts/none.md)\n"})
+    monkeypatch.chdir(archive)
+    link_checker.main()
+    assert "Битых ссылок: 2" in capsys.readouterr().out
+    summary = load_summary(REPORT_DIR)
+    assert (summary["checked"], summary["broken"], summary["statuses"]) == (1202, 2, {MISSING: 2})
+    assert sorted((r["source"], r["target"], r["line"], r["column"]) for r in iter_records(REPORT_DIR)) == [
+        (os.path.join("concepts", "doc-299.md"), "missing.md", 5, 1),
+        (os.path.join("system", "a.md"), "../concepts/none.md", 3, 1)]
+    # Текстовый отчёт больше не пишется сам по себе
+    assert not (archive / TEXT_REPORT).exists()
+
+
+def test_sharded_report_and_text_from_data(archive, write, monkeypatch):
+    make_archive(write)
+    write({"system/a.md": "# A\n\n[нет](../concepts/none.md)\n"})
+    monkeypatch.chdir(archive)
+    link_checker.main(sharded=True, text_report=TEXT_REPORT)
+    summary = load_summary(REPORT_DIR)
+    assert [(shard["name"], shard["broken"], shard["sources"]) for shard in summary["shards"]] == [
+        ("concepts", 1, 1), ("system", 1, 1)]
+    assert sorted(os.listdir(REPORT_DIR)) == ["concepts.ndjson", "summary.json", "system.ndjson"]
+    assert [r["target"] for r in iter_records(REPORT_DIR, shard="system")] == ["../concepts/none.md"]
+    report = (archive / TEXT_REPORT).read_text(encoding="utf-8")
+    assert "Проверено ссылок: 1202\n" in report
+    assert f"Из: {os.path.join('system', 'a.md')}:3:1\nВ: ../concepts/none.md\n" in report
+
+    # Починенная папка пропадает из сводки вместе со своим шардом
+    write({"system/a.md": "# A\n"})
+    link_checker.main(sharded=True)
+    assert [shard["name"] for shard in load_summary(REPORT_DIR)["shards"]] == ["concepts"]
+    assert sorted(os.listdir(REPORT_DIR)) == ["concepts.ndjson", "summary.json"]
+
+
+def test_failed_run_keeps_previous_report(tmp_path):
+    directory = str(tmp_path / "report")
+    with ReportWriter(directory) as report:
+        report.add("a.md", "b.md", 1, 1, MISSING, "b")
+        report.finish(checked=1)
+    try:
+        with ReportWriter(directory) as report:
+            report.add("a.md", "c.md", 1, 1, MISSING, "c")
+            raise RuntimeError("сбой")
+    except RuntimeError:
+        pass
+    assert [r["target"] for r in iter_records(directory)] == ["b.md"]
+    assert load_summary(directory)["checked"] == 1
@@ -0,0 +1,65 @@
+"""Граф ссылок: перечитываются только изменённые документы, битые ссылки - запросом к индексу"""
+import os
+
+import link_checker
+from link_graph import MISSING, broken_links, graph_counts, links_from, update_link_graph
+from link_report import iter_records, load_summary
+
+
+def refresh(index, archive):
+    index.refresh(str(archive), verify_files=True)
+    return update_link_graph(index, str(archive))
+
+
+def test_only_changed_documents_are_reparsed(index, archive, write):
+    write({
+        "manifest.md": "# Манифест\n\n[Концепции](concepts/a.md) [сайт](https://example.org)\n",
+        "concepts/a.md": "# A\n\n[назад](../manifest.md) [черновик](drafts/b.md) [раздел](#a)\n",
+        "system/c.md": "# C\n\n[A](../concepts/a.md) [папка](../concepts)\n",
+    })
+    assert refresh(index, archive)["parsed"] == 3
+    assert graph_counts(index) == {"documents": 3, "links": 6}
+    assert links_from(index, os.path.join("concepts", "a.md")) == [
+        ("назад", "../manifest.md", "manifest.md"),
+        ("черновик", "drafts/b.md", os.path.join("concepts", "drafts", "b.md")),
+        ("раздел", "#a", os.path.join("concepts", "a.md"))]
+    assert list(broken_links(index)) == [(os.path.join("concepts", "a.md"), "drafts/b.md", "черновик", MISSING, 3, 30)]
+
+    # Появившаяся цель чинит ссылку без повторного разбора ссылающегося документа
+    write({"concepts/drafts/b.md": "# B\n"})
+    assert refresh(index, archive)["parsed"] == 1
+    assert list(broken_links(index)) == []
+
+    # Правка меняет только исходящие рёбра документа; удаление уносит их с собой
+    write({"system/c.md": "# C\n\n[нет](../none.md)\n", "manifest.md": None})
+    update = refresh(index, archive)
+    assert (update["parsed"], update["removed"]) == (1, 1)
+    assert graph_counts(index) == {"documents": 3, "links": 4}
+    assert list(broken_links(index)) == [
+        (os.path.join("concepts", "a.md"), "../manifest.md", "назад", MISSING, 3, 1),
+        (os.path.join("system", "c.md"), "../none.md", "нет", MISSING, 3, 1)]
+
+
+def report(archive):
+    """Сводка и битые ссылки отчёта без учёта порядка"""
+    directory = str(archive / "link_report")
+    summary = load_summary(directory)
+    records = sorted((r["source"], r["target"], r["line"], r["column"], r["status"]) for r in iter_records(directory))
+    return (summary["checked"], summary["broken"], summary["statuses"]), records
+
+
+def test_graph_report_matches_streaming_check(archive, write, tmp_path, monkeypatch):
+    write({
+        "manifest.md": "# Манифест\n\n[A](concepts/a.md) [нет](concepts/none.md)\n",
+        "concepts/a.md": "# A\n\n[назад](../manifest.md) [модуль](../.git/config) [вне](../../outside.md)\n",
+        ".git/config": "[core]\n",
+    })
+    monkeypatch.chdir(archive)
+    link_checker.main()
+    streamed = report(archive)
+    link_checker.main(graph=True, index_path=str(tmp_path / "index.db"))
+    # Граф выдаёт битые ссылки по порядку документов, поток - по порядку обхода
+    assert report(archive) == streamed
+    assert streamed[0][1] == 2
+    assert streamed[1] == [(os.path.join("concepts", "a.md"), "../../outside.md", 3, 61, MISSING),
+                           ("manifest.md", "concepts/none.md", 3, 20, MISSING)]
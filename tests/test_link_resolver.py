@@ -0,0 +1,65 @@
+"""Разбор целей ссылок: %XX, <...>, заголовок ссылки, якоря по заголовкам документа-цели"""
+import os
+import sqlite3
+
+import link_checker
+from link_graph import BAD_ANCHOR, broken_links, heading_slugs, resolve_link, update_link_graph
+from link_report import iter_records
+from markdown_tokens import tokenize
+from scan_index import ScanIndex
+
+
+def test_targets_are_decoded_and_anchors_split():
+    concepts = os.path.join("concepts", "garden.md")
+    assert resolve_link("concepts", "garden.md#Сад") == (concepts, "Сад")
+    assert resolve_link("", "concepts/%D1%81%D0%B0%D0%B4.md") == (os.path.join("concepts", "сад.md"), "")
+    assert resolve_link("concepts", "<my notes.md>") == (os.path.join("concepts", "my notes.md"), "")
+    assert resolve_link("concepts", 'garden.md "Сад разумов"') == (concepts, "")
+    assert resolve_link("concepts", "garden.md#%D1%81%D0%B0%D0%B4") == (concepts, "сад")
+    assert resolve_link("concepts", "#раздел") == (None, "раздел")
+    assert resolve_link("concepts", "..") == ("", "")
+
+
+def test_heading_slugs_follow_github():
+    content = ("# Сад разумов\n## Что такое «сад»?\n```\n# не заголовок\n```\n"
+               "## Итоги\n### Итоги\n## API v2.0 ##\n")
+    headings = tokenize(content.encode("utf-8")).headings
+    assert heading_slugs(heading.text for heading in headings) == {"сад-разумов", "что-такое-сад", "итоги", "итоги-1", "api-v20"}
+
+
+def test_missing_anchors_are_broken(index, archive, write, monkeypatch):
+    write({
+        "manifest.md": ("# Манифест\n\n## Состав\n\n[сад](concepts/garden.md#сад-разумов) "
+                        "[нет](concepts/garden.md#нет-такого) [свой](#состав) [чужой](#чужой)\n"),
+        "concepts/garden.md": "# Сад разумов\n\n[манифест](../manifest.md#Состав)\n",
+    })
+    index.refresh(str(archive), verify_files=True)
+    update_link_graph(index, str(archive))
+    broken = [("concepts/garden.md", "../manifest.md#Состав"), ("manifest.md", "concepts/garden.md#нет-такого"),
+              ("manifest.md", "#чужой")]
+    assert [(source, target) for source, target, *_ in broken_links(index)] == broken
+    assert {kind for _, _, _, kind, _, _ in broken_links(index)} == {BAD_ANCHOR}
+
+    # Поточная проверка находит те же якоря
+    monkeypatch.chdir(archive)
+    link_checker.main()
+    assert sorted((r["source"], r["target"]) for r in iter_records(str(archive / "link_report"))) == sorted(broken)
+
+
+def test_outdated_schema_is_rebuilt(tmp_path, archive, write):
+    write({"concepts/a.md": "# A\n"})
+    index_path = str(tmp_path / "index.db")
+    with ScanIndex(index_path, str(archive)) as index:
+        index.refresh(str(archive))
+    db = sqlite3.connect(index_path)
+    db.execute("PRAGMA user_version = 1")
+    db.execute("CREATE TABLE old_cache (value TEXT)")
+    db.commit()
+    db.close()
+
+    with ScanIndex(index_path, str(archive)) as index:
+        tables = {row[0] for row in index.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "old_cache" not in tables and "headings" in tables
+        assert index.count_files() == 0
+        index.refresh(str(archive))
+        assert index.count_files() == 1
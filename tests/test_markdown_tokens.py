@@ -0,0 +1,47 @@
+"""Разбор Markdown: ссылки, блоки кода, адреса"""
+from markdown_tokens import AUTOLINK, IMAGE, INLINE, REFERENCE, tokenize
+
+
+def targets(text):
+    return [(link.kind, link.target) for link in tokenize(text.encode("utf-8")).links]
+
+
+def test_inline_image_and_reference_links():
+    text = (
+        "# Заголовок\n"
+        "См. [манифест](manifest.md) и ![схема](img/garden.png \"Сад\").\n"
+        "Ещё [концепция][con] и [без метки].\n"
+        "\n"
+        "[con]: <concepts/garden-of-minds.md>\n"
+    )
+    assert targets(text) == [
+        (INLINE, "manifest.md"),
+        (IMAGE, 'img/garden.png "Сад"'),
+        (REFERENCE, "concepts/garden-of-minds.md"),
+    ]
+
+
+def test_links_in_code_are_ignored():
+    text = (
+        "[до](a.md)\n"
+        "```python\n"
+        "print('[не ссылка](b.md)')\n"
+        "```\n"
+        "`[тоже не ссылка](c.md)` и [после](d.md)\n"
+        "~~~\n"
+        "[незакрытый блок](e.md)\n"
+    )
+    tokens = tokenize(text.encode("utf-8"))
+    assert [link.target for link in tokens.links] == ["a.md", "d.md"]
+    assert [span.fenced for span in tokens.code] == [True, False, True]
+
+
+def test_urls_and_positions():
+    text = "Сайт <https://example.org/путь?q=1> и [док](https://example.org/doc#раздел)\n<не-ссылка>\n"
+    links = tokenize(text.encode("utf-8")).links
+    assert [(link.kind, link.target, link.line) for link in links] == [
+        (AUTOLINK, "https://example.org/путь?q=1", 1),
+        (INLINE, "https://example.org/doc#раздел", 1),
+    ]
+    # Столбец - в байтах с 1: «Сайт » - 9 байт UTF-8
+    assert links[0].column == 10
@@ -0,0 +1,99 @@
+"""Метаданные: план по индексу, --dry-run не трогает документы, запись атомарна и не затирает свежие правки"""
+import os
+from datetime import date
+
+import add_metadata
+import atomic_io
+from id_registry import IdRegistry
+from metadata_engine import apply_plan, metadata_of, metadata_scope, plan_metadata, update_metadata_index
+
+DOCS = {
+    "manifest.md": "# Манифест\n\nТекст\n",
+    "concepts/a.md": "# A\nТекст\n",
+    "concepts/b.md": "# B\n\n**ID:** CON-2024-007\n",
+    "concepts/README.md": "# Концепции\n",
+    "concepts/notes.md": "Без заголовка\n",
+    "drafts/c.md": "# C\n",
+}
+
+
+def refresh(index, archive):
+    index.refresh(str(archive), verify_files=True)
+    return update_metadata_index(index, str(archive), paths=metadata_scope(index))
+
+
+def snapshot(archive):
+    return {path: (archive / path).read_bytes() for path in DOCS}
+
+
+def test_plan_comes_from_the_index(index, archive, write):
+    write(DOCS)
+    refresh(index, archive)
+    assert metadata_of(index, os.path.join("concepts", "b.md")).doc_id == "CON-2024-007"
+    changes, skipped = plan_metadata(index, IdRegistry.from_index(index), created="2024-05-01")
+    assert [(change.path, change.fields["ID"]) for change in changes] == [
+        (os.path.join("concepts", "a.md"), "CON-2024-008"), ("manifest.md", "ROOT-2024-001")]
+    assert sorted(skipped) == [(os.path.join("concepts", "b.md"), "уже имеет метаданные"),
+                               (os.path.join("concepts", "notes.md"), "нет заголовка первого уровня")]
+
+    # План строится без чтения документов: удалённый с диска файл всё ещё в плане
+    write({"concepts/a.md": None})
+    assert len(plan_metadata(index, IdRegistry.from_index(index))[0]) == 2
+
+
+def test_dry_run_leaves_documents_untouched(archive, write, tmp_path, monkeypatch, capsys):
+    write(DOCS)
+    monkeypatch.chdir(archive)
+    index_path = str(tmp_path / "index.db")
+    before = snapshot(archive)
+
+    # Без --refresh индекс не обновляется и архив не обходится
+    add_metadata.main(dry_run=True, index_path=index_path)
+    assert "Индекс метаданных пуст" in capsys.readouterr().out
+    add_metadata.main(dry_run=True, index_path=index_path, refresh=True)
+    out = capsys.readouterr().out
+    assert "будут добавлены в 2 документов" in out and f"CON-{date.today().year}-001" in out
+    assert snapshot(archive) == before
+
+    add_metadata.main(index_path=index_path)
+    text = (archive / "concepts" / "a.md").read_text(encoding="utf-8")
+    assert text.startswith(f"# A\n\n**ID:** CON-{date.today().year}-001\n**Автор:** Водан\n")
+    assert text.endswith("**Версия:** 1.0.0\n\nТекст\n")
+    # Повторный запуск ничего не добавляет
+    add_metadata.main(index_path=index_path)
+    assert "Добавлено метаданных: 0 документов" in capsys.readouterr().out
+
+
+def test_writes_are_atomic(index, archive, write, monkeypatch):
+    write(DOCS)
+    refresh(index, archive)
+    changes, _ = plan_metadata(index, IdRegistry.from_index(index))
+    # Документ, изменившийся после плана, не затирается
+    write({"concepts/a.md": "# A\n\n**ID:** CON-2024-099\n"})
+    before = snapshot(archive)
+
+    def failing_replace(src, dst):
+        raise OSError("диск заполнен")
+
+    # Сбой подмены файла: документ остаётся прежним, временных файлов не остаётся
+    monkeypatch.setattr(atomic_io.os, "replace", failing_replace)
+    written, unchanged, errors = apply_plan(changes, str(archive))
+    assert (written, [change.path for change in unchanged]) == ([], [os.path.join("concepts", "a.md")])
+    assert errors == [("manifest.md", "диск заполнен")]
+    assert snapshot(archive) == before
+    assert not [name for _, _, names in os.walk(archive) for name in names if name.endswith(".tmp")]
+
+    monkeypatch.undo()
+    written, _, errors = apply_plan(changes, str(archive))
+    assert ([change.path for change in written], errors) == (["manifest.md"], [])
+    assert "**ID:** ROOT-2024-001" in (archive / "manifest.md").read_text(encoding="utf-8")
+
+
+def test_documents_are_reparsed_only_on_change(index, archive, write):
+    write(DOCS)
+    assert refresh(index, archive)["parsed"] == 4
+    assert refresh(index, archive)["parsed"] == 0
+    write({"concepts/a.md": "# A\n\n**ID:** CON-2024-002\n"})
+    assert refresh(index, archive)["parsed"] == 1
+    assert metadata_of(index, os.path.join("concepts", "a.md")).doc_id == "CON-2024-002"
+    assert [change.path for change in plan_metadata(index, IdRegistry.from_index(index))[0]] == ["manifest.md"]
@@ -0,0 +1,31 @@
+"""Шаблоны версий в выборках по метаданным"""
+import pytest
+
+from metadata_engine import update_metadata_index
+from metadata_query import count_documents, query_documents
+
+VERSIONS = ["1", "1.0", "1.0.0", "1.5.2", "1-beta", "1,5", "1 x", "10.0", "2.0", "0.9"]
+
+
+@pytest.fixture
+def versions(index, archive, write):
+    write({f"concepts/doc-{i}.md": f"# Документ\n\n**ID:** CON-2024-{i:03d}\n**Версия:** {version}\n"
+           for i, version in enumerate(VERSIONS)})
+    index.refresh(str(archive), verify_files=True)
+    update_metadata_index(index, str(archive))
+    return index
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    ("1.x", ["1", "1.0", "1.0.0", "1.5.2"]),
+    ("1.*", ["1", "1.0", "1.0.0", "1.5.2"]),
+    ("1.0", ["1.0"]),
+    ("10.x", ["10.0"]),
+    ("3.x", []),
+])
+def test_version_patterns(versions, pattern, expected):
+    found = query_documents(versions, version=pattern)
+    assert sorted(doc.version for doc in found) == expected
+    # С другими условиями - то же (условие версии в скобках)
+    assert count_documents(versions, version=pattern, prefix="CON") == len(expected)
+    assert count_documents(versions, version=pattern, prefix="STR") == 0
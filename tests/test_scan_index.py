@@ -0,0 +1,56 @@
+"""Постоянный индекс: перечитываются только изменённые папки; индекс архива переживает запуск из другой папки"""
+import pytest
+
+import scan_index
+from scan_index import ScanIndex, index_path_for
+
+
+@pytest.fixture
+def cache(tmp_path, archive, monkeypatch):
+    """Временный архив на месте архива репозитория, индексы - во временной папке"""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(scan_index, "CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(scan_index, "ARCHIVE_ROOT", str(archive))
+    monkeypatch.setattr(scan_index, "DEFAULT_INDEX_PATH", str(cache_dir / "scan_index.db"))
+    return cache_dir
+
+
+def files_in(index_path):
+    with ScanIndex(index_path) as index:
+        return index.count_files()
+
+
+def test_refresh_relists_only_changed_folders(index, archive, write):
+    write({"manifest.md": "# Манифест\n", "concepts/a.md": "# A\n", "system/b.md": "# B\n"})
+    stats = index.refresh(str(archive))
+    assert stats["files_updated"] == 3
+    assert index.count_files(".md") == 3
+
+    write({"concepts/c.md": "# C\n", "system/b.md": None})
+    stats = index.refresh(str(archive))
+    assert (stats["files_updated"], stats["files_removed"]) == (1, 1)
+    assert sorted(index.folders()) == ["concepts", "system"]
+    assert index.count_files() == 3
+
+
+def test_index_survives_run_from_other_cwd(cache, archive, write, monkeypatch):
+    write({"manifest.md": "# Манифест\n", "core/tool.py": "print()\n", "concepts/a.md": "# A\n"})
+    monkeypatch.chdir(archive)
+    with ScanIndex(None, ".") as index:
+        index.refresh(".")
+    assert files_in(scan_index.DEFAULT_INDEX_PATH) == 3
+
+    # Тот же инструмент из core/: "." - другой корень и другой файл индекса
+    monkeypatch.chdir(archive / "core")
+    assert index_path_for(".") != scan_index.DEFAULT_INDEX_PATH
+    assert index_path_for(str(archive)) == scan_index.DEFAULT_INDEX_PATH
+    with ScanIndex(None, ".") as index:
+        index.refresh(".")
+        assert index.count_files() == 1
+    assert files_in(scan_index.DEFAULT_INDEX_PATH) == 3
+
+    # Корень по абсолютному пути из любой папки - индекс архива
+    with ScanIndex(None, str(archive)) as index:
+        index.refresh(str(archive))
+    assert files_in(scan_index.DEFAULT_INDEX_PATH) == 3
+    assert len(list(cache.glob("scan_index*.db"))) == 2
@@ -0,0 +1,73 @@
+"""Сканер архива: параллельный обход по поддеревьям даёт те же итоги, что и последовательный"""
+import os
+
+from scanner_v2 import check_folder, iter_scan_records, scan_archive, scan_archives
+
+SUMMARY = ("total_files", "markdown_files", "project_folders", "folders_without_readme")
+
+
+def make_archive(write, prefix=""):
+    write({
+        f"{prefix}manifest.md": "# Манифест\n",
+        f"{prefix}concepts/README.md": "# Концепции\n",
+        f"{prefix}concepts/a.md": "# A\n",
+        f"{prefix}concepts/deep/b.md": "# B\n",
+        f"{prefix}system/notes.txt": "заметки\n",
+        f"{prefix}.git/objects/skip.md": "# нет\n",
+    })
+
+
+def test_parallel_scan_matches_sequential(archive, write):
+    make_archive(write)
+    sequential = scan_archive(str(archive))
+    parallel = scan_archives([str(archive)], workers=2)
+    assert {key: parallel[key] for key in SUMMARY} == {key: sequential[key] for key in SUMMARY}
+    assert (sequential["total_files"], sequential["markdown_files"]) == (5, 4)
+    assert sorted(timing["subtree"] for timing in parallel["timings"]) == ["concepts", "system"]
+
+
+def test_several_roots_are_summed(archive, write):
+    make_archive(write, "one/")
+    make_archive(write, "two/")
+    roots = [str(archive / "one"), str(archive / "two")]
+    single = scan_archive(roots[0])
+    both = scan_archives(roots, workers=2)
+    assert both["total_files"] == 2 * single["total_files"]
+    assert both["project_folders"] == 2 * single["project_folders"]
+    # У нескольких корней папки без README различаются по корню
+    assert all(os.path.isabs(folder) for folder in both["folders_without_readme"])
+
+
+def test_records_stream_and_summary(archive, write, tmp_path):
+    make_archive(write)
+    records = list(iter_scan_records(str(archive)))
+    summary = records[-1]
+    assert summary["type"] == "summary"
+    assert [record["type"] for record in records[:-1]].count("file") == 5
+    assert {record["path"] for record in records if record["type"] == "folder"} == {
+        "concepts", os.path.join("concepts", "deep"), "system"}
+    assert all(record["size"] is not None for record in records if record["type"] == "file")
+    # Итоги из потока, без отчёта и по постоянному индексу совпадают
+    walked = scan_archive(str(archive), report=False)
+    indexed = scan_archive(str(archive), index_path=str(tmp_path / "index.db"), report=False)
+    for key in SUMMARY:
+        assert walked[key] == indexed[key] == summary[key]
+
+
+def test_required_files_from_listing(archive, write, tmp_path):
+    write({
+        "templates/README.md": "# Шаблоны\n",
+        "templates/new-concept.md": "# Новый\n",
+        "concepts/README.md": "# Концепции\n",
+        "system/notes.txt": "заметки\n",
+    })
+    assert check_folder("templates", {"README.md", "index.html", "new-doc.md"})["missing"] == []
+    assert check_folder("templates", {"README.md"})["missing"] == ["index.*", "new-*.md"]
+    assert check_folder(os.path.join("concepts", "drafts"), set()) is None
+
+    records = {record["path"]: record for record in iter_scan_records(str(archive)) if record["type"] == "folder"}
+    assert records["templates"]["missing"] == ["index.*"]
+    assert records["system"]["missing"] == ["README.md"]
+    indexed = scan_archive(str(archive), index_path=str(tmp_path / "index.db"), report=False)
+    assert sorted((item["folder"], item["missing"]) for item in indexed["compliance"]) == [
+        ("concepts", []), ("system", ["README.md"]), ("templates", ["index.*"])]